@@ -0,0 +1,24 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:49
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='asset',
+            name='barcode_key',
+            field=models.GeneratedField(db_index=True, db_persist=True, expression=django.db.models.functions.text.Upper(django.db.models.functions.text.Trim('barcode')), output_field=models.CharField(max_length=100)),
+        ),
+        migrations.AddField(
+            model_name='asset',
+            name='old_barcode_key',
+            field=models.GeneratedField(db_index=True, db_persist=True, expression=django.db.models.functions.text.Upper(django.db.models.functions.text.Trim('old_barcode')), output_field=models.CharField(max_length=100, null=True)),
+        ),
+    ]
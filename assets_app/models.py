@@ -1,10 +1,26 @@
 from django.db import models
+from django.db.models.functions import Trim, Upper
 from locations_app.models import Region, City, Building
 
 class Asset(models.Model):
     asset_code = models.CharField(max_length=50, unique=True, verbose_name="رمز الأصل")
     barcode = models.CharField(max_length=100, unique=True, verbose_name="الباركود")
     old_barcode = models.CharField(max_length=100, blank=True, null=True, verbose_name="الباركود القديم")
+
+    # الباركود بعد التوحيد (بدون مسافات وبأحرف كبيرة) — تحسبه قاعدة البيانات
+    # ويُستخدم للبحث عند المسح بالباركود الحالي أو القديم
+    barcode_key = models.GeneratedField(
+        expression=Upper(Trim("barcode")),
+        output_field=models.CharField(max_length=100),
+        db_persist=True,
+        db_index=True,
+    )
+    old_barcode_key = models.GeneratedField(
+        expression=Upper(Trim("old_barcode")),
+        output_field=models.CharField(max_length=100, null=True),
+        db_persist=True,
+        db_index=True,
+    )
     description = models.TextField(verbose_name="وصف الأصل")
     phone_number = models.CharField(max_length=20, null=True, blank=True, verbose_name="رقم الهاتف")
 
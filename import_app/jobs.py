@@ -0,0 +1,63 @@
+import os
+
+from django.apps import apps
+
+from inventory_app.utils import BUILDING_STATS_SOURCES, rebuild_building_stats
+from jobs_app.utils import job_task
+from locations_app.utils import invalidate_location_tree
+from .models import ImportLog
+from .utils import apply_import
+
+
+# ================================================================
+# 🚀 تنفيذ الاستيراد في الخلفية
+# دفعات الإضافة والتحديث تُحفظ تباعًا — فلا إعادة محاولة تلقائية
+# ================================================================
+@job_task("import_apply", max_attempts=1)
+def import_apply(ctx, temp_path, selected_table, mappings, mode, unique_key=None, update_fields=()):
+    model = apps.get_model(selected_table)
+
+    try:
+        result = apply_import(
+            model, temp_path, mappings, mode,
+            unique_key=unique_key, update_fields=update_fields, progress=ctx.progress,
+        )
+    except Exception as exc:
+        ImportLog.objects.create(
+            table_name=selected_table, rows_count=0, mode=mode,
+            status="failed", message=f"{type(exc).__name__}: {exc}"[:1500],
+        )
+        raise
+    finally:
+        # حذف الملف المؤقت
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    # الاستيراد العام لا يمر بالتحديث التدريجي لملخص المباني
+    if model in BUILDING_STATS_SOURCES:
+        rebuild_building_stats()
+
+    # ولا يرسل إشارات الحفظ التي تُبطل شجرة المواقع (ونتائج التقارير معها)
+    if model._meta.app_label == "locations_app":
+        invalidate_location_tree()
+
+    errors = result["errors"]
+    timer = result["timer"]
+
+    # سجل الاستيراد
+    ImportLog.objects.create(
+        table_name=selected_table,
+        rows_count=result["total"],
+        mode=mode,
+        status="success" if not errors else "partial",
+        message=f"⏱ {timer.summary()}\n" + "\n".join(errors)[:1500],
+        inserted_count=result["inserted"],
+        updated_count=result["updated"],
+        unchanged_count=result["unchanged"],
+    )
+
+    summary = f"✔ تم استيراد {result['total']} سجل (أخطاء: {len(errors)})"
+    if mode == "upsert":
+        summary += f" — جديد: {result['inserted']} | محدث: {result['updated']} | بدون تغيير: {result['unchanged']}"
+
+    return f"{summary} — ⏱ {timer.summary()}"
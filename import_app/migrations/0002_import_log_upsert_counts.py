@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('import_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importlog',
+            name='inserted_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='importlog',
+            name='unchanged_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='importlog',
+            name='updated_count',
+            field=models.IntegerField(default=0),
+        ),
+    ]
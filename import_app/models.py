@@ -4,9 +4,14 @@ class ImportLog(models.Model):
     timestamp = models.DateTimeField(auto_now_add=True)
     table_name = models.CharField(max_length=200)
     rows_count = models.IntegerField()
-    mode = models.CharField(max_length=20)  # add / replace
+    mode = models.CharField(max_length=20)  # add / replace / upsert
     status = models.CharField(max_length=20)  # success / failed
     message = models.TextField(blank=True, null=True)
 
+    # نتائج وضع الإضافة أو التحديث (upsert)
+    inserted_count = models.IntegerField(default=0)
+    updated_count = models.IntegerField(default=0)
+    unchanged_count = models.IntegerField(default=0)
+
     def __str__(self):
         return f"{self.table_name} - {self.timestamp}"
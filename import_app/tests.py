@@ -0,0 +1,148 @@
+import datetime
+import os
+import tempfile
+from unittest import mock
+
+import openpyxl
+import pandas as pd
+from django.test import TestCase
+
+from assets_app.models import Asset
+from locations_app.models import Region, City, Building
+from .utils import apply_import, build_relation_cache, convert_frame, iter_excel_chunks
+
+
+ASSET_MAPPINGS = {
+    "code": "asset_code",
+    "barcode": "barcode",
+    "description": "description",
+    "category": "main_category",
+    "type": "type",
+    "sub": "sub_category",
+    "region": "region",
+    "city": "city",
+    "building": "building",
+    "created": "created_at",
+    "by": "created_by_username",
+}
+
+
+class ImportTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.region = Region.objects.create(name="الرياض")
+        cls.city = City.objects.create(region=cls.region, name="الرياض")
+        cls.building = Building.objects.create(city=cls.city, name="B1")
+
+    def write_sheet(self, rows, headers=tuple(ASSET_MAPPINGS)):
+        wb = openpyxl.Workbook()
+        ws = wb.active
+        ws.append(list(headers))
+        for row in rows:
+            ws.append(list(row))
+
+        fd, path = tempfile.mkstemp(suffix=".xlsx")
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        wb.save(path)
+        return path
+
+    def asset_row(self, code, description="-", building="B1"):
+        return [code, code, description, "-", "-", "-", "الرياض", "الرياض", building, datetime.date(2025, 1, 1), "admin"]
+
+
+class ExcelChunkTests(ImportTestCase):
+
+    def test_chunks_skip_blank_rows_and_rename_duplicate_headers(self):
+        path = self.write_sheet(
+            [["a", 1, 2], [None, None, None], ["b", 3, 4], ["c", 5, 6]],
+            headers=["name", "n", "n"],
+        )
+
+        chunks = list(iter_excel_chunks(path, chunk_rows=2))
+
+        self.assertEqual([len(df) for df in chunks], [2, 1])
+        self.assertEqual(list(chunks[0].columns), ["name", "n", "n.1"])
+        self.assertEqual(pd.concat(chunks)["name"].tolist(), ["a", "b", "c"])
+
+
+class ConvertFrameTests(ImportTestCase):
+
+    def test_columns_are_cleaned_and_relations_resolved(self):
+        df = pd.DataFrame({"code": [" A-1 ", None], "building": ["B1", "غير موجود"]})
+        mappings = {"code": "asset_code", "building": "building"}
+        fields, relations = build_relation_cache(Asset, mappings)
+
+        errors = []
+        objects = convert_frame(df, Asset, mappings, fields, relations, errors)
+
+        self.assertEqual([o.asset_code for o in objects], ["A-1", None])
+        self.assertEqual([o.building_id for o in objects], [self.building.id, None])
+        self.assertEqual(len(errors), 1)
+
+
+class UpsertImportTests(ImportTestCase):
+
+    def run_import(self, rows):
+        return apply_import(
+            Asset, self.write_sheet(rows), ASSET_MAPPINGS, "upsert",
+            unique_key="asset_code",
+            update_fields=[f for f in ASSET_MAPPINGS.values() if f != "asset_code"],
+        )
+
+    def test_reimporting_same_sheet_changes_nothing(self):
+        rows = [self.asset_row(f"A-{i}") for i in range(3)]
+
+        first = self.run_import(rows)
+        self.assertEqual((first["inserted"], first["updated"], first["unchanged"]), (3, 0, 0))
+
+        second = self.run_import(rows)
+        self.assertEqual((second["inserted"], second["updated"], second["unchanged"]), (0, 0, 3))
+        self.assertEqual(second["total"], 3)
+        self.assertEqual(Asset.objects.count(), 3)
+
+    def test_changed_rows_are_updated(self):
+        self.run_import([self.asset_row("A-0"), self.asset_row("A-1")])
+
+        result = self.run_import([self.asset_row("A-0", description="جديد"), self.asset_row("A-1")])
+
+        self.assertEqual((result["inserted"], result["updated"], result["unchanged"]), (0, 1, 1))
+        self.assertEqual(Asset.objects.get(asset_code="A-0").description, "جديد")
+
+    def test_missing_and_duplicate_keys_are_reported(self):
+        rows = [
+            self.asset_row("A-0"),
+            self.asset_row("A-0", description="آخر صف"),
+            [None] + self.asset_row("X")[1:],
+        ]
+
+        result = self.run_import(rows)
+
+        self.assertEqual(result["total"], 1)
+        self.assertEqual(result["inserted"], 1)
+        self.assertEqual(len(result["errors"]), 2)
+        self.assertEqual(Asset.objects.get(asset_code="A-0").description, "آخر صف")
+
+
+class ReplaceImportTests(ImportTestCase):
+
+    def run_import(self, rows):
+        return apply_import(Asset, self.write_sheet(rows), ASSET_MAPPINGS, "replace")
+
+    def test_replace_swaps_all_rows(self):
+        self.run_import([self.asset_row("A-0"), self.asset_row("A-1")])
+
+        result = self.run_import([self.asset_row("B-0")])
+
+        self.assertEqual(result["total"], 1)
+        self.assertEqual(list(Asset.objects.values_list("asset_code", flat=True)), ["B-0"])
+
+    def test_failed_replace_keeps_old_rows(self):
+        self.run_import([self.asset_row("A-0"), self.asset_row("A-1")])
+
+        with mock.patch("import_app.utils.convert_frame", side_effect=ValueError("ملف تالف")):
+            with self.assertRaises(ValueError):
+                self.run_import([self.asset_row("B-0")])
+
+        self.assertEqual(Asset.objects.count(), 2)
@@ -0,0 +1,319 @@
+import time
+from contextlib import contextmanager, nullcontext
+
+import pandas as pd
+from openpyxl import load_workbook
+from django.core.exceptions import FieldDoesNotExist
+from django.db import transaction
+
+
+# ================================================================
+# ⏱ قياس زمن كل مرحلة من مراحل الاستيراد
+# ================================================================
+class PhaseTimer:
+    """
+    تجميع الزمن المستغرق لكل مرحلة (قراءة / تحويل / إدخال)
+    حتى يمكن التأكد أن كل مرحلة تتناسب خطيًا مع عدد الصفوف.
+    """
+
+    def __init__(self):
+        self.timings = {}
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0) + time.perf_counter() - start
+
+    def summary(self):
+        return " | ".join(f"{name}: {seconds:.2f}s" for name, seconds in self.timings.items())
+
+
+# ================================================================
+# 📄 قراءة ملف Excel على دفعات (read-only)
+# ================================================================
+IMPORT_CHUNK_ROWS = 5000
+
+
+def _header_names(header_row):
+    """أسماء الأعمدة بنفس طريقة pandas (Unnamed: n و name.1 للمكرر)"""
+    names = []
+    seen = {}
+    for index, value in enumerate(header_row):
+        name = f"Unnamed: {index}" if value is None else str(value)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def iter_excel_chunks(path, chunk_rows=IMPORT_CHUNK_ROWS):
+    """
+    قراءة أول ورقة من الملف على دفعات من chunk_rows صف، كل دفعة DataFrame.
+    الذاكرة تتناسب مع حجم الدفعة وليس مع حجم الملف.
+    """
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = _header_names(header)
+
+        chunk = []
+        for row in rows:
+            # تجاهل الصفوف الفارغة بالكامل كما يفعل pandas
+            if all(value is None for value in row):
+                continue
+
+            chunk.append(row[:len(columns)])
+            if len(chunk) >= chunk_rows:
+                yield pd.DataFrame.from_records(chunk, columns=columns)
+                chunk = []
+
+        if chunk:
+            yield pd.DataFrame.from_records(chunk, columns=columns)
+    finally:
+        wb.close()
+
+
+# ================================================================
+# 🔗 تحميل العلاقات (Foreign Keys) مرة واحدة
+# ================================================================
+def build_relation_cache(model, mappings):
+    """
+    يرجع (fields, relation_cache):
+    - fields: اسم الحقل → كائن الحقل (تُجلب مرة واحدة بدلاً من كل خلية)
+    - relation_cache: اسم حقل FK → {الاسم: المفتاح الأساسي}
+    يرفع FieldDoesNotExist(اسم الحقل) إذا كان الحقل غير موجود في الموديل.
+    """
+    fields = {}
+    relation_cache = {}
+
+    for db_field in mappings.values():
+        try:
+            field = model._meta.get_field(db_field)
+        except FieldDoesNotExist:
+            raise FieldDoesNotExist(db_field)
+        fields[db_field] = field
+
+        if field.is_relation and field.many_to_one:
+            rel_model = field.related_model
+            relation_cache[db_field] = {
+                str(name).strip(): pk
+                for pk, name in rel_model.objects.values_list("pk", "name")
+            }
+
+    return fields, relation_cache
+
+
+def _clean_column(column):
+    """NaN → None وإزالة المسافات من النصوص — على مستوى العمود كاملًا"""
+    values = column.astype(object)
+
+    if column.dtype == object or pd.api.types.is_string_dtype(column.dtype):
+        stripped = values.str.strip()
+        values = stripped.where(stripped.notna(), values)
+
+    values = values.to_numpy(dtype=object, copy=True)
+    values[column.isna().to_numpy()] = None
+    return pd.Series(values, index=column.index, dtype=object)
+
+
+# ================================================================
+# 🔄 تحويل DataFrame إلى كائنات الموديل — عمودًا عمودًا
+# ================================================================
+def convert_frame(df, model, mappings, fields, relation_cache, errors):
+    """
+    تحويل الأعمدة المختارة دفعة واحدة لكل عمود:
+    NaN → None، إزالة المسافات، وحل العلاقات عبر Series.map على relation_cache.
+    ثم بناء الكائنات من tuples عادية بدلاً من df.iterrows().
+    """
+    attnames = []
+    columns = []
+
+    for excel_col, db_field in mappings.items():
+        field = fields[db_field]
+
+        if excel_col in df.columns:
+            series = _clean_column(df[excel_col])
+        else:
+            series = pd.Series([None] * len(df), index=df.index, dtype=object)
+
+        if field.is_relation and field.many_to_one:
+            keys = series.map(lambda v: None if v is None else str(v).strip())
+            resolved = keys.map(relation_cache.get(db_field, {}))
+
+            unresolved = keys.notna() & resolved.isna()
+            for value in series[unresolved]:
+                errors.append(f"{db_field}: القيمة '{value}' غير موجودة")
+
+            # Int64 حتى لا تتحول المفاتيح إلى float بسبب القيم الفارغة
+            resolved = resolved.astype("Int64").astype(object)
+            series = resolved.where(resolved.notna(), None)
+
+        attnames.append(field.attname)
+        columns.append(series.tolist())
+
+    return [model(**dict(zip(attnames, values))) for values in zip(*columns)]
+
+
+# ================================================================
+# 🔁 الإضافة أو التحديث (Upsert) حسب حقل فريد
+# ================================================================
+def upsert_batch(model, objects, key_field, update_fields, errors=None, seen=None):
+    """
+    إدخال أو تحديث دفعة كائنات حسب حقل فريد باستخدام
+    bulk_create(update_conflicts=True) — ON CONFLICT في قاعدة البيانات.
+
+    الصفوف المطابقة تمامًا للموجود لا تُرسل للقاعدة.
+    الصفوف بدون قيمة للحقل الفريد تُتجاهل، والمفتاح المكرر يُعتمد آخر صف له
+    ويُعد مرة واحدة — كلاهما يُسجل في errors.
+    seen: مفاتيح الدفعات السابقة من نفس الملف (تُحدّث هنا).
+    يرجع (inserted, updated, unchanged) — كل مفتاح مرة واحدة.
+    """
+    errors = errors if errors is not None else []
+    seen = seen if seen is not None else set()
+
+    key = model._meta.get_field(key_field)
+    fields = [model._meta.get_field(name) for name in update_fields]
+
+    # آخر قيمة لكل مفتاح داخل الدفعة (ON CONFLICT لا يقبل تكرار نفس الصف)
+    by_key = {}
+    skipped = 0
+    for obj in objects:
+        value = getattr(obj, key.attname)
+        if value is None or value == "":
+            skipped += 1
+            continue
+        value = key.to_python(value)
+        if value in by_key or value in seen:
+            errors.append(f"{key_field}: القيمة '{value}' مكررة في الملف — اعتُمد آخر صف")
+        by_key[value] = obj
+
+    if skipped:
+        errors.append(f"{key_field}: {skipped} صف بدون قيمة — لم يُستورد")
+
+    existing = {
+        row[0]: row[1:]
+        for row in model.objects.filter(**{f"{key.attname}__in": list(by_key)})
+        .values_list(key.attname, *[f.attname for f in fields])
+    }
+
+    inserted = updated = unchanged = 0
+    to_write = []
+    for value, obj in by_key.items():
+        # مفتاح من دفعة سابقة: يُكتب (آخر صف) ولا يُعد مرة ثانية
+        counted = value not in seen
+        seen.add(value)
+
+        if value not in existing:
+            inserted += counted
+            to_write.append(obj)
+            continue
+
+        incoming = tuple(f.to_python(getattr(obj, f.attname)) for f in fields)
+        if incoming == existing[value]:
+            unchanged += counted
+        else:
+            updated += counted
+            to_write.append(obj)
+
+    if to_write:
+        if fields:
+            model.objects.bulk_create(
+                to_write,
+                update_conflicts=True,
+                unique_fields=[key.name],
+                update_fields=[f.name for f in fields],
+            )
+        else:
+            model.objects.bulk_create(to_write, ignore_conflicts=True)
+
+    return inserted, updated, unchanged
+
+
+# ================================================================
+# 🚀 تنفيذ الاستيراد كاملًا (يُستدعى من المهمة الخلفية)
+# ================================================================
+IMPORT_BATCH_SIZE = 2000
+
+
+def excel_row_count(path):
+    """عدد الصفوف التقريبي من أبعاد الورقة (للتقدم فقط) — None إذا لم يُسجل"""
+    wb = load_workbook(path, read_only=True)
+    try:
+        rows = wb.worksheets[0].max_row
+        return rows - 1 if rows else None
+    finally:
+        wb.close()
+
+
+def apply_import(model, path, mappings, mode, unique_key=None, update_fields=(), progress=None):
+    """
+    استيراد الملف في الموديل على دفعات.
+    progress(done, total): تسجيل التقدم بعد كل دفعة (اختياري).
+    يرجع dict: total, inserted, updated, unchanged, errors, timer.
+    """
+    timer = PhaseTimer()
+
+    # تحميل العلاقات Foreign Keys
+    with timer.phase("resolve"):
+        fields, relation_cache = build_relation_cache(model, mappings)
+
+    errors = []
+    total = 0
+    inserted = updated = unchanged = 0
+    seen_keys = set()
+    expected = excel_row_count(path) if progress else None
+
+    # وضع الاستبدال: الحذف والإدراج معاملة واحدة — فشل الاستيراد يُبقي البيانات
+    # القديمة، وإشارات الحذف تُبطل الإصدار مرة واحدة (التقدم يظهر بعد الاكتمال)
+    with transaction.atomic() if mode == "replace" else nullcontext():
+        if mode == "replace":
+            model.objects.all().delete()
+
+        # قراءة الملف على دفعات بدلاً من تحميله كاملًا في الذاكرة
+        chunks = iter_excel_chunks(path)
+
+        while True:
+            with timer.phase("parse"):
+                df = next(chunks, None)
+            if df is None:
+                break
+
+            # نستخدم فقط الحقول المختارة — التحويل عمودًا عمودًا
+            with timer.phase("resolve"):
+                objects = convert_frame(df, model, mappings, fields, relation_cache, errors)
+
+            with timer.phase("insert"):
+                for start in range(0, len(objects), IMPORT_BATCH_SIZE):
+                    batch = objects[start:start + IMPORT_BATCH_SIZE]
+
+                    if mode == "upsert":
+                        i, u, n = upsert_batch(model, batch, unique_key, update_fields, errors, seen_keys)
+                        inserted += i
+                        updated += u
+                        unchanged += n
+                        total += i + u + n
+                    else:
+                        model.objects.bulk_create(batch, ignore_conflicts=True)
+                        total += len(batch)
+
+            if progress:
+                progress(total, expected)
+
+    return {
+        "total": total,
+        "inserted": inserted,
+        "updated": updated,
+        "unchanged": unchanged,
+        "errors": errors,
+        "timer": timer,
+    }
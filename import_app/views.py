@@ -6,6 +6,8 @@ from django.apps import apps
 from django.shortcuts import render, redirect
 from django.contrib import messages
 from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from jobs_app.utils import enqueue_job
 from .models import ImportLog
 
 
@@ -94,13 +96,19 @@ def import_step3_mapping(request):
 
     db_fields = [
         f.name for f in model._meta.get_fields()
-        if f.concrete and not f.primary_key
+        if f.concrete and not f.primary_key and not f.generated
+    ]
+
+    # الحقول الفريدة — تستخدم كمفتاح في وضع الإضافة أو التحديث
+    unique_fields = [
+        f.name for f in model._meta.get_fields()
+        if f.concrete and not f.primary_key and not f.generated and f.unique
     ]
 
     return render(
         request,
         "import_app/step3_mapping.html",
-        {"excel_cols": excel_cols, "db_fields": db_fields},
+        {"excel_cols": excel_cols, "db_fields": db_fields, "unique_fields": unique_fields},
     )
 
 
@@ -116,9 +124,6 @@ def import_step4_apply(request):
     if not temp_path or not selected_table:
         return redirect("import_app:step1")
 
-    # قراءة الملف كاملًا
-    df = pd.read_excel(temp_path)
-
     app_label, model_name = selected_table.split(".")
 
     # التحقق من صحة الجدول
@@ -137,86 +142,43 @@ def import_step4_apply(request):
 
     mode = request.POST.get("mode")
 
-    # استبدال البيانات القديمة
-    if mode == "replace":
-        model.objects.all().delete()
+    # وضع الإضافة أو التحديث يحتاج حقلًا فريدًا مربوطًا بعمود
+    unique_key = request.POST.get("unique_key")
+    update_fields = []
+    if mode == "upsert":
+        try:
+            key_field = model._meta.get_field(unique_key or "")
+        except FieldDoesNotExist:
+            key_field = None
 
-    # تحميل العلاقات Foreign Keys
-    relation_cache = {}
-    for excel_col, db_field in mappings.items():
+        if not key_field or not key_field.unique or unique_key not in mappings.values():
+            messages.error(request, "❌ اختر حقلًا فريدًا مربوطًا بعمود من الملف لوضع التحديث.")
+            return redirect("import_app:step3")
+
+        update_fields = [f for f in mappings.values() if f != unique_key]
 
-        # التحقق من وجود الحقل داخل الموديل
+    # التحقق من الحقول قبل الجدولة — الأخطاء هنا تظهر للمستخدم مباشرة
+    for db_field in mappings.values():
         try:
-            field = model._meta.get_field(db_field)
-        except Exception:
+            model._meta.get_field(db_field)
+        except FieldDoesNotExist:
             messages.error(request, f"❌ الحقل '{db_field}' غير موجود داخل الموديل {model_name}.")
             return redirect("import_app:step3")
 
-        # إذا كان الحقل Foreign Key
-        if field.is_relation and field.many_to_one:
-            rel_model = field.related_model
-            relation_cache[db_field] = {
-                str(obj.name).strip(): obj for obj in rel_model.objects.all()
-            }
-
-    errors = []
-    total = 0
-    batch = []
-    batch_size = 2000
-
-    # -----------------------------
-    # 🔥 أهم نقطة: نستخدم فقط الحقول المختارة
-    # -----------------------------
-    for _, row in df.iterrows():
-
-        obj_data = {}
-
-        for excel_col, db_field in mappings.items():
-
-            # الحصول على قيمة العمود
-            value = row.get(excel_col)
-
-            field = model._meta.get_field(db_field)
-
-            # العلاقات
-            if field.is_relation and field.many_to_one:
-                if value is None:
-                    obj_data[db_field] = None
-                else:
-                    mapping_dict = relation_cache.get(db_field, {})
-                    instance = mapping_dict.get(str(value).strip())
-                    if not instance:
-                        errors.append(f"{db_field}: القيمة '{value}' غير موجودة")
-                    obj_data[db_field] = instance
-            else:
-                obj_data[db_field] = value
-
-        batch.append(model(**obj_data))
-
-        if len(batch) >= batch_size:
-            model.objects.bulk_create(batch, ignore_conflicts=True)
-            total += len(batch)
-            batch = []
-
-    if batch:
-        model.objects.bulk_create(batch, ignore_conflicts=True)
-        total += len(batch)
-
-    # سجل الاستيراد
-    ImportLog.objects.create(
-        table_name=selected_table,
-        rows_count=total,
-        mode=mode,
-        status="success" if not errors else "partial",
-        message="\n".join(errors)[:1500]
-    )
+    # التنفيذ في الخلفية — الملفات الكبيرة تتجاوز مهلة الطلب
+    job = enqueue_job("import_apply", {
+        "temp_path": temp_path,
+        "selected_table": selected_table,
+        "mappings": mappings,
+        "mode": mode,
+        "unique_key": unique_key,
+        "update_fields": update_fields,
+    }, request.user)
 
-    # حذف الملف المؤقت
-    if os.path.exists(temp_path):
-        os.remove(temp_path)
+    # الملف المؤقت صار ملك المهمة
+    request.session.pop("excel_temp_path", None)
 
-    messages.success(request, f"✔ تم استيراد {total} سجل (أخطاء: {len(errors)})")
-    return redirect("import_app:logs")
+    return redirect("jobs_app:job_detail", job_id=job.id)
 
 # ================================================================
 # 📜 عرض السجلات (Logs)
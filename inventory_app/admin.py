@@ -1,11 +1,12 @@
 from django.contrib import admin
-from .models import InventorySession, InventoryItem
+from .models import InventorySession, InventoryItem, ScanEvent, BuildingInventoryStats
 
 @admin.register(InventorySession)
 class InventorySessionAdmin(admin.ModelAdmin):
     list_display = (
         'id', 'employee', 'region', 'city', 'building',
-        'start_time', 'end_time', 'status'
+        'start_time', 'end_time', 'status',
+        'total_items', 'found_count', 'missing_count', 'new_count'
     )
     list_filter = (
         'status', 'region', 'city', 'building', 'employee'
@@ -27,3 +28,29 @@ class InventoryItemAdmin(admin.ModelAdmin):
     search_fields = (
         'barcode', 'asset__asset_code', 'asset__description'
     )
+
+
+@admin.register(ScanEvent)
+class ScanEventAdmin(admin.ModelAdmin):
+    list_display = (
+        'id', 'session', 'barcode', 'kind', 'device_id', 'scanned_at', 'received_at'
+    )
+    list_filter = (
+        'kind', 'device_id',
+    )
+    search_fields = (
+        'barcode', 'session__id'
+    )
+    raw_id_fields = ('session',)
+
+
+@admin.register(BuildingInventoryStats)
+class BuildingInventoryStatsAdmin(admin.ModelAdmin):
+    list_display = (
+        'building', 'total_assets', 'found_count', 'missing_count', 'new_count',
+        'last_session', 'last_inventoried_at'
+    )
+    search_fields = (
+        'building__name',
+    )
+    raw_id_fields = ('building', 'last_session')
@@ -0,0 +1,23 @@
+from inventory_app.models import InventorySession
+from jobs_app.utils import job_task
+from reports_app.utils import write_excel_sheets
+from .utils import SCAN_EVENT_SETTLE_SECONDS, backup_sheets, compact_session_events, write_session_pdf
+
+
+# ============================================================
+# المهام الخلفية للجرد (تُسجل تلقائيًا عند بدء التطبيق)
+# ============================================================
+@job_task("backup_full_system")
+def backup_full_system(ctx):
+    write_excel_sheets(backup_sheets(track=ctx.track), ctx.result_path("full_inventory_backup.xlsx"))
+
+
+@job_task("export_session_pdf")
+def export_session_pdf(ctx, session_id):
+    session = InventorySession.objects.select_related("employee").get(id=session_id)
+    # المسوحات المسجلة قبل التصدير تظهر في الملف
+    compact_session_events(session, settle_seconds=SCAN_EVENT_SETTLE_SECONDS)
+
+    with open(ctx.result_path(f"session_{session_id}.pdf"), "wb") as dest:
+        if not write_session_pdf(session, dest):
+            raise RuntimeError("خطأ أثناء إنشاء ملف PDF")
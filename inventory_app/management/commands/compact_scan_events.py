@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from inventory_app.models import InventorySession, ScanEvent
+from inventory_app.utils import SCAN_EVENT_SETTLE_SECONDS, compact_session_events
+
+
+class Command(BaseCommand):
+    help = "دمج أحداث المسح المعلقة في حالة عناصر الجرد (يُشغل دوريًا)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--session",
+            type=int,
+            action="append",
+            dest="sessions",
+            help="رقم جلسة محددة (يمكن تكراره)",
+        )
+        parser.add_argument(
+            "--settle",
+            type=int,
+            default=SCAN_EVENT_SETTLE_SECONDS,
+            help="تجاهل الأحداث الأحدث من هذا العدد من الثواني",
+        )
+
+    def handle(self, *args, **options):
+        # الجلسات التي لديها أحداث بعد مؤشرها فقط
+        pending = ScanEvent.objects.filter(id__gt=F("session__last_event_id"))
+        if options["sessions"]:
+            pending = pending.filter(session_id__in=options["sessions"])
+
+        session_ids = pending.values_list("session_id", flat=True).distinct()
+
+        compacted = 0
+        sessions = 0
+        for session in InventorySession.objects.filter(id__in=list(session_ids)).order_by("id"):
+            count = compact_session_events(session, settle_seconds=options["settle"])
+            if count:
+                compacted += count
+                sessions += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✔ تم دمج {compacted} حدث مسح في {sessions} جلسة"
+        ))
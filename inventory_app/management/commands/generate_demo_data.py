@@ -0,0 +1,229 @@
+import datetime
+import itertools
+import random
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import Group, User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from assets_app.models import Asset
+from inventory_app.models import InventorySession, InventoryItem
+from inventory_app.utils import (
+    COUNTER_FIELDS, compute_session_counters, seed_session_items, rebuild_building_stats,
+)
+from locations_app.models import RegionGroup, Region, City, Building
+from locations_app.utils import invalidate_location_tree
+
+
+BENCH_EMPLOYEE = "bench_employee"
+BENCH_ADMIN = "bench_admin"
+
+CATEGORIES = {
+    "أثاث": ["مكتب", "كرسي", "خزانة", "طاولة اجتماعات"],
+    "أجهزة حاسب": ["حاسب مكتبي", "حاسب محمول", "شاشة", "طابعة"],
+    "معدات": ["مكيف", "مولد", "رافعة يدوية", "ميزان"],
+    "مركبات": ["سيارة", "دراجة نارية", "عربة نقل"],
+}
+
+CONDITIONS = ["جيد", "جيد", "جيد", "متوسط", "تالف"]
+
+# توزيع حالات الجلسات (أغلبها منتهية أو قيد المراجعة كما في الإنتاج)
+SESSION_STATUSES = [
+    ("in_progress", 0.25),
+    ("submitted_to_supervisor", 0.2),
+    ("supervisor_under_review", 0.1),
+    ("supervisor_approved", 0.35),
+    ("supervisor_rejected", 0.1),
+]
+
+UPDATE_CHUNK = 2000
+
+
+class Command(BaseCommand):
+    help = "إنشاء بيانات تجريبية ثابتة (نفس البذرة = نفس البيانات) لقياس الأداء محليًا"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--groups", type=int, default=2)
+        parser.add_argument("--regions", type=int, default=6, help="إجمالي المناطق")
+        parser.add_argument("--cities", type=int, default=24, help="إجمالي المدن")
+        parser.add_argument("--buildings", type=int, default=120, help="إجمالي المباني")
+        parser.add_argument("--assets", type=int, default=30000)
+        parser.add_argument("--sessions", type=int, default=40)
+        parser.add_argument("--found-ratio", type=float, default=0.7, help="نسبة العناصر الموجودة في كل جلسة")
+        parser.add_argument("--new-ratio", type=float, default=0.03, help="نسبة الأصول الجديدة المضافة أثناء الجرد")
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--prefix", default="BENCH")
+        parser.add_argument("--reset", action="store_true", help="حذف البيانات التجريبية السابقة أولاً")
+        parser.add_argument("--force", action="store_true", help="التشغيل حتى لو DEBUG=False")
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options["force"]:
+            raise CommandError("هذا الأمر للبيئة المحلية فقط — استخدم --force للتشغيل مع DEBUG=False")
+
+        for name in ("groups", "regions", "cities", "buildings"):
+            if options[name] < 1:
+                raise CommandError(f"--{name} يجب أن يكون 1 على الأقل")
+
+        self.prefix = options["prefix"]
+        self.rng = random.Random(options["seed"])
+
+        if options["reset"]:
+            self.reset()
+        elif RegionGroup.objects.filter(name__startswith=self.prefix).exists():
+            raise CommandError(f"توجد بيانات تجريبية بالبادئة {self.prefix} — استخدم --reset")
+
+        start = time.perf_counter()
+
+        with transaction.atomic():
+            employee, admin = self.create_users()
+            buildings = self.create_locations(options)
+            assets = self.create_assets(options["assets"], buildings)
+            sessions = self.create_sessions(options, employee, buildings)
+            rebuild_building_stats()
+
+        invalidate_location_tree()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✔ {len(buildings)} مبنى، {assets} أصل، {sessions} جلسة "
+            f"({time.perf_counter() - start:.1f}s)"
+        ))
+
+    # ------------------------------------------------------------
+    def reset(self):
+        with transaction.atomic():
+            InventorySession.objects.filter(employee__username=BENCH_EMPLOYEE).delete()
+            Asset.objects.filter(asset_code__startswith=f"{self.prefix}-").delete()
+            RegionGroup.objects.filter(name__startswith=self.prefix).delete()
+        invalidate_location_tree()
+
+    def create_users(self):
+        employees, _ = Group.objects.get_or_create(name="employees")
+
+        employee, created = User.objects.get_or_create(username=BENCH_EMPLOYEE)
+        if created:
+            employee.set_unusable_password()
+            employee.save()
+        employee.groups.add(employees)
+
+        admin, created = User.objects.get_or_create(
+            username=BENCH_ADMIN, defaults={"is_superuser": True, "is_staff": True},
+        )
+        if created:
+            admin.set_unusable_password()
+            admin.save()
+
+        return employee, admin
+
+    def create_locations(self, options):
+        p = self.prefix
+
+        groups = RegionGroup.objects.bulk_create([
+            RegionGroup(name=f"{p} إقليم {i + 1}") for i in range(options["groups"])
+        ])
+        regions = Region.objects.bulk_create([
+            Region(name=f"{p} منطقة {i + 1}", group=groups[i % len(groups)])
+            for i in range(options["regions"])
+        ])
+        cities = City.objects.bulk_create([
+            City(name=f"{p} مدينة {i + 1}", region=regions[i % len(regions)])
+            for i in range(options["cities"])
+        ])
+        return Building.objects.bulk_create([
+            Building(name=f"{p} مبنى {i + 1}", code=f"{p}-B{i + 1}", city=cities[i % len(cities)])
+            for i in range(options["buildings"])
+        ])
+
+    def create_assets(self, count, buildings):
+        p = self.prefix
+        rng = self.rng
+        today = datetime.date(2025, 1, 1)
+        categories = list(CATEGORIES.items())
+
+        # توزيع غير متساوٍ: بعض المباني أكبر بكثير من غيرها
+        weights = list(itertools.accumulate(rng.paretovariate(1.5) for _ in buildings))
+
+        batch = []
+        for n in range(count):
+            building = rng.choices(buildings, cum_weights=weights)[0]
+            main_category, types = rng.choice(categories)
+            asset_type = rng.choice(types)
+
+            batch.append(Asset(
+                asset_code=f"{p}-A{n:07d}",
+                barcode=f"{p}{n:08d}",
+                old_barcode=f"OLD{p}{n:08d}" if rng.random() < 0.1 else None,
+                description=f"{asset_type} رقم {n}",
+                main_category=main_category,
+                type=asset_type,
+                sub_category=f"{asset_type} - {rng.randint(1, 5)}",
+                region_id=building.city.region_id,
+                city_id=building.city_id,
+                building=building,
+                condition=rng.choice(CONDITIONS),
+                created_at=today - datetime.timedelta(days=rng.randint(0, 3650)),
+                created_by_username=BENCH_ADMIN,
+            ))
+
+            if len(batch) >= UPDATE_CHUNK:
+                Asset.objects.bulk_create(batch)
+                batch = []
+
+        if batch:
+            Asset.objects.bulk_create(batch)
+
+        return count
+
+    def create_sessions(self, options, employee, buildings):
+        rng = self.rng
+        statuses, weights = zip(*SESSION_STATUSES)
+        base_time = datetime.datetime(2025, 1, 1, tzinfo=datetime.timezone.utc)
+
+        session_ids = []
+        for n in range(options["sessions"]):
+            building = rng.choice(buildings)
+            session = InventorySession.objects.create(
+                employee=employee,
+                region_id=building.city.region_id,
+                city_id=building.city_id,
+                building=building,
+                status=rng.choices(statuses, weights)[0],
+            )
+            seed_session_items(session, Asset.objects.filter(building=building))
+
+            # نسبة الموجود
+            item_ids = list(
+                InventoryItem.objects.filter(session=session).order_by("id").values_list("id", flat=True)
+            )
+            found = rng.sample(item_ids, int(len(item_ids) * options["found_ratio"]))
+            for start in range(0, len(found), UPDATE_CHUNK):
+                InventoryItem.objects.filter(id__in=found[start:start + UPDATE_CHUNK]).update(
+                    status="found",
+                    scanned_at=base_time - datetime.timedelta(minutes=rng.randint(1, 60 * 24 * 30)),
+                )
+
+            # أصول جديدة أضيفت يدويًا أثناء الجرد
+            new_count = int(len(item_ids) * options["new_ratio"])
+            InventoryItem.objects.bulk_create([
+                InventoryItem(
+                    session=session,
+                    barcode=f"{self.prefix}N{n:04d}{i:05d}",
+                    status="new",
+                    scanned_at=base_time,
+                    added_manually=True,
+                )
+                for i in range(new_count)
+            ])
+
+            session_ids.append(session.id)
+
+        # العدادات من العناصر الفعلية
+        counters = compute_session_counters(session_ids)
+        sessions = list(InventorySession.objects.filter(id__in=session_ids))
+        for session in sessions:
+            for field in COUNTER_FIELDS:
+                setattr(session, field, counters.get(session.id, {}).get(field, 0))
+        InventorySession.objects.bulk_update(sessions, COUNTER_FIELDS)
+
+        return len(sessions)
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from inventory_app.utils import rebuild_building_stats
+
+
+class Command(BaseCommand):
+    help = "إعادة بناء ملخص الجرد لكل مبنى (BuildingInventoryStats) من الجداول الأصلية"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--building",
+            type=int,
+            action="append",
+            dest="buildings",
+            help="رقم مبنى محدد (يمكن تكراره)",
+        )
+
+    def handle(self, *args, **options):
+        count = rebuild_building_stats(options["buildings"])
+        self.stdout.write(self.style.SUCCESS(f"✔ تم بناء ملخص {count} مبنى"))
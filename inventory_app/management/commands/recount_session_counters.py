@@ -0,0 +1,65 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory_app.models import InventorySession
+from inventory_app.utils import COUNTER_FIELDS, compute_session_counters, rebuild_building_stats
+
+
+class Command(BaseCommand):
+    help = "إعادة حساب عدادات جلسات الجرد (الإجمالي/الموجود/المفقود/الجديد) والتحقق منها"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="التحقق فقط بدون تعديل — يفشل الأمر إذا وُجد اختلاف",
+        )
+        parser.add_argument(
+            "--session",
+            type=int,
+            action="append",
+            dest="sessions",
+            help="رقم جلسة محددة (يمكن تكراره)",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        sessions = InventorySession.objects.only("id", "building_id", *COUNTER_FIELDS).order_by("id")
+        if options["sessions"]:
+            sessions = sessions.filter(id__in=options["sessions"])
+
+        empty = dict.fromkeys(COUNTER_FIELDS, 0)
+        batch_size = options["batch_size"]
+
+        checked = 0
+        mismatched = []
+
+        ids = list(sessions.values_list("id", flat=True))
+        for start in range(0, len(ids), batch_size):
+            chunk_ids = ids[start:start + batch_size]
+            actual = compute_session_counters(chunk_ids)
+
+            to_fix = []
+            for session in sessions.filter(id__in=chunk_ids):
+                expected = actual.get(session.id, empty)
+                checked += 1
+
+                if any(getattr(session, f) != expected[f] for f in COUNTER_FIELDS):
+                    mismatched.append(session.id)
+                    for f in COUNTER_FIELDS:
+                        setattr(session, f, expected[f])
+                    to_fix.append(session)
+
+            if to_fix and not options["check"]:
+                InventorySession.objects.bulk_update(to_fix, COUNTER_FIELDS)
+                rebuild_building_stats({s.building_id for s in to_fix if s.building_id})
+
+        if mismatched:
+            preview = ", ".join(str(i) for i in mismatched[:20])
+            msg = f"{len(mismatched)} جلسة بعدادات غير مطابقة: {preview}"
+
+            if options["check"]:
+                raise CommandError(msg)
+
+            self.stdout.write(self.style.WARNING(msg + " — تم التصحيح"))
+
+        self.stdout.write(self.style.SUCCESS(f"✔ تم فحص {checked} جلسة"))
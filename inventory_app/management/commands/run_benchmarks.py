@@ -0,0 +1,377 @@
+import datetime
+import io
+import json
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import openpyxl
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import resolve, reverse
+
+from assets_app.models import Asset
+from inventory_app.models import InventorySession, InventoryItem
+from inventory_app.utils import (
+    ASSET_IMPORT_COLUMNS, import_assets_rows, invalidate_inventory_data, rebuild_building_stats,
+)
+from jobs_app.utils import claim_job, run_job
+from locations_app.models import Building
+from locations_app.utils import LOCATION_IMPORT_COLUMNS
+from splasset.metrics import QueryTimer
+
+from .generate_demo_data import BENCH_ADMIN, BENCH_EMPLOYEE
+
+
+DEFAULT_BASELINE = Path(settings.BASE_DIR) / "benchmarks" / "baseline.json"
+
+IMPORT_ROWS = 2000
+
+# أقل معدل مقبول (صف/ثانية) على SQLite — أقل من المقاس على البيانات التجريبية
+# (5.5–6.8 آلاف للدالة، ونحو ألفين للطلب) بهامش للتذبذب.
+# الطلب الكامل تحدّه قراءة openpyxl (نحو 3 آلاف صف/ثانية للقراءة وحدها)
+MIN_ROWS_PER_SECOND = {
+    "import_assets_rows": 4500,
+    "admin_import_assets": 1500,
+}
+
+# مبنى ضخم يُنشأ داخل معاملة القياس (أكبر مبنى تجريبي أقل من 3 آلاف أصل)
+LARGE_BUILDING_ASSETS = 50000
+
+# أقصى زمن مقبول بالثواني على SQLite — يُعد تراجعًا حتى بدون خط أساس.
+# فتح جلسة لمبنى بخمسين ألف أصل يُقاس بين 3.2 و3.7 ثانية
+MAX_SECONDS = {
+    "start_session_50k": 4.0,
+}
+
+
+# ============================================================
+# حالات القياس — كل دالة ترجع الاستجابة، وتُنفذ داخل معاملة يُتراجع عنها
+# ============================================================
+def bench_scan_update(ctx):
+    return ctx.client.post(
+        reverse("inventory_app:scan_update_api", args=[ctx.session.id]),
+        {"barcode": ctx.barcode},
+    )
+
+
+def bench_start_session(ctx):
+    building = ctx.building
+    return ctx.client.post(reverse("inventory_app:start_session"), {
+        "region": building.city.region_id,
+        "city": building.city_id,
+        "building": building.id,
+    })
+
+
+def seed_large_building(ctx):
+    """مبنى بخمسين ألف أصل كما بعد الاستيراد (مع ملخصه) — خارج الزمن المقاس"""
+    city = ctx.building.city
+    building = Building.objects.create(city=city, name="BENCH مبنى ضخم")
+    Asset.objects.bulk_create(
+        (
+            Asset(
+                asset_code=f"BENCH50K-{i}", barcode=f"BENCH50K{i:08d}", description="أصل",
+                main_category="أثاث", type="مكتب", sub_category="مكتب - 1",
+                region_id=city.region_id, city=city, building=building,
+                created_at=datetime.date(2025, 1, 1), created_by_username=BENCH_ADMIN,
+            )
+            for i in range(LARGE_BUILDING_ASSETS)
+        ),
+        batch_size=2000,
+    )
+    rebuild_building_stats([building.id])
+    ctx.large_building = building
+
+
+def bench_start_session_50k(ctx):
+    building = ctx.large_building
+    return ctx.client.post(reverse("inventory_app:start_session"), {
+        "region": building.city.region_id,
+        "city": building.city_id,
+        "building": building.id,
+    })
+
+
+bench_start_session_50k.setup = seed_large_building
+
+
+def bench_building_status(ctx):
+    # بدون النتائج المخزنة — قياس الحساب نفسه
+    invalidate_inventory_data()
+    return ctx.client.get(reverse("reports_app:building_status_report"))
+
+
+def bench_building_status_cached(ctx):
+    return ctx.client.get(reverse("reports_app:building_status_report"))
+
+
+def bench_summary_assets(ctx):
+    invalidate_inventory_data()
+    return ctx.client.get(reverse("reports_app:summary_assets_report"))
+
+
+def bench_backup_full(ctx):
+    # النسخة الاحتياطية مهمة خلفية — تُنفذ هنا في نفس العملية ثم يُحمّل الملف.
+    # فقط المهمة التي أنشأها هذا الطلب — مهام الطابور الحقيقية لا تُلمس
+    with tempfile.TemporaryDirectory() as media, override_settings(MEDIA_ROOT=media):
+        redirect = ctx.client.get(reverse("inventory_app:backup_full_system"))
+
+        job_id = resolve(redirect.url).kwargs["job_id"]
+        run_job(claim_job(job_id))
+
+        response = ctx.client.get(reverse("jobs_app:job_download", args=[job_id]))
+        _consume(response)
+
+    return response
+
+
+def bench_import_assets(ctx):
+    return ctx.client.post(reverse("inventory_app:admin_import_assets"), {
+        "excel_file": SimpleUploadedFile("assets.xlsx", ctx.assets_file),
+    })
+
+
+def bench_import_assets_rows(ctx):
+    # الدالة وحدها بصفوف في الذاكرة — بدون رفع الملف وقراءته
+    import_assets_rows(iter(ctx.asset_rows), {name: i for i, name in enumerate(ASSET_IMPORT_COLUMNS)})
+
+
+def bench_import_locations(ctx):
+    return ctx.client.post(reverse("locations_app:admin_import_locations"), {
+        "file": SimpleUploadedFile("locations.xlsx", ctx.locations_file),
+    })
+
+
+BENCHMARKS = [
+    ("scan_update_api", bench_scan_update),
+    ("start_session_view", bench_start_session),
+    ("start_session_50k", bench_start_session_50k),
+    ("building_status_report_view", bench_building_status),
+    ("building_status_report_cached", bench_building_status_cached),
+    ("summary_assets_report_view", bench_summary_assets),
+    ("backup_full_system", bench_backup_full),
+    ("import_assets_rows", bench_import_assets_rows),
+    ("admin_import_assets", bench_import_assets),
+    ("admin_import_locations", bench_import_locations),
+]
+
+
+def _xlsx(headers, rows):
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(headers)
+    for row in rows:
+        ws.append(row)
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
+
+
+class Context:
+    """البيانات المشتركة بين حالات القياس — تُجهز مرة واحدة"""
+
+    def __init__(self):
+        admin = User.objects.filter(username=BENCH_ADMIN).first()
+        if not admin:
+            raise CommandError("لا توجد بيانات تجريبية — شغّل generate_demo_data أولاً")
+
+        self.client = Client()
+        self.client.force_login(admin)
+
+        # تعبئة نتيجة التقرير خارج معاملات القياس — الذاكرة في قاعدة البيانات تتراجع معها
+        self.client.get(reverse("reports_app:building_status_report"))
+
+        # أكبر جلسة جارية — أسوأ حالة للمسح
+        self.session = (
+            InventorySession.objects.filter(employee__username=BENCH_EMPLOYEE, status="in_progress")
+            .annotate(n=Count("items")).order_by("-n").first()
+            or InventorySession.objects.filter(employee__username=BENCH_EMPLOYEE).first()
+        )
+        if not self.session:
+            raise CommandError("لا توجد جلسات تجريبية — شغّل generate_demo_data أولاً")
+
+        self.barcode = (
+            InventoryItem.objects.filter(session=self.session, status="missing")
+            .values_list("barcode", flat=True).first()
+            or InventoryItem.objects.filter(session=self.session).values_list("barcode", flat=True).first()
+        )
+
+        # أكبر مبنى تجريبي — أسوأ حالة لبدء الجلسة
+        self.building = (
+            Building.objects.filter(inventorysession__employee__username=BENCH_EMPLOYEE)
+            .annotate(n=Count("asset", distinct=True)).order_by("-n")
+            .select_related("city__region").first()
+        )
+        region, city, building = (
+            self.building.city.region.name, self.building.city.name, self.building.name,
+        )
+
+        self.asset_rows = [
+            [
+                f"BENCHIMP-{i}", f"BENCHIMP{i:08d}", None, "أصل مستورد",
+                "أثاث", "مكتب", "مكتب - 1",
+                region, city, building,
+                "فعال", "جيد", None, None, None,
+                "2025-01-01", BENCH_ADMIN,
+            ]
+            for i in range(IMPORT_ROWS)
+        ]
+        self.assets_file = _xlsx(ASSET_IMPORT_COLUMNS, self.asset_rows)
+
+        self.locations_file = _xlsx(LOCATION_IMPORT_COLUMNS, [
+            ["BENCHIMP إقليم", f"BENCHIMP منطقة {i % 10}", f"BENCHIMP مدينة {i % 50}", f"BENCHIMP مبنى {i}", f"BI{i}"]
+            for i in range(IMPORT_ROWS)
+        ])
+
+
+def _consume(response):
+    # حالة بدون طلب HTTP (استدعاء الدالة مباشرة)
+    if response is None:
+        return 200
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+    return response.status_code
+
+
+class Command(BaseCommand):
+    help = "قياس زمن وعدد استعلامات المسارات الحرجة ومقارنتها بخط الأساس المحفوظ"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--baseline", default=str(DEFAULT_BASELINE))
+        parser.add_argument("--save-baseline", action="store_true", help="حفظ النتائج كخط أساس جديد")
+        parser.add_argument("--repeat", type=int, default=3)
+        parser.add_argument(
+            "--tolerance", type=float, default=0.5,
+            help="الزيادة المسموحة في الزمن قبل اعتبارها تراجعًا (0.5 = 50%%)",
+        )
+        parser.add_argument(
+            "--min-delta", type=float, default=0.05,
+            help="أقل فرق زمني بالثواني يُعتبر تراجعًا (لتجاهل تذبذب الحالات السريعة)",
+        )
+        parser.add_argument("--only", action="append", help="تشغيل حالة محددة (يمكن تكراره)")
+
+    def handle(self, *args, **options):
+        # الحالات تنفذ طلبات كتابة حقيقية (يُتراجع عنها) — ليست لقاعدة الإنتاج
+        if not settings.DEBUG and not getattr(settings, "BENCHMARK_SCRATCH_DB", False):
+            raise CommandError("القياس يعمل فقط مع DEBUG أو BENCHMARK_SCRATCH_DB=True")
+
+        selected = [
+            (name, func) for name, func in BENCHMARKS
+            if not options["only"] or name in options["only"]
+        ]
+        if not selected:
+            raise CommandError("لا توجد حالات قياس بهذا الاسم")
+
+        # Client يرسل الطلبات باسم testserver
+        with override_settings(ALLOWED_HOSTS=["*"]):
+            ctx = Context()
+            results = {name: self.measure(func, ctx, options["repeat"]) for name, func in selected}
+
+        baseline_path = Path(options["baseline"])
+
+        if options["save_baseline"]:
+            baseline_path.parent.mkdir(parents=True, exist_ok=True)
+            baseline_path.write_text(json.dumps(results, indent=2, sort_keys=True) + "\n")
+            self.report(results, {})
+            self.stdout.write(self.style.SUCCESS(f"✔ تم حفظ خط الأساس في {baseline_path}"))
+            return
+
+        baseline = json.loads(baseline_path.read_text()) if baseline_path.exists() else {}
+        regressions = self.report(results, baseline, options["tolerance"], options["min_delta"])
+
+        if regressions:
+            raise CommandError("تراجع في الأداء: " + "، ".join(regressions))
+
+        self.stdout.write(self.style.SUCCESS("✔ لا يوجد تراجع في الأداء"))
+
+    def measure(self, func, ctx, repeat):
+        timings = []
+        queries = 0
+
+        # تجهيز بيانات الحالة داخل نفس المعاملة — خارج الزمن والعدّ
+        setup = getattr(func, "setup", None) or (lambda ctx: None)
+
+        # تشغيل أول بدون قياس (تحميل القوالب وتعبئة الذاكرة المؤقتة)
+        with transaction.atomic():
+            setup(ctx)
+            _consume(func(ctx))
+            transaction.set_rollback(True)
+
+        for _ in range(max(repeat, 1)):
+            with transaction.atomic():
+                setup(ctx)
+                # نفس عدّ query_budget — استعلامات الذاكرة المؤقتة تُعد منفصلة
+                timer = QueryTimer()
+                with connection.execute_wrapper(timer):
+                    start = time.perf_counter()
+                    status = _consume(func(ctx))
+                    timings.append(time.perf_counter() - start)
+                queries, cache_queries = timer.count, timer.cache_count
+
+                # القياس لا يغير البيانات
+                transaction.set_rollback(True)
+
+            if status >= 400:
+                raise CommandError(f"{func.__name__}: استجابة {status}")
+
+        return {
+            "seconds": round(statistics.median(timings), 4),
+            "queries": queries,
+            "cache_queries": cache_queries,
+        }
+
+    def report(self, results, baseline, tolerance=0.0, min_delta=0.0):
+        regressions = []
+
+        self.stdout.write(
+            f"{'الحالة':<30}{'الزمن':>10}{'الاستعلامات':>14}{'الذاكرة':>10}{'خط الأساس':>26}"
+        )
+        for name, result in results.items():
+            base = baseline.get(name)
+            line = (
+                f"{name:<30}{result['seconds']:>9.3f}s"
+                f"{result['queries']:>14}{result['cache_queries']:>10}"
+            )
+
+            if base:
+                base_cache = base.get("cache_queries", result["cache_queries"])
+                line += f"{base['seconds']:>15.3f}s / {base['queries']:<4}/ {base_cache:<4}"
+                slower = (
+                    result["seconds"] > base["seconds"] * (1 + tolerance)
+                    and result["seconds"] - base["seconds"] > min_delta
+                )
+                more_queries = result["queries"] > base["queries"] or result["cache_queries"] > base_cache
+                if slower or more_queries:
+                    regressions.append(name)
+                    line = self.style.ERROR(line + "  ✘")
+            elif baseline:
+                line += f"{'(جديد)':>26}"
+
+            max_seconds = MAX_SECONDS.get(name)
+            if max_seconds:
+                line += f"  (الحد {max_seconds:.1f}s)"
+                if result["seconds"] > max_seconds and name not in regressions:
+                    regressions.append(name)
+                    line = self.style.ERROR(line + "  ✘")
+
+            # معدل الاستيراد تحت الحد المقاس تراجع حتى بدون خط أساس
+            min_rate = MIN_ROWS_PER_SECOND.get(name)
+            if min_rate:
+                rate = IMPORT_ROWS / result["seconds"]
+                line += f"  {rate:.0f} صف/ث (الحد {min_rate})"
+                if rate < min_rate and name not in regressions:
+                    regressions.append(name)
+                    line = self.style.ERROR(line + "  ✘")
+
+            self.stdout.write(line)
+
+        return regressions
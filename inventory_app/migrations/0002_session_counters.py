@@ -0,0 +1,63 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:20
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def backfill_counters(apps, schema_editor):
+    InventorySession = apps.get_model("inventory_app", "InventorySession")
+    InventoryItem = apps.get_model("inventory_app", "InventoryItem")
+
+    stats = InventoryItem.objects.values("session_id").annotate(
+        total=Count("id"),
+        found=Count("id", filter=Q(status="found")),
+        missing=Count("id", filter=Q(status="missing")),
+        new=Count("id", filter=Q(status="new")),
+    )
+
+    sessions = []
+    for row in stats:
+        sessions.append(InventorySession(
+            id=row["session_id"],
+            total_items=row["total"],
+            found_count=row["found"],
+            missing_count=row["missing"],
+            new_count=row["new"],
+        ))
+
+    InventorySession.objects.bulk_update(
+        sessions,
+        ["total_items", "found_count", "missing_count", "new_count"],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inventorysession',
+            name='found_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='الموجود'),
+        ),
+        migrations.AddField(
+            model_name='inventorysession',
+            name='missing_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='المفقود'),
+        ),
+        migrations.AddField(
+            model_name='inventorysession',
+            name='new_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='الجديد'),
+        ),
+        migrations.AddField(
+            model_name='inventorysession',
+            name='total_items',
+            field=models.PositiveIntegerField(default=0, verbose_name='إجمالي العناصر'),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory_app', '0002_session_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inventorysession',
+            name='last_event_id',
+            field=models.PositiveBigIntegerField(default=0, verbose_name='آخر حدث مدمج'),
+        ),
+        migrations.CreateModel(
+            name='ScanEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('barcode', models.CharField(max_length=200, verbose_name='الباركود')),
+                ('device_id', models.CharField(blank=True, default='', max_length=64, verbose_name='الجهاز')),
+                ('scanned_at', models.DateTimeField(blank=True, null=True, verbose_name='وقت المسح')),
+                ('received_at', models.DateTimeField(auto_now_add=True, verbose_name='وقت الاستلام')),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='scan_events', to='inventory_app.inventorysession', verbose_name='جلسة الجرد')),
+            ],
+            options={
+                'verbose_name': 'حدث مسح',
+                'verbose_name_plural': 'سجل المسح',
+                'indexes': [models.Index(fields=['session', 'id'], name='scan_event_session_id')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory_app', '0003_scan_events'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scanevent',
+            name='client_id',
+            field=models.UUIDField(blank=True, null=True, unique=True, verbose_name='معرف المسح على الجهاز'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets_app', '0002_barcode_lookup'),
+        ('inventory_app', '0004_scan_event_client_id'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='inventoryitem',
+            index=models.Index(fields=['session', 'barcode'], name='item_session_barcode'),
+        ),
+        migrations.AddIndex(
+            model_name='inventoryitem',
+            index=models.Index(fields=['session', 'status'], name='item_session_status'),
+        ),
+    ]
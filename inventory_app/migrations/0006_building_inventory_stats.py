@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory_app', '0005_barcode_lookup'),
+        ('locations_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BuildingInventoryStats',
+            fields=[
+                ('building', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='inventory_stats', serialize=False, to='locations_app.building', verbose_name='المبنى')),
+                ('total_assets', models.PositiveIntegerField(default=0, verbose_name='إجمالي الأصول')),
+                ('found_count', models.PositiveIntegerField(default=0, verbose_name='الموجود')),
+                ('missing_count', models.PositiveIntegerField(default=0, verbose_name='المفقود')),
+                ('new_count', models.PositiveIntegerField(default=0, verbose_name='الجديد')),
+                ('last_inventoried_at', models.DateTimeField(blank=True, null=True, verbose_name='آخر جرد معتمد')),
+                ('last_session', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='inventory_app.inventorysession', verbose_name='آخر جلسة')),
+            ],
+            options={
+                'verbose_name': 'ملخص جرد مبنى',
+                'verbose_name_plural': 'ملخصات جرد المباني',
+            },
+        ),
+    ]
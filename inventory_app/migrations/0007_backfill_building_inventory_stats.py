@@ -0,0 +1,65 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:00
+
+from django.db import migrations
+from django.db.models import Count, Max, Q
+from django.db.models.functions import Coalesce
+
+
+APPROVED_STATUSES = ["supervisor_approved", "admin_approved"]
+
+
+def backfill_building_stats(apps, schema_editor):
+    """نفس rebuild_building_stats بالنماذج التاريخية"""
+    Building = apps.get_model("locations_app", "Building")
+    Asset = apps.get_model("assets_app", "Asset")
+    InventorySession = apps.get_model("inventory_app", "InventorySession")
+    InventoryItem = apps.get_model("inventory_app", "InventoryItem")
+    BuildingInventoryStats = apps.get_model("inventory_app", "BuildingInventoryStats")
+
+    sessions = InventorySession.objects.exclude(status="cancelled").filter(building__isnull=False)
+
+    total_assets = dict(Asset.objects.values_list("building_id").annotate(Count("id")).order_by())
+    latest = dict(sessions.values_list("building_id").annotate(Max("id")).order_by())
+    inventoried = dict(
+        sessions.filter(status__in=APPROVED_STATUSES).values_list("building_id")
+        .annotate(at=Max(Coalesce("end_time", "start_time"))).order_by()
+    )
+
+    counters = {
+        row["session_id"]: row
+        for row in InventoryItem.objects.filter(session_id__in=list(latest.values()))
+        .values("session_id").annotate(
+            found=Count("id", filter=Q(status="found")),
+            missing=Count("id", filter=Q(status="missing")),
+            new=Count("id", filter=Q(status="new")),
+        ).order_by()
+    }
+
+    stats = []
+    for building_id in Building.objects.values_list("id", flat=True):
+        session_id = latest.get(building_id)
+        row = counters.get(session_id, {})
+        stats.append(BuildingInventoryStats(
+            building_id=building_id,
+            total_assets=total_assets.get(building_id, 0),
+            last_session_id=session_id,
+            last_inventoried_at=inventoried.get(building_id),
+            found_count=row.get("found", 0),
+            missing_count=row.get("missing", 0),
+            new_count=row.get("new", 0),
+        ))
+
+    BuildingInventoryStats.objects.all().delete()
+    BuildingInventoryStats.objects.bulk_create(stats, batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory_app', '0006_building_inventory_stats'),
+        ('assets_app', '0002_barcode_lookup'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_building_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory_app', '0007_backfill_building_inventory_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scanevent',
+            name='kind',
+            field=models.CharField(choices=[('scan', 'مسح'), ('manual_confirm', 'تأكيد يدوي'), ('added', 'أصل مضاف')], default='scan', max_length=20, verbose_name='النوع'),
+        ),
+    ]
@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models import F
+from django.db.models.functions import Greatest
 from django.contrib.auth.models import User
 from django.utils import timezone
 from locations_app.models import RegionGroup, Region, City, Building
@@ -93,6 +95,15 @@ class InventorySession(models.Model):
         blank=True, null=True, verbose_name="ملاحظات مدير النظام"
     )
 
+    # عدادات التقدم (تُحدَّث مع كل تغيير في حالة العناصر)
+    total_items = models.PositiveIntegerField(default=0, verbose_name="إجمالي العناصر")
+    found_count = models.PositiveIntegerField(default=0, verbose_name="الموجود")
+    missing_count = models.PositiveIntegerField(default=0, verbose_name="المفقود")
+    new_count = models.PositiveIntegerField(default=0, verbose_name="الجديد")
+
+    # آخر حدث مسح تم دمجه في حالة العناصر (ScanEvent.id)
+    last_event_id = models.PositiveBigIntegerField(default=0, verbose_name="آخر حدث مدمج")
+
     class Meta:
         verbose_name = "جلسة جرد"
         verbose_name_plural = "جلسات الجرد"
@@ -102,7 +113,52 @@ class InventorySession(models.Model):
 
     @property
     def items_count(self):
-        return self.items.count()
+        return self.total_items
+
+    @property
+    def remaining_count(self):
+        return self.total_items - self.found_count
+
+    def bump_counters(self, found=0, missing=0, new=0):
+        """
+        تعديل العدادات بفروقات (موجبة أو سالبة) عبر UPDATE ذري واحد
+        حتى لا تتعارض الأجهزة التي تمسح نفس الجلسة في نفس الوقت.
+
+        العدادات لا تنزل تحت الصفر (تراجع متزامن مثلاً). التعديل المباشر على
+        العناصر (لوحة الإدارة أو InventoryItem.save) لا يمر من هنا — الإصلاح
+        بأمر recount_session_counters.
+        """
+        if not (found or missing or new):
+            return
+
+        deltas = {
+            "total_items": found + missing + new,
+            "found_count": found,
+            "missing_count": missing,
+            "new_count": new,
+        }
+
+        InventorySession.objects.filter(id=self.id).update(**_clamped(deltas))
+
+        for field, delta in deltas.items():
+            setattr(self, field, max(getattr(self, field) + delta, 0))
+
+        # ملخص المبنى يتبع آخر جلسة فيه فقط
+        if self.building_id:
+            deltas.pop("total_items")
+            BuildingInventoryStats.objects.filter(
+                building_id=self.building_id, last_session_id=self.id,
+            ).update(**_clamped(deltas))
+
+
+
+def _clamped(deltas):
+    """{field: F(field) + delta} مع حد أدنى صفر للفروقات السالبة"""
+    return {
+        field: Greatest(F(field) + delta, 0) if delta < 0 else F(field) + delta
+        for field, delta in deltas.items()
+        if delta
+    }
 
 
 
@@ -161,6 +217,113 @@ class InventoryItem(models.Model):
     class Meta:
         verbose_name = "تفصيل جرد"
         verbose_name_plural = "تفاصيل الجرد"
+        indexes = [
+            models.Index(fields=["session", "barcode"], name="item_session_barcode"),
+            models.Index(fields=["session", "status"], name="item_session_status"),
+        ]
 
     def __str__(self):
         return f"{self.barcode} - {self.get_status_display()}"
+
+
+
+# ======================================
+#   سجل المسح (إضافة فقط — لا تعديل ولا حذف)
+# ======================================
+class ScanEvent(models.Model):
+    """
+    كل قراءة باركود تُسجل هنا كما هي، ثم تُدمج في InventoryItem
+    عبر compact_session_events. يحفظ تاريخ المسح المتكرر للتدقيق.
+    """
+
+    session = models.ForeignKey(
+        InventorySession,
+        on_delete=models.CASCADE,
+        related_name="scan_events",
+        verbose_name="جلسة الجرد"
+    )
+
+    barcode = models.CharField(max_length=200, verbose_name="الباركود")
+
+    KIND_CHOICES = [
+        ("scan", "مسح"),
+        ("manual_confirm", "تأكيد يدوي"),
+        ("added", "أصل مضاف"),
+    ]
+
+    # المسح فقط يُدمج في العناصر — التأكيد اليدوي والإضافة طُبقا مباشرة،
+    # ويُسجلان هنا حتى يصلا لبقية الأجهزة مع فرق المزامنة
+    kind = models.CharField(
+        max_length=20, choices=KIND_CHOICES, default="scan",
+        verbose_name="النوع"
+    )
+
+    device_id = models.CharField(
+        max_length=64, blank=True, default="",
+        verbose_name="الجهاز"
+    )
+
+    # معرف يولده الجهاز لكل مسح — إعادة الإرسال بعد انقطاع لا تكرر الحدث
+    client_id = models.UUIDField(
+        null=True, blank=True, unique=True,
+        verbose_name="معرف المسح على الجهاز"
+    )
+
+    # وقت المسح حسب ساعة الجهاز
+    scanned_at = models.DateTimeField(
+        null=True, blank=True,
+        verbose_name="وقت المسح"
+    )
+
+    # وقت وصول الحدث للخادم
+    received_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="وقت الاستلام"
+    )
+
+    class Meta:
+        verbose_name = "حدث مسح"
+        verbose_name_plural = "سجل المسح"
+        indexes = [
+            models.Index(fields=["session", "id"], name="scan_event_session_id"),
+        ]
+
+    def __str__(self):
+        return f"{self.barcode} @ {self.received_at:%Y-%m-%d %H:%M:%S}"
+
+
+
+# ======================================
+#   ملخص الجرد لكل مبنى (آخر جلسة)
+#   يُحدّث تدريجيًا — rebuild_building_stats لإعادة بنائه
+# ======================================
+class BuildingInventoryStats(models.Model):
+
+    building = models.OneToOneField(
+        Building, on_delete=models.CASCADE, primary_key=True,
+        related_name="inventory_stats", verbose_name="المبنى"
+    )
+
+    total_assets = models.PositiveIntegerField(default=0, verbose_name="إجمالي الأصول")
+
+    # عدادات آخر جلسة (غير ملغاة) للمبنى
+    found_count = models.PositiveIntegerField(default=0, verbose_name="الموجود")
+    missing_count = models.PositiveIntegerField(default=0, verbose_name="المفقود")
+    new_count = models.PositiveIntegerField(default=0, verbose_name="الجديد")
+
+    last_session = models.ForeignKey(
+        InventorySession, on_delete=models.SET_NULL,
+        null=True, blank=True, related_name="+", verbose_name="آخر جلسة"
+    )
+
+    # وقت انتهاء آخر جلسة معتمدة
+    last_inventoried_at = models.DateTimeField(
+        null=True, blank=True, verbose_name="آخر جرد معتمد"
+    )
+
+    class Meta:
+        verbose_name = "ملخص جرد مبنى"
+        verbose_name_plural = "ملخصات جرد المباني"
+
+    def __str__(self):
+        return f"ملخص {self.building_id}"
@@ -0,0 +1,110 @@
+import threading
+
+from django.contrib.auth.models import Group, User
+from django.db import transaction
+from django.db.models.signals import m2m_changed, pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from assets_app.models import Asset
+from .models import InventorySession, InventoryItem
+from .utils import (
+    invalidate_user_roles, invalidate_inventory_data, APPROVED_STATUSES,
+    bump_building_assets, recount_building_assets, rebuild_building_stats, mark_building_inventoried,
+    on_commit_once,
+)
+
+
+# =======================================================
+#   إبطال الصلاحيات المخزنة عند تغيير مجموعات المستخدم
+# =======================================================
+@receiver(m2m_changed, sender=User.groups.through)
+def user_groups_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear", "pre_clear"):
+        return
+
+    if not reverse:
+        # user.groups.add(...) / remove / clear
+        invalidate_user_roles([instance.pk])
+    elif pk_set:
+        # group.user_set.add(...) / remove
+        invalidate_user_roles(pk_set)
+    else:
+        # group.user_set.clear()
+        invalidate_user_roles()
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, **kwargs):
+    invalidate_user_roles()
+
+
+# =======================================================
+#   تحديث ملخص المباني عند تغيير الأصول أو الجلسات
+#   (الإضافة الجماعية لا ترسل إشارات — تُحدّث من مكانها)
+# =======================================================
+@receiver(pre_save, sender=Asset)
+def asset_before_save(sender, instance, **kwargs):
+    if not instance._state.adding:
+        instance._old_building_id = (
+            Asset.objects.filter(pk=instance.pk).values_list("building_id", flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Asset)
+def asset_saved(sender, instance, created, **kwargs):
+    old = None if created else getattr(instance, "_old_building_id", None)
+    if created or old != instance.building_id:
+        bump_building_assets({old: -1, instance.building_id: 1})
+
+
+# المباني التي حُذفت منها أصول — يُعاد عدها مرة واحدة بعد اكتمال المعاملة
+# (الحذف الجماعي يرسل إشارة لكل أصل). بقايا معاملة ملغاة تُعد لاحقًا بلا ضرر.
+_deleted_assets = threading.local()
+
+
+def _recount_deleted_assets():
+    building_ids = getattr(_deleted_assets, "buildings", None)
+    if building_ids:
+        _deleted_assets.buildings = set()
+        recount_building_assets(building_ids)
+
+
+@receiver(post_delete, sender=Asset)
+def asset_deleted(sender, instance, **kwargs):
+    if not instance.building_id:
+        return
+    if not hasattr(_deleted_assets, "buildings"):
+        _deleted_assets.buildings = set()
+    _deleted_assets.buildings.add(instance.building_id)
+    on_commit_once(_recount_deleted_assets)
+
+
+@receiver(post_save, sender=InventorySession)
+def session_saved(sender, instance, created, **kwargs):
+    if instance.status in APPROVED_STATUSES:
+        mark_building_inventoried(instance)
+    elif instance.status == "cancelled" and instance.building_id:
+        building_id = instance.building_id
+        transaction.on_commit(lambda: rebuild_building_stats([building_id]))
+
+
+@receiver(post_delete, sender=InventorySession)
+def session_deleted(sender, instance, **kwargs):
+    if instance.building_id:
+        building_id = instance.building_id
+        transaction.on_commit(lambda: rebuild_building_stats([building_id]))
+
+
+# =======================================================
+#   إبطال نتائج التقارير المخزنة (إصدار بيانات الجرد)
+#   لا مستقبل لحذف العناصر: يمنع الحذف السريع المتتالي مع الجلسة،
+#   وحذف الجلسة نفسه يُبطل الإصدار.
+# =======================================================
+@receiver(post_save, sender=Asset)
+@receiver(post_delete, sender=Asset)
+@receiver(post_save, sender=InventorySession)
+@receiver(post_delete, sender=InventorySession)
+@receiver(post_save, sender=InventoryItem)
+def inventory_data_changed(sender, **kwargs):
+    invalidate_inventory_data()
@@ -21,9 +21,18 @@ urlpatterns = [
     # شاشة المسح
     path("sessions/<int:session_id>/scan/", views.live_scan_view, name="live_scan"),
 
+    # API أصول الجلسة على صفحات
+    path("sessions/<int:session_id>/items/", views.session_items_api, name="session_items_api"),
+
     # API تحديث حالة المسح
     path("sessions/<int:session_id>/scan/update/", views.scan_update_api, name="scan_update_api"),
 
+    # API تسجيل مسح دفعة باركودات
+    path("sessions/<int:session_id>/scan/batch/", views.scan_batch_api, name="scan_batch_api"),
+
+    # API مزامنة المسوحات المحفوظة على الجهاز
+    path("sessions/<int:session_id>/scan/sync/", views.scan_sync_api, name="scan_sync_api"),
+
     # حفظ الجلسة مؤقتاً
     path("sessions/<int:session_id>/draft/", views.save_draft_session, name="save_draft_session"),
 
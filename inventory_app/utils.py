@@ -1,13 +1,1029 @@
+import threading
+import time
+from datetime import timedelta
+from uuid import uuid4
+
+from django.conf import settings
 from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q, F, Max, Min, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from assets_app.models import Asset
+from inventory_app.models import InventorySession, InventoryItem, ScanEvent, BuildingInventoryStats
+from locations_app.models import Building
+
+
+# ============================================================
+# الصلاحيات — أسماء مجموعات المستخدم تُحمّل مرة واحدة لكل طلب
+# ============================================================
+ROLES_CACHE_KEY = "roles:{generation}:{user_id}"
+ROLES_GENERATION_KEY = "roles:generation"
+
+# مدة الاحتفاظ بالصلاحيات بين الطلبات (0 = مرة واحدة لكل طلب فقط).
+# لا تُفعّل إلا مع ذاكرة مشتركة بين كل العمليات — وإلا يبقى الإبطال في عملية واحدة.
+ROLES_CACHE_TIMEOUT = getattr(settings, "ROLES_CACHE_TIMEOUT", 0)
+
+
+def _roles_cache_key(user_id):
+    generation = cache.get(ROLES_GENERATION_KEY, 0)
+    return ROLES_CACHE_KEY.format(generation=generation, user_id=user_id)
+
+
+def user_roles(user):
+    """أسماء مجموعات المستخدم (frozenset) — استعلام واحد على الأكثر لكل طلب"""
+    if not user.is_authenticated:
+        return frozenset()
+
+    roles = getattr(user, "_roles", None)
+    if roles is not None:
+        return roles
+
+    key = _roles_cache_key(user.pk) if ROLES_CACHE_TIMEOUT else None
+    roles = cache.get(key) if key else None
+
+    if roles is None:
+        roles = frozenset(user.groups.values_list("name", flat=True))
+        if key:
+            cache.set(key, roles, ROLES_CACHE_TIMEOUT)
+
+    user._roles = roles
+    return roles
+
+
+def invalidate_user_roles(user_ids=None):
+    """
+    إبطال الصلاحيات المخزنة لمستخدمين محددين،
+    أو للجميع (تغيير الجيل) عند تعديل أو حذف مجموعة.
+    """
+    if user_ids is None:
+        try:
+            cache.incr(ROLES_GENERATION_KEY)
+        except ValueError:
+            cache.set(ROLES_GENERATION_KEY, 1, None)
+        return
+
+    cache.delete_many([_roles_cache_key(user_id) for user_id in user_ids])
+
 
 def is_employee(user):
     """صلاحيات الموظف — يعمل الجرد ويرفعه للمشرف"""
-    return user.groups.filter(name="employees").exists()
+    return "employees" in user_roles(user)
 
 def is_supervisor(user):
     """صلاحيات المشرف — يراجع الجرد ويقبل أو يرفض"""
-    return user.groups.filter(name="supervisors").exists()
+    return "supervisors" in user_roles(user)
 
 def is_admin(user):
     """صلاحيات المدير — أعلى صلاحية"""
-    return user.is_superuser or user.groups.filter(name="admins").exists()
+    return user.is_superuser or "admins" in user_roles(user)
+
+
+# ============================================================
+# عدد الجلسات بانتظار المراجعة (شارة التنبيهات)
+# ============================================================
+PENDING_STATUS = "supervisor_under_review"
+PENDING_COUNT_KEY = "inventory:pending_count"
+
+# احتياط لتعديلات لا تمر عبر شاشات تغيير الحالة (لوحة الإدارة مثلاً)
+PENDING_COUNT_TIMEOUT = 600
+
+
+def pending_sessions_count():
+    count = cache.get(PENDING_COUNT_KEY)
+    if count is None:
+        count = InventorySession.objects.filter(status=PENDING_STATUS).count()
+        cache.set(PENDING_COUNT_KEY, count, PENDING_COUNT_TIMEOUT)
+    return count
+
+
+# ============================================================
+# مؤشرات لوحات المتابعة (استعلام تجميعي واحد لكل جدول)
+# ============================================================
+KPI_CACHE_KEY = "inventory:kpis"
+
+# مدة قصيرة: تغيّر حالات العناصر أثناء المسح لا يُبطل المؤشرات
+KPI_CACHE_TIMEOUT = 60
+
+SESSION_STATUSES = [status for status, _ in InventorySession.STATUS_CHOICES]
+ITEM_STATUSES = [status for status, _ in InventoryItem.STATUS_CHOICES]
+
+
+def dashboard_kpis():
+    """
+    أعداد الجلسات حسب الحالة، العناصر حسب الحالة، وإجمالي الأصول.
+    يرجع {"sessions": {"total", <status>...}, "items": {"total", <status>...}, "assets": n}
+    """
+    kpis = cache.get(KPI_CACHE_KEY)
+    if kpis is None:
+        tally = lambda statuses: {
+            "total": Count("id"),
+            **{status: Count("id", filter=Q(status=status)) for status in statuses},
+        }
+        kpis = {
+            "sessions": InventorySession.objects.aggregate(**tally(SESSION_STATUSES)),
+            "items": InventoryItem.objects.aggregate(**tally(ITEM_STATUSES)),
+            "assets": Asset.objects.count(),
+        }
+        cache.set(KPI_CACHE_KEY, kpis, KPI_CACHE_TIMEOUT)
+    return kpis
+
+
+def invalidate_session_stats():
+    """يُستدعى بعد إنشاء جلسة أو تغيير حالتها أو حذفها"""
+    cache.delete_many([PENDING_COUNT_KEY, KPI_CACHE_KEY])
+
+
+# ============================================================
+# إصدار بيانات الجرد — جزء من مفتاح نتائج التقارير المخزنة
+# يتغير مع أي كتابة على الأصول أو الجلسات أو عناصر الجرد
+# ============================================================
+INVENTORY_VERSION_KEY = "inventory:data_version"
+
+# هل غُيّر الإصدار في المعاملة الحالية دون أن يُقرأ بعدها؟ (لكل خيط)
+_inventory_bump = threading.local()
+
+
+def on_commit_once(func):
+    """
+    تسجيل func بعد اكتمال المعاملة مرة واحدة مهما تكرر الاستدعاء
+    (الإشارات ترسل لكل صف في الحذف الجماعي). خارج المعاملة تُنفذ فورًا.
+    """
+    connection = transaction.get_connection()
+    if any(queued is func for _, queued, _ in connection.run_on_commit):
+        return False
+    transaction.on_commit(func)
+    return True
+
+
+def inventory_data_version():
+    _inventory_bump.pending = False
+    version = cache.get(INVENTORY_VERSION_KEY)
+    if version is None:
+        cache.add(INVENTORY_VERSION_KEY, uuid4().hex[:16], None)
+        version = cache.get(INVENTORY_VERSION_KEY)
+    return version
+
+
+def _bump_inventory_version():
+    cache.set(INVENTORY_VERSION_KEY, uuid4().hex[:16], None)
+
+
+def invalidate_inventory_data():
+    """
+    تغيير الإصدار الآن وبعد اكتمال المعاملة أيضًا، حتى لا يُخزن تقرير
+    حُسب من بيانات قبل الحفظ تحت الإصدار الجديد.
+    داخل المعاملة يُسجل التغيير بعد الاكتمال مرة واحدة، ولا يُعاد التغيير الفوري
+    ما لم يُقرأ الإصدار بعد آخر تغيير.
+    """
+    if not transaction.get_connection().in_atomic_block:
+        _bump_inventory_version()
+        return
+
+    queued = not on_commit_once(_bump_inventory_version)
+    if queued and getattr(_inventory_bump, "pending", False):
+        return
+
+    _bump_inventory_version()
+    _inventory_bump.pending = True
+
+
+# ============================================================
+# تعبئة أصول الجلسة دفعة واحدة
+# ============================================================
+SEED_BATCH_SIZE = 2000
+
+
+def seed_session_items(session, assets):
+    """
+    إنشاء عناصر الجرد (missing) لكل أصول المبنى عبر bulk_create على دفعات
+    بدلاً من INSERT لكل أصل. يجب استدعاؤها داخل transaction.atomic.
+    يرجع عدد العناصر المُنشأة.
+    """
+    start_building_session(session)
+
+    rows = assets.order_by().values_list("id", "barcode").iterator(chunk_size=SEED_BATCH_SIZE)
+
+    total = 0
+    batch = []
+    for asset_id, barcode in rows:
+        batch.append(InventoryItem(
+            session=session,
+            asset_id=asset_id,
+            barcode=barcode,
+            status="missing",
+        ))
+
+        if len(batch) >= SEED_BATCH_SIZE:
+            InventoryItem.objects.bulk_create(batch)
+            total += len(batch)
+            batch = []
+
+    if batch:
+        InventoryItem.objects.bulk_create(batch)
+        total += len(batch)
+
+    session.bump_counters(missing=total)
+    invalidate_inventory_data()
+
+    return total
+
+
+# ============================================================
+# عدادات الجلسات — إعادة الحساب من العناصر
+# ============================================================
+COUNTER_FIELDS = ["total_items", "found_count", "missing_count", "new_count"]
+
+
+def compute_session_counters(session_ids=None):
+    """
+    حساب العدادات الفعلية لكل جلسة باستعلام تجميعي واحد.
+    يرجع dict: session_id → {total_items, found_count, missing_count, new_count}
+    """
+    items = InventoryItem.objects.all()
+    if session_ids is not None:
+        items = items.filter(session_id__in=session_ids)
+
+    stats = items.values("session_id").annotate(
+        total_items=Count("id"),
+        found_count=Count("id", filter=Q(status="found")),
+        missing_count=Count("id", filter=Q(status="missing")),
+        new_count=Count("id", filter=Q(status="new")),
+    ).order_by()
+
+    return {
+        row["session_id"]: {f: row[f] for f in COUNTER_FIELDS}
+        for row in stats
+    }
+
+
+# ============================================================
+# ملخص الجرد لكل مبنى (BuildingInventoryStats)
+# ============================================================
+APPROVED_STATUSES = ["supervisor_approved", "admin_approved"]
+
+BUILDING_COUNTER_FIELDS = ["found_count", "missing_count", "new_count"]
+
+# الجداول التي يُبنى منها الملخص — الكتابة الجماعية عليها تتطلب إعادة البناء
+BUILDING_STATS_SOURCES = (Asset, InventorySession, InventoryItem)
+
+
+def rebuild_building_stats(building_ids=None):
+    """
+    إعادة بناء الملخص من الجداول الأصلية (الأصول، الجلسات، العناصر)
+    لكل المباني أو لمبانٍ محددة. يرجع عدد الصفوف المكتوبة.
+    """
+    buildings = Building.objects.all()
+    assets = Asset.objects.all()
+    sessions = InventorySession.objects.exclude(status="cancelled").filter(building__isnull=False)
+
+    if building_ids is not None:
+        building_ids = list(building_ids)
+        buildings = buildings.filter(id__in=building_ids)
+        assets = assets.filter(building_id__in=building_ids)
+        sessions = sessions.filter(building_id__in=building_ids)
+
+    total_assets = dict(assets.values_list("building_id").annotate(Count("id")).order_by())
+    latest = dict(sessions.values_list("building_id").annotate(Max("id")).order_by())
+    inventoried = dict(
+        sessions.filter(status__in=APPROVED_STATUSES).values_list("building_id")
+        .annotate(at=Max(Coalesce("end_time", "start_time"))).order_by()
+    )
+    counters = compute_session_counters(list(latest.values()))
+
+    stats = []
+    for building_id in buildings.values_list("id", flat=True):
+        session_id = latest.get(building_id)
+        session_counters = counters.get(session_id, {})
+        stats.append(BuildingInventoryStats(
+            building_id=building_id,
+            total_assets=total_assets.get(building_id, 0),
+            last_session_id=session_id,
+            last_inventoried_at=inventoried.get(building_id),
+            **{f: session_counters.get(f, 0) for f in BUILDING_COUNTER_FIELDS},
+        ))
+
+    with transaction.atomic():
+        existing = BuildingInventoryStats.objects.all()
+        if building_ids is not None:
+            existing = existing.filter(building_id__in=building_ids)
+        existing.delete()
+        BuildingInventoryStats.objects.bulk_create(stats, batch_size=2000)
+
+    invalidate_inventory_data()
+    return len(stats)
+
+
+def bump_building_assets(deltas):
+    """
+    تعديل عدد الأصول لكل مبنى بفروقات: {building_id: +n / -n}.
+    المبنى الذي ليس له ملخص بعد يُبنى ملخصه من الجداول.
+    """
+    missing = []
+    for building_id, delta in deltas.items():
+        if not building_id or not delta:
+            continue
+        updated = BuildingInventoryStats.objects.filter(building_id=building_id).update(
+            total_assets=F("total_assets") + delta,
+        )
+        if not updated:
+            missing.append(building_id)
+
+    if missing:
+        rebuild_building_stats(missing)
+
+    # الاستيراد الجماعي لا يرسل إشارات الحفظ
+    invalidate_inventory_data()
+
+
+def recount_building_assets(building_ids):
+    """إعادة عد الأصول لمبانٍ محددة (لا يُنشئ ملخصًا لمبنى ليس له ملخص)"""
+    building_ids = list(building_ids)
+    counts = dict(
+        Asset.objects.filter(building_id__in=building_ids)
+        .values_list("building_id").annotate(Count("id")).order_by()
+    )
+    for building_id in building_ids:
+        BuildingInventoryStats.objects.filter(building_id=building_id).update(
+            total_assets=counts.get(building_id, 0),
+        )
+
+    invalidate_inventory_data()
+
+
+def start_building_session(session):
+    """
+    جعل الجلسة الجديدة هي آخر جلسة للمبنى وتصفير عداداته — تُستدعى قبل تعبئة
+    عناصر الجلسة، فتنتقل إليه فروقات bump_counters بعدها.
+    """
+    if not session.building_id:
+        return
+
+    updated = BuildingInventoryStats.objects.filter(building_id=session.building_id).update(
+        last_session=session, **dict.fromkeys(BUILDING_COUNTER_FIELDS, 0),
+    )
+    if not updated:
+        rebuild_building_stats([session.building_id])
+
+
+def mark_building_inventoried(session):
+    """تسجيل وقت آخر جرد معتمد للمبنى (عند اعتماد الجلسة)"""
+    if not session.building_id:
+        return
+
+    at = session.end_time or session.start_time
+    BuildingInventoryStats.objects.filter(building_id=session.building_id).filter(
+        Q(last_inventoried_at__isnull=True) | Q(last_inventoried_at__lt=at)
+    ).update(last_inventoried_at=at)
+
+
+# ============================================================
+# البحث عن الباركود أثناء المسح (الحالي أو القديم)
+# ============================================================
+# خريطة باركود → عنصر لكل جلسة، تُبنى مرة وتبقى فترة قصيرة في ذاكرة العملية
+SESSION_BARCODE_MAP_TTL = 120
+SESSION_BARCODE_MAPS_MAX = 32
+
+_session_barcode_maps = {}
+
+
+def normalize_barcode(value):
+    """نفس توحيد Asset.barcode_key: بدون مسافات وبأحرف كبيرة"""
+    return str(value or "").strip().upper()
+
+
+def session_barcode_map(session_id):
+    """{الباركود الموحد (الحالي والقديم): رقم العنصر} لعناصر الجلسة"""
+    entry = _session_barcode_maps.get(session_id)
+    if entry and entry[0] > time.monotonic():
+        return entry[1]
+
+    mapping = {}
+    old_codes = []
+    for item_id, barcode, old_barcode in InventoryItem.objects.filter(
+        session_id=session_id
+    ).values_list("id", "barcode", "asset__old_barcode").iterator(chunk_size=5000):
+        mapping.setdefault(normalize_barcode(barcode), item_id)
+        if old_barcode:
+            old_codes.append((normalize_barcode(old_barcode), item_id))
+
+    # الباركود الحالي أولى من القديم عند التعارض
+    for key, item_id in old_codes:
+        mapping.setdefault(key, item_id)
+
+    _session_barcode_maps.pop(session_id, None)
+    while len(_session_barcode_maps) >= SESSION_BARCODE_MAPS_MAX:
+        _session_barcode_maps.pop(next(iter(_session_barcode_maps)))
+
+    _session_barcode_maps[session_id] = (time.monotonic() + SESSION_BARCODE_MAP_TTL, mapping)
+    return mapping
+
+
+def remember_session_items(session_id, items):
+    """إضافة عناصر جديدة للخريطة إن كانت مبنية (بعد bulk_create)"""
+    entry = _session_barcode_maps.get(session_id)
+    if not entry:
+        return
+    for item in items:
+        if item.id:
+            entry[1].setdefault(normalize_barcode(item.barcode), item.id)
+
+
+def resolve_scan_barcodes(session, barcodes):
+    """
+    تحديد ما يشير إليه كل باركود ممسوح:
+    {barcode: ("item", item_id) | ("asset", asset_id)} — غير الموجود لا يظهر.
+
+    الباركود الموجود في خريطة الجلسة لا يحتاج أي استعلام. الباقي يُبحث عنه
+    باستعلام واحد على barcode_key / old_barcode_key المفهرسين.
+    """
+    mapping = session_barcode_map(session.id)
+
+    resolved = {}
+    misses = {}
+    for barcode in barcodes:
+        key = normalize_barcode(barcode)
+        if key in mapping:
+            resolved[barcode] = ("item", mapping[key])
+        elif key:
+            misses.setdefault(key, []).append(barcode)
+
+    if not misses:
+        return resolved
+
+    by_barcode = {}
+    by_old_barcode = {}
+    in_session = {}
+    for asset_id, barcode_key, old_barcode_key, item_id in Asset.objects.filter(
+        Q(barcode_key__in=misses) | Q(old_barcode_key__in=misses)
+    ).annotate(
+        # أصول أضيفت للجلسة بعد بناء الخريطة — بنفس الاستعلام
+        item_id=Subquery(
+            InventoryItem.objects.filter(session=session, asset_id=OuterRef("id")).values("id")[:1]
+        ),
+    ).values_list("id", "barcode_key", "old_barcode_key", "item_id"):
+        by_barcode[barcode_key] = asset_id
+        if old_barcode_key:
+            by_old_barcode.setdefault(old_barcode_key, asset_id)
+        if item_id:
+            in_session[asset_id] = item_id
+
+    assets = {
+        key: by_barcode.get(key) or by_old_barcode.get(key)
+        for key in misses
+        if key in by_barcode or key in by_old_barcode
+    }
+
+    for key, asset_id in assets.items():
+        if asset_id in in_session:
+            mapping[key] = in_session[asset_id]
+            target = ("item", in_session[asset_id])
+        else:
+            target = ("asset", asset_id)
+        for barcode in misses[key]:
+            resolved[barcode] = target
+
+    return resolved
+
+
+# ============================================================
+# تسجيل مسح مجموعة باركودات دفعة واحدة
+# ============================================================
+def apply_scans(session, scans):
+    """
+    تسجيل مجموعة مسوحات على جلسة جرد بعدد ثابت من الاستعلامات.
+
+    scans: قائمة من (barcode, scanned_at) — الباركود الحالي أو القديم للأصل
+    يرجع قائمة نتائج بنفس ترتيب المدخلات وبنفس شكل scan_update_api:
+    {"status": "found" | "found_new_in_system" | "not_in_list", "barcode", "description"}
+    """
+    now = timezone.now()
+
+    # أول وقت مسح لكل باركود (تجاهل التكرار داخل نفس الدفعة)
+    scanned_at = {}
+    for barcode, ts in scans:
+        if barcode and barcode not in scanned_at:
+            scanned_at[barcode] = ts or now
+
+    results = {}
+    deltas = {"found": 0, "missing": 0, "new": 0}
+
+    # داخل معاملة الدمج عادةً — بدون SAVEPOINT إضافي
+    with transaction.atomic(savepoint=False):
+        resolved = resolve_scan_barcodes(session, scanned_at)
+
+        # 1) الأصول الموجودة في الجلسة — استعلام بالمفتاح + UPDATE واحد
+        items = {
+            item.id: item
+            for item in InventoryItem.objects.select_for_update(of=("self",))
+            .filter(id__in={target for kind, target in resolved.values() if kind == "item"})
+            .select_related("asset")
+        }
+        found_items = {}
+        for barcode, (kind, target) in resolved.items():
+            if kind != "item" or target not in items:
+                continue
+            item = items[target]
+            if item.id not in found_items:
+                if item.status != "found":
+                    deltas[item.status] -= 1
+                    deltas["found"] += 1
+                item.status = "found"
+                item.scanned_at = scanned_at[barcode]
+                found_items[item.id] = item
+            results[barcode] = {
+                "status": "found",
+                "barcode": barcode,
+                "description": item.asset.description if item.asset else "",
+            }
+
+        if found_items:
+            InventoryItem.objects.bulk_update(found_items.values(), ["status", "scanned_at"])
+
+        # 2) أصول موجودة في النظام وليست في الجلسة — إضافتها دفعة واحدة
+        asset_ids = {target for kind, target in resolved.values() if kind == "asset"}
+        new_items = {}
+        if asset_ids:
+            assets = Asset.objects.in_bulk(asset_ids)
+            for barcode, (kind, target) in resolved.items():
+                if kind != "asset" or target not in assets:
+                    continue
+                asset = assets[target]
+                if asset.id not in new_items:
+                    new_items[asset.id] = InventoryItem(
+                        session=session,
+                        asset=asset,
+                        barcode=asset.barcode,
+                        status="found",
+                        scanned_at=scanned_at[barcode],
+                        added_manually=False,
+                    )
+                results[barcode] = {
+                    "status": "found_new_in_system",
+                    "barcode": barcode,
+                    "description": asset.description,
+                }
+
+        if new_items:
+            InventoryItem.objects.bulk_create(new_items.values())
+            deltas["found"] += len(new_items)
+            # بعد الحفظ فقط — التراجع عن المعاملة لا يترك أرقامًا غير موجودة في الخريطة
+            created = list(new_items.values())
+            transaction.on_commit(lambda: remember_session_items(session.id, created))
+
+        session.bump_counters(**deltas)
+        if any(deltas.values()):
+            invalidate_inventory_data()
+
+    # 3) باركود غير موجود نهائيًا
+    output = []
+    for barcode, _ in scans:
+        output.append(results.get(barcode) or {
+            "status": "not_in_list",
+            "barcode": barcode,
+        })
+
+    return output
+
+
+# ============================================================
+# سجل المسح — كتابة سريعة ثم دمج لاحق في العناصر
+# ============================================================
+# أحداث أحدث من هذه المدة لا يدمجها الدمج الدوري، حتى لا يتجاوز المؤشر
+# حدثًا رقمه أصغر لم تكتمل معاملته بعد
+SCAN_EVENT_SETTLE_SECONDS = 5
+
+
+def record_scan_events(session, scans, device_id="", client_ids=None):
+    """
+    تسجيل المسوحات كأحداث (INSERT فقط — بدون أقفال على العناصر)
+    ثم إرجاع نتيجة كل باركود بقراءة فقط، بنفس شكل apply_scans.
+
+    client_ids: معرفات UUID بنفس ترتيب scans — الحدث المرسل سابقًا يُتجاهل.
+    """
+    client_ids = client_ids or [None] * len(scans)
+
+    ScanEvent.objects.bulk_create(
+        [
+            ScanEvent(
+                session=session, barcode=barcode, device_id=device_id,
+                scanned_at=ts, client_id=client_id,
+            )
+            for (barcode, ts), client_id in zip(scans, client_ids)
+            if barcode
+        ],
+        ignore_conflicts=any(client_ids),
+    )
+
+    resolved = resolve_scan_barcodes(session, {barcode for barcode, _ in scans if barcode})
+
+    item_ids = {target for kind, target in resolved.values() if kind == "item"}
+    asset_ids = {target for kind, target in resolved.values() if kind == "asset"}
+
+    descriptions = {}
+    if item_ids:
+        descriptions.update(
+            (("item", item_id), description) for item_id, description in
+            InventoryItem.objects.filter(id__in=item_ids).values_list("id", "asset__description")
+        )
+    if asset_ids:
+        descriptions.update(
+            (("asset", asset_id), description) for asset_id, description in
+            Asset.objects.filter(id__in=asset_ids).values_list("id", "description")
+        )
+
+    results = {
+        barcode: {
+            "status": "found" if target[0] == "item" else "found_new_in_system",
+            "barcode": barcode,
+            "description": descriptions.get(target) or "",
+        }
+        for barcode, target in resolved.items()
+    }
+
+    return [
+        results.get(barcode) or {"status": "not_in_list", "barcode": barcode}
+        for barcode, _ in scans
+    ]
+
+
+def compact_session_events(session, settle_seconds=0):
+    """
+    دمج أحداث المسح الجديدة في حالة عناصر الجلسة عبر apply_scans
+    ثم تقديم مؤشر الجلسة (last_event_id). يرجع عدد الأحداث المدمجة.
+
+    settle_seconds: الدمج يتوقف عند أول حدث أحدث من هذه المدة — ولو كانت بعده
+    أحداث أقدم استلامًا، حتى لا يتجاوز المؤشر حدثًا لم تكتمل معاملته.
+    مسارات الطلبات تمرر SCAN_EVENT_SETTLE_SECONDS؛ الصفر للاختبارات والأوامر اليدوية فقط.
+    """
+    events = ScanEvent.objects.filter(session_id=session.id, id__gt=session.last_event_id)
+    if settle_seconds:
+        cutoff = timezone.now() - timedelta(seconds=settle_seconds)
+        # أول حدث مستقر وأول حدث غير مستقر باستعلام واحد
+        first = events.aggregate(
+            settled=Min("id", filter=Q(received_at__lte=cutoff)),
+            unsettled=Min("id", filter=Q(received_at__gt=cutoff)),
+        )
+        settled, unsettled = first["settled"], first["unsettled"]
+        if settled is None or (unsettled is not None and unsettled < settled):
+            return 0
+        if unsettled is not None:
+            events = events.filter(id__lt=unsettled)
+
+    elif not events.exists():
+        return 0
+
+    with transaction.atomic():
+        # قفل الجلسة حتى لا يدمج طلبان نفس الأحداث
+        locked = InventorySession.objects.select_for_update().get(id=session.id)
+        rows = list(
+            events.filter(id__gt=locked.last_event_id)
+            .order_by("id")
+            .values_list("id", "barcode", "scanned_at", "received_at", "kind")
+        )
+        if not rows:
+            return 0
+
+        # الأحداث الأخرى طُبقت عند تسجيلها — المؤشر يتجاوزها فقط
+        apply_scans(locked, [
+            (barcode, ts or received) for _, barcode, ts, received, kind in rows if kind == "scan"
+        ])
+
+        locked.last_event_id = rows[-1][0]
+        InventorySession.objects.filter(id=session.id).update(last_event_id=locked.last_event_id)
+
+    # تحديث النسخة التي بيد المستدعي
+    for field in COUNTER_FIELDS + ["last_event_id"]:
+        setattr(session, field, getattr(locked, field))
+
+    return len(rows)
+
+
+def record_item_change(session, barcode, kind):
+    """
+    تسجيل تغيير طُبق مباشرة على عنصر (تأكيد يدوي / أصل مضاف) كحدث،
+    حتى يظهر في فرق المزامنة لبقية الأجهزة. الدمج لا يعيد تطبيقه.
+    """
+    ScanEvent.objects.create(session=session, barcode=barcode, kind=kind, scanned_at=timezone.now())
+
+
+SYNC_DELTA_MAX = 5000
+
+
+def session_scan_delta(session, since=0, limit=SYNC_DELTA_MAX):
+    """
+    ما تغير في الجلسة بعد المؤشر since (رقم حدث مسح) من كل الأجهزة،
+    بعد الدمج — ومعه التأكيد اليدوي والأصول المضافة. يرجع (items, cursor, has_more):
+    items = [{"barcode", "status", "scanned"}] — الحالة الحالية لكل عنصر مُسح،
+    و scanned هي الباركودات كما قرأها الجهاز (القديم أو بحالة أحرف مختلفة).
+    """
+    events = list(
+        ScanEvent.objects.filter(
+            session_id=session.id, id__gt=since, id__lte=session.last_event_id,
+        ).order_by("id").values_list("id", "barcode")[:limit + 1]
+    )
+
+    has_more = len(events) > limit
+    events = events[:limit]
+    cursor = events[-1][0] if events else max(since, 0)
+
+    # نفس تحويل الدمج: الباركود المقروء ← عنصر الجلسة
+    scanned = {}
+    for barcode, (kind, target) in resolve_scan_barcodes(session, {b for _, b in events}).items():
+        if kind == "item":
+            scanned.setdefault(target, []).append(barcode)
+
+    items = [
+        {"barcode": barcode, "status": item_status, "scanned": sorted(scanned[item_id])}
+        for item_id, barcode, item_status in InventoryItem.objects.filter(
+            id__in=scanned,
+        ).order_by("id").values_list("id", "barcode", "status")
+    ]
+
+    return items, cursor, has_more
+
+
+# ============================================================
+# قائمة أصول الجلسة على صفحات (keyset على id)
+# ============================================================
+ITEMS_PAGE_SIZE = 200
+ITEMS_PAGE_MAX = 500
+
+
+def session_items_page(session, after=0, status=None, barcode_prefix="", limit=ITEMS_PAGE_SIZE):
+    """
+    صفحة من أصول الجلسة مرتبة حسب id بعد المؤشر after.
+    الزمن لا يعتمد على موقع الصفحة لأن الاستعلام لا يستخدم OFFSET.
+    يرجع (items, next_cursor) — next_cursor = None عند آخر صفحة.
+    """
+    qs = InventoryItem.objects.filter(session=session, id__gt=after)
+
+    if status:
+        qs = qs.filter(status=status)
+    if barcode_prefix:
+        qs = qs.filter(barcode__startswith=barcode_prefix)
+
+    rows = list(
+        qs.order_by("id").values_list("id", "barcode", "status", "asset__description")[:limit + 1]
+    )
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    labels = dict(InventoryItem.STATUS_CHOICES)
+    items = [
+        {
+            "id": item_id,
+            "barcode": barcode,
+            "status": item_status,
+            "status_display": labels.get(item_status, item_status),
+            "description": description or "",
+        }
+        for item_id, barcode, item_status, description in rows
+    ]
+
+    return items, (rows[-1][0] if has_more else None)
+
+
+# ============================================================
+# استيراد الأصول — خرائط المواقع المحمّلة مسبقًا + bulk_create
+# ============================================================
+ASSET_IMPORT_COLUMNS = [
+    "asset_code", "barcode", "old_barcode", "description",
+    "main_category", "type", "sub_category",
+    "region_name", "city_name", "building_name",
+    "status", "condition",
+    "custodian_number", "custodian_name", "custodian_type",
+    "created_at", "created_by_username",
+]
+
+LOCATION_COLUMNS = ("region_name", "city_name", "building_name")
+
+ASSET_IMPORT_BATCH_SIZE = 2000
+
+
+def _clean_name(value):
+    return str(value).strip() if value is not None else ""
+
+
+def load_location_paths():
+    """
+    خريطة (المنطقة، المدينة، المبنى) → (region_id, city_id, building_id)
+    باستعلام واحد. المسار الذي يتكرر بنفس الأسماء يُعلَّم كغامض (None).
+    """
+    paths = {}
+    rows = Building.objects.values_list(
+        "id", "name", "city_id", "city__name", "city__region_id", "city__region__name",
+    )
+
+    for building_id, building, city_id, city, region_id, region in rows:
+        key = (_clean_name(region), _clean_name(city), _clean_name(building))
+        paths[key] = None if key in paths else (region_id, city_id, building_id)
+
+    return paths
+
+
+def import_assets_rows(rows, col):
+    """
+    استيراد صفوف الأصول (values_only) على دفعات.
+    col: اسم العمود → رقمه في الصف.
+    يرجع (added, skipped, errors) — الأخطاء لكل سطر ولا توقف الاستيراد.
+    """
+    paths = load_location_paths()
+
+    fields = [f for f in Asset._meta.concrete_fields]
+    defaults = {f.attname: f.get_default() for f in fields}
+
+    # الحقول الإلزامية في الجدول (بدون قيمة افتراضية)
+    required = [
+        f.attname for f in fields
+        if not f.null and not f.has_default() and not f.primary_key
+        and f.name not in ("region", "city", "building")
+    ]
+
+    indexes = [col[field] for field in ASSET_IMPORT_COLUMNS]
+    width = max(indexes) + 1
+
+    added = 0
+    skipped = 0
+    errors = []
+    seen_codes = set()
+    seen_barcodes = set()
+
+    def flush(batch):
+        """حفظ دفعة بعد استبعاد المكرر في قاعدة البيانات"""
+        nonlocal added, skipped
+
+        taken = Asset.objects.filter(
+            Q(asset_code__in=[a.asset_code for _, a in batch])
+            | Q(barcode__in=[a.barcode for _, a in batch])
+        ).values_list("asset_code", "barcode")
+
+        taken_codes = set()
+        taken_barcodes = set()
+        for code, barcode in taken:
+            taken_codes.add(code)
+            taken_barcodes.add(barcode)
+
+        valid = []
+        for row_number, asset in batch:
+            if asset.asset_code in taken_codes or asset.barcode in taken_barcodes:
+                skipped += 1
+                errors.append(f"سطر {row_number}: asset_code أو barcode موجود مسبقًا")
+            else:
+                valid.append(asset)
+
+        Asset.objects.bulk_create(valid)
+        added += len(valid)
+
+        # bulk_create لا يرسل إشارات الحفظ
+        deltas = {}
+        for asset in valid:
+            deltas[asset.building_id] = deltas.get(asset.building_id, 0) + 1
+        bump_building_assets(deltas)
+
+    batch = []
+    for row_number, row in enumerate(rows, start=2):
+        if len(row) < width:
+            row = tuple(row) + (None,) * (width - len(row))
+
+        values = dict(zip(ASSET_IMPORT_COLUMNS, [row[i] for i in indexes]))
+
+        # تجاهل الصفوف الفارغة بالكامل
+        if all(v is None for v in values.values()):
+            continue
+
+        asset_code = _clean_name(values.pop("asset_code"))
+        barcode = _clean_name(values.pop("barcode"))
+
+        if not asset_code or not barcode:
+            skipped += 1
+            errors.append(f"سطر {row_number}: asset_code أو barcode فارغ")
+            continue
+
+        if asset_code in seen_codes or barcode in seen_barcodes:
+            skipped += 1
+            errors.append(f"سطر {row_number}: asset_code أو barcode مكرر في الملف")
+            continue
+
+        key = tuple(_clean_name(values.pop(name)) for name in LOCATION_COLUMNS)
+        location = paths.get(key, False)
+        if location is False:
+            skipped += 1
+            errors.append(f"سطر {row_number}: بيانات الموقع غير صحيحة")
+            continue
+        if location is None:
+            skipped += 1
+            errors.append(f"سطر {row_number}: مسار الموقع مكرر في النظام {' / '.join(key)}")
+            continue
+
+        # القيم الفارغة في حقل له قيمة افتراضية تأخذ الافتراضي
+        data = dict(defaults)
+        data.update((k, v) for k, v in values.items() if v is not None)
+        data["asset_code"] = asset_code
+        data["barcode"] = barcode
+        data["region_id"], data["city_id"], data["building_id"] = location
+
+        missing = [f for f in required if data[f] is None]
+        if missing:
+            skipped += 1
+            errors.append(f"سطر {row_number}: حقول إلزامية فارغة: {', '.join(missing)}")
+            continue
+
+        seen_codes.add(asset_code)
+        seen_barcodes.add(barcode)
+
+        # إنشاء الكائن بقيم موضعية (أسرع من kwargs)
+        batch.append((row_number, Asset(*[data[f.attname] for f in fields])))
+
+        if len(batch) >= ASSET_IMPORT_BATCH_SIZE:
+            flush(batch)
+            batch = []
+
+    if batch:
+        flush(batch)
+
+    return added, skipped, errors
+
+
+# ============================================================
+# النسخة الاحتياطية الكاملة (مهمة خلفية)
+# ============================================================
+BACKUP_SUMMARY_HEADERS = [
+    "session_id", "employee",
+    "region", "city", "building",
+    "status", "start_time", "end_time",
+    "total_items", "found_items",
+    "missing_items", "new_items",
+]
+
+BACKUP_ITEMS_HEADERS = [
+    "session_id", "asset_code", "barcode",
+    "description", "status", "scanned_at",
+    "region", "city", "building",
+]
+
+
+def _fmt_time(dt):
+    return dt.strftime("%Y-%m-%d %H:%M") if dt else ""
+
+
+def backup_sheets(track=None):
+    """
+    أوراق النسخة الاحتياطية (title, headers, rows) — الصفوف مولّدات تُقرأ
+    على دفعات، فالذاكرة ثابتة مهما زاد عدد العناصر.
+    track(rows, total): تغليف صفوف العناصر لتسجيل التقدم (اختياري).
+    """
+    def summary_rows():
+        counters = compute_session_counters()
+        sessions = InventorySession.objects.order_by("id").values_list(
+            "id", "employee__username",
+            "region__name", "city__name", "building__name",
+            "status", "start_time", "end_time",
+        )
+        for sid, employee, region, city, building, status, start, end in sessions.iterator(chunk_size=2000):
+            c = counters.get(sid, {})
+            yield [
+                sid, employee or "",
+                region or "", city or "", building or "",
+                status, _fmt_time(start), _fmt_time(end),
+                *(c.get(field, 0) for field in COUNTER_FIELDS),
+            ]
+
+    def item_rows():
+        items = InventoryItem.objects.order_by("id").values_list(
+            "session_id", "asset__asset_code", "barcode",
+            "asset__description", "status", "scanned_at",
+            "asset__region__name", "asset__city__name", "asset__building__name",
+        )
+        for sid, code, barcode, desc, status, scanned, region, city, building in items.iterator(chunk_size=2000):
+            yield [sid, code or "", barcode, desc or "", status, _fmt_time(scanned), region or "", city or "", building or ""]
+
+    rows = item_rows()
+    if track:
+        rows = track(rows, InventoryItem.objects.count())
+
+    return [
+        ("Sessions_Summary", BACKUP_SUMMARY_HEADERS, summary_rows()),
+        ("Items_Details", BACKUP_ITEMS_HEADERS, rows),
+    ]
+
+
+# ============================================================
+# تقرير الجلسة PDF (مهمة خلفية)
+# ============================================================
+def write_session_pdf(session, dest):
+    """كتابة تقرير الجلسة PDF في dest (كائن ملف) — يرجع False عند فشل التحويل"""
+    from django.template.loader import render_to_string
+    from xhtml2pdf import pisa
+
+    items = InventoryItem.objects.filter(session=session).select_related("asset")
+
+    html = render_to_string("inventory_app/report_template.html", {
+        "session": session,
+        "items": items,
+    })
+
+    return not pisa.CreatePDF(html, dest=dest).err
@@ -1,32 +1,31 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse, HttpResponse, HttpResponseForbidden
+from django.http import JsonResponse, HttpResponseForbidden
 from django.utils import timezone
 from django.views.decorators.http import require_POST
-from django.template.loader import render_to_string
-from django.db import models, transaction
+from django.db import DatabaseError, models, transaction
 from django.contrib import messages
+from django.utils.dateparse import parse_datetime
 
+import json
+import uuid
 import openpyxl
-from openpyxl.styles import Font, Alignment
 
-from locations_app.models import Region, City, Building
+from locations_app.models import Building
+from locations_app.utils import get_location_tree, cities_of_region, buildings_of_city
 from assets_app.models import Asset
 from inventory_app.models import InventorySession, InventoryItem
-
-
-
-# ============================================================
-# الصلاحيات
-# ============================================================
-def is_employee(user):
-    return user.groups.filter(name="employees").exists()
-
-def is_supervisor(user):
-    return user.groups.filter(name="supervisors").exists()
-
-def is_admin(user):
-    return user.is_superuser or user.groups.filter(name="admins").exists()
+from inventory_app.utils import (
+    is_employee, is_supervisor, is_admin, invalidate_session_stats,
+    record_scan_events, record_item_change, compact_session_events, session_scan_delta, seed_session_items,
+    SCAN_EVENT_SETTLE_SECONDS,
+    session_items_page, ITEMS_PAGE_SIZE, ITEMS_PAGE_MAX,
+    dashboard_kpis,
+    import_assets_rows, ASSET_IMPORT_COLUMNS,
+)
+from reports_app.utils import stream_excel_sheets
+from jobs_app.utils import enqueue_job
+from splasset.metrics import query_budget
 
 
 
@@ -54,7 +53,7 @@ def session_detail_view(request, session_id):
     items = InventoryItem.objects.filter(session=session).select_related("asset")
 
     if (
-        session.employee != request.user
+        session.employee_id != request.user.id
         and not is_supervisor(request.user)
         and not is_admin(request.user)
     ):
@@ -70,62 +69,67 @@ def session_detail_view(request, session_id):
 # ============================================================
 # 🔵 API — جلب المدن حسب المنطقة
 # ============================================================
+@query_budget(6, cache_queries=7)
 @login_required
 def get_cities_by_region(request, region_id):
-    cities = City.objects.filter(region_id=region_id).values("id", "name")
-    return JsonResponse(list(cities), safe=False)
+    return JsonResponse(cities_of_region(region_id), safe=False)
 
 
 
 # ============================================================
 # 🔵 API — جلب المباني حسب المدينة
 # ============================================================
+@query_budget(6, cache_queries=7)
 @login_required
 def get_buildings_by_city(request, city_id):
-    buildings = Building.objects.filter(city_id=city_id).values("id", "name")
-    return JsonResponse(list(buildings), safe=False)
+    return JsonResponse(buildings_of_city(city_id), safe=False)
 
 
 
 # ============================================================
 # بدء جلسة جرد (موظف أو مدير)
 # ============================================================
+# الحد لمبنى حتى 2 × SEED_BATCH_SIZE أصل — كل دفعة إضافية INSERT واحد
+# (SQLite يقسم الدفعة إلى عدة INSERT بحسب حد المتغيرات في الاستعلام)
+@query_budget(18, cache_queries=32)
 @login_required
 def start_session_view(request):
     if not is_employee(request.user) and not is_admin(request.user):
         return HttpResponseForbidden("غير مصرح لك")
 
-    regions = Region.objects.all()
-    cities = City.objects.all()
-    buildings = Building.objects.all()
+    # المدن والمباني تُجلب حسب الاختيار من شجرة المواقع المخزنة
+    regions = get_location_tree()["regions"]
 
     if request.method == "POST":
-        region = get_object_or_404(Region, id=request.POST.get("region"))
-        city = get_object_or_404(City, id=request.POST.get("city"))
-        building = get_object_or_404(Building, id=request.POST.get("building"))
-
-        session = InventorySession.objects.create(
-            employee=request.user,
-            region=region,
-            city=city,
-            building=building,
-            status="in_progress",
+        # المبنى ومدينته ومنطقته باستعلام واحد — ويجب أن تتطابق مع الاختيار
+        building = get_object_or_404(
+            Building.objects.select_related("city__region"),
+            id=request.POST.get("building"),
+            city_id=request.POST.get("city"),
+            city__region_id=request.POST.get("region"),
         )
+        city = building.city
+        region = city.region
+
+        with transaction.atomic():
+            session = InventorySession.objects.create(
+                employee=request.user,
+                region=region,
+                city=city,
+                building=building,
+                status="in_progress",
+            )
 
-        for asset in Asset.objects.filter(region=region, city=city, building=building):
-            InventoryItem.objects.create(
-                session=session,
-                asset=asset,
-                barcode=asset.barcode,
-                status="missing",
+            seed_session_items(
+                session,
+                Asset.objects.filter(region=region, city=city, building=building),
             )
 
+        invalidate_session_stats()
         return redirect("inventory_app:live_scan", session_id=session.id)
 
     return render(request, "inventory_app/start_session.html", {
         "regions": regions,
-        "cities": cities,
-        "buildings": buildings,
     })
 
 
@@ -133,105 +137,263 @@ def start_session_view(request):
 # ============================================================
 # شاشة المسح
 # ============================================================
+# يشمل دمج المسوحات المعلقة (حتى 12 استعلامًا بحسب نوعها)
+@query_budget(19, cache_queries=16)
 @login_required
 def live_scan_view(request, session_id):
-    session = get_object_or_404(InventorySession, id=session_id)
+    # مسار الموقع في رأس الصفحة — بنفس الاستعلام
+    session = get_object_or_404(
+        InventorySession.objects.select_related(
+            "region__group", "city__region__group", "building__city__region__group",
+        ),
+        id=session_id,
+    )
 
-    if session.employee != request.user and not is_admin(request.user):
+    if session.employee_id != request.user.id and not is_admin(request.user):
         return HttpResponseForbidden("غير مصرح لك")
 
-    items = InventoryItem.objects.filter(session=session).select_related("asset")
-    total_items = items.count()
-    count_found = items.filter(status="found").count()
-    count_remaining = total_items - count_found
+    # دمج المسوحات المعلقة حتى تظهر العدادات محدثة
+    compact_session_events(session, settle_seconds=SCAN_EVENT_SETTLE_SECONDS)
 
+    # قائمة الأصول تُحمّل على صفحات عبر session_items_api
     return render(request, "inventory_app/session_live_scan.html", {
         "session": session,
-        "items": items,
-         "total_items": total_items,
+        "total_items": session.total_items,
         "show_copy_button": False,  # نسخ الأصل فقط في شاشة الإضافة
-        "count_found": count_found,
-        "count_remaining": count_remaining,
+        "count_found": session.found_count,
+        "count_remaining": session.remaining_count,
 })
 
 
 
 
+# ============================================================
+# API — أصول الجلسة على صفحات (للشاشة المباشرة)
+#   ?after=<id>&status=found|missing|new&q=<بداية الباركود>&limit=
+# ============================================================
+@query_budget(17)
+@login_required
+def session_items_api(request, session_id):
+    session = get_object_or_404(InventorySession, id=session_id)
+
+    if session.employee_id != request.user.id and not is_admin(request.user):
+        return JsonResponse({"status": "forbidden"}, status=403)
+
+    try:
+        after = int(request.GET.get("after") or 0)
+        limit = min(int(request.GET.get("limit") or ITEMS_PAGE_SIZE), ITEMS_PAGE_MAX)
+    except ValueError:
+        return JsonResponse({"status": "error", "message": "قيمة غير صحيحة"}, status=400)
+
+    status = request.GET.get("status") or None
+    if status and status not in dict(InventoryItem.STATUS_CHOICES):
+        return JsonResponse({"status": "error", "message": "حالة غير معروفة"}, status=400)
+
+    # الصفحة الأولى تعكس آخر المسوحات
+    if not after:
+        compact_session_events(session, settle_seconds=SCAN_EVENT_SETTLE_SECONDS)
+
+    items, next_cursor = session_items_page(
+        session,
+        after=after,
+        status=status,
+        barcode_prefix=request.GET.get("q", "").strip(),
+        limit=max(limit, 1),
+    )
+
+    return JsonResponse({"status": "ok", "items": items, "next": next_cursor})
+
+
+
 # ============================================================
 # API — تسجيل المسح (مُحسّن)
 # ============================================================
+@query_budget(7)
 @login_required
 @require_POST
 def scan_update_api(request, session_id):
     session = get_object_or_404(InventorySession, id=session_id)
 
-    if session.employee != request.user and not is_admin(request.user):
+    if session.employee_id != request.user.id and not is_admin(request.user):
         return JsonResponse({"status": "forbidden"}, status=403)
 
     barcode = request.POST.get("barcode", "").strip()
+    device_id = request.POST.get("device_id", "").strip()[:64]
+
+    result = record_scan_events(session, [(barcode, None)], device_id=device_id)[0]
+    return JsonResponse(result)
 
-    # 1) هل الباركود موجود في جلسة الجرد؟
-    item = InventoryItem.objects.filter(session=session, barcode=barcode).first()
 
-    if item:
-        item.status = "found"
-        item.scanned_at = timezone.now()
-        item.save()
 
+# ============================================================
+# API — تسجيل مسح دفعة باركودات (الماسحات اليدوية)
+# ============================================================
+SCAN_BATCH_MAX = 500
+
+
+def _parse_scan(entry):
+    """(barcode, scanned_at) من عنصر JSON — نص الباركود فقط أو {"barcode", "scanned_at"}"""
+    if isinstance(entry, dict):
+        barcode = str(entry.get("barcode") or "").strip()
+        try:
+            scanned_at = parse_datetime(str(entry.get("scanned_at") or ""))
+        except ValueError:
+            scanned_at = None
+    else:
+        barcode = str(entry or "").strip()
+        scanned_at = None
+
+    if scanned_at and timezone.is_naive(scanned_at):
+        scanned_at = timezone.make_aware(scanned_at)
+
+    # لا نقبل وقت مسح في المستقبل من ساعة الجهاز
+    if scanned_at and scanned_at > timezone.now():
+        scanned_at = None
+
+    return barcode, scanned_at
+
+
+@query_budget(8)
+@login_required
+@require_POST
+def scan_batch_api(request, session_id):
+    """
+    يستقبل JSON بالشكل:
+    {"device_id": "...", "scans": [{"barcode": "...", "scanned_at": "2025-01-01T10:00:00Z"}, ...]}
+    ويرجع نتيجة لكل باركود بنفس شكل scan_update_api.
+    المسوحات تُسجل في سجل المسح وتُدمج في العناصر لاحقًا.
+    """
+    session = get_object_or_404(InventorySession, id=session_id)
+
+    if session.employee_id != request.user.id and not is_admin(request.user):
+        return JsonResponse({"status": "forbidden"}, status=403)
+
+    try:
+        data = json.loads(request.body.decode("utf-8"))
+        raw_scans = data.get("scans") or []
+        device_id = str(data.get("device_id") or "").strip()[:64]
+    except (ValueError, AttributeError):
+        return JsonResponse({"status": "error", "message": "صيغة البيانات غير صحيحة"}, status=400)
+
+    if not isinstance(raw_scans, list):
+        return JsonResponse({"status": "error", "message": "صيغة البيانات غير صحيحة"}, status=400)
+
+    if len(raw_scans) > SCAN_BATCH_MAX:
         return JsonResponse({
-            "status": "found",
-            "barcode": barcode,
-            "description": item.asset.description if item.asset else "",
-        })
+            "status": "error",
+            "message": f"الحد الأقصى {SCAN_BATCH_MAX} باركود في الطلب الواحد",
+        }, status=400)
 
-    # 2) هل الأصل موجود في النظام لكن لم يتم إضافته للجلسة؟
-    asset = Asset.objects.filter(barcode=barcode).first()
+    scans = [scan for scan in map(_parse_scan, raw_scans) if scan[0]]
 
-    if asset:
-        # لم يكن في الجلسة — نضيفه تلقائياً
-        new_item = InventoryItem.objects.create(
-            session=session,
-            asset=asset,
-            barcode=barcode,
-            status="found",
-            scanned_at=timezone.now(),
-            added_manually=False
-        )
+    return JsonResponse({
+        "status": "success",
+        "results": record_scan_events(session, scans, device_id=device_id),
+    })
 
+
+# ============================================================
+# API — مزامنة المسوحات المحفوظة على الجهاز (بدون اتصال)
+# ============================================================
+@query_budget(21)
+@login_required
+@require_POST
+def scan_sync_api(request, session_id):
+    """
+    يستقبل JSON بالشكل:
+    {"device_id": "...", "since": <cursor>,
+     "scans": [{"id": "<uuid>", "barcode": "...", "scanned_at": "..."}, ...]}
+
+    إعادة إرسال نفس id لا تسجل المسح مرتين، فيمكن للجهاز إعادة المحاولة بأمان.
+    يرجع نتيجة كل مسح + ما تغير في الجلسة بعد since من كل الأجهزة.
+    """
+    session = get_object_or_404(InventorySession, id=session_id)
+
+    if session.employee_id != request.user.id and not is_admin(request.user):
+        return JsonResponse({"status": "forbidden"}, status=403)
+
+    try:
+        data = json.loads(request.body.decode("utf-8"))
+        raw_scans = data.get("scans") or []
+        device_id = str(data.get("device_id") or "").strip()[:64]
+        since = int(data.get("since") or 0)
+    except (ValueError, TypeError, AttributeError):
+        return JsonResponse({"status": "error", "message": "صيغة البيانات غير صحيحة"}, status=400)
+
+    if not isinstance(raw_scans, list):
+        return JsonResponse({"status": "error", "message": "صيغة البيانات غير صحيحة"}, status=400)
+
+    if len(raw_scans) > SCAN_BATCH_MAX:
         return JsonResponse({
-            "status": "found_new_in_system",
-            "barcode": barcode,
-            "description": asset.description,
-        })
+            "status": "error",
+            "message": f"الحد الأقصى {SCAN_BATCH_MAX} باركود في الطلب الواحد",
+        }, status=400)
+
+    scans = []
+    client_ids = []
+    for entry in raw_scans:
+        barcode, scanned_at = _parse_scan(entry)
+        try:
+            client_id = uuid.UUID(str(entry.get("id")))
+        except (AttributeError, ValueError):
+            return JsonResponse({"status": "error", "message": "معرف المسح غير صحيح"}, status=400)
+
+        if barcode:
+            scans.append((barcode, scanned_at))
+            client_ids.append(client_id)
+
+    results = record_scan_events(session, scans, device_id=device_id, client_ids=client_ids)
+    compact_session_events(session, settle_seconds=SCAN_EVENT_SETTLE_SECONDS)
+
+    items, cursor, has_more = session_scan_delta(session, since)
 
-    # 3) باركود غير موجود نهائيًا → يعرض شاشة إضافة أصل جديد
     return JsonResponse({
-        "status": "not_in_list",
-        "barcode": barcode
+        "status": "success",
+        "results": [
+            dict(result, id=str(client_id))
+            for result, client_id in zip(results, client_ids)
+        ],
+        "delta": items,
+        "cursor": cursor,
+        "has_more": has_more,
+        "counters": {
+            "total_items": session.total_items,
+            "found_count": session.found_count,
+            "remaining_count": session.remaining_count,
+        },
     })
 
+
+@query_budget(10, cache_queries=10)
 @login_required
 @require_POST
 def manual_confirm_api(request, session_id):
     session = get_object_or_404(InventorySession, id=session_id)
 
-    if session.employee != request.user and not is_admin(request.user):
+    if session.employee_id != request.user.id and not is_admin(request.user):
         return JsonResponse({"status": "forbidden"}, status=403)
 
     # قراءة البيانات القادمة من fetch
-    import json
     data = json.loads(request.body.decode("utf-8"))
     barcode = data.get("barcode")
 
-    item = InventoryItem.objects.filter(session=session, barcode=barcode).first()
+    with transaction.atomic():
+        item = InventoryItem.objects.select_for_update().filter(
+            session=session, barcode=barcode
+        ).first()
+
+        if not item:
+            return JsonResponse({"status": "not_found"}, status=404)
 
-    if not item:
-        return JsonResponse({"status": "not_found"}, status=404)
+        # تأكيد أصل موجود يدويًا
+        previous_status = item.status
+        item.status = "found"
+        item.scanned_at = timezone.now()
+        item.save(update_fields=["status", "scanned_at"])
 
-    # تأكيد أصل موجود يدويًا
-    item.status = "found"
-    item.scanned_at = timezone.now()
-    item.save()
+        if previous_status != "found":
+            session.bump_counters(found=1, **{previous_status: -1})
+            record_item_change(session, item.barcode, "manual_confirm")
 
     return JsonResponse({"status": "ok"})
 
@@ -295,10 +457,11 @@ def get_asset_api(request, barcode):
 # ============================================================
 @login_required
 @require_POST
+@transaction.atomic
 def add_new_asset_api(request, session_id):
     session = get_object_or_404(InventorySession, id=session_id)
 
-    if session.employee != request.user and not is_admin(request.user):
+    if session.employee_id != request.user.id and not is_admin(request.user):
         return JsonResponse({"status": "forbidden"}, status=403)
 
     # لو جاي من النسخ
@@ -337,6 +500,8 @@ def add_new_asset_api(request, session_id):
             status="new",
             added_manually=True
         )
+        session.bump_counters(new=1)
+        record_item_change(session, new_barcode, "added")
 
         return JsonResponse({"status": "success"})
 
@@ -366,6 +531,8 @@ def add_new_asset_api(request, session_id):
         status="new",
         added_manually=True
     )
+    session.bump_counters(new=1)
+    record_item_change(session, barcode, "added")
 
     return JsonResponse({"status": "new_added"})
 
@@ -379,13 +546,16 @@ def add_new_asset_api(request, session_id):
 def close_session(request, session_id):
     session = get_object_or_404(InventorySession, id=session_id)
 
-    if session.employee != request.user and not is_admin(request.user):
+    if session.employee_id != request.user.id and not is_admin(request.user):
         return JsonResponse({"status": "forbidden"}, status=403)
 
+    compact_session_events(session, settle_seconds=SCAN_EVENT_SETTLE_SECONDS)
+
     # تحويل الجلسة بدلاً من إغلاقها
     session.status = "submitted_to_supervisor"
     session.end_time = timezone.now()
     session.save()
+    invalidate_session_stats()
 
     return JsonResponse({"status": "success"})
 
@@ -400,11 +570,14 @@ def close_session(request, session_id):
 def submit_to_supervisor(request, session_id):
     session = get_object_or_404(InventorySession, id=session_id)
 
-    if session.employee != request.user and not is_admin(request.user):
+    if session.employee_id != request.user.id and not is_admin(request.user):
         return JsonResponse({"status": "forbidden"}, status=403)
 
+    compact_session_events(session, settle_seconds=SCAN_EVENT_SETTLE_SECONDS)
+
     session.status = "submitted_to_supervisor"
     session.save()
+    invalidate_session_stats()
 
     return JsonResponse({"status": "success"})
 
@@ -458,6 +631,7 @@ def supervisor_approve_session(request, session_id):
     session.status = "supervisor_approved"
     session.supervisor = request.user
     session.save()
+    invalidate_session_stats()
 
     return JsonResponse({"status": "success"})
 
@@ -479,6 +653,7 @@ def supervisor_reject_session(request, session_id):
     session.supervisor = request.user
     session.supervisor_comment = comment
     session.save()
+    invalidate_session_stats()
 
     return JsonResponse({"status": "success"})
 
@@ -536,6 +711,7 @@ def admin_reopen_session(request, session_id):
     session.supervisor = None
     session.supervisor_comment = ""
     session.save()
+    invalidate_session_stats()
 
     return JsonResponse({"status": "success"})
 
@@ -554,6 +730,7 @@ def admin_delete_session(request, session_id):
     try:
         session = InventorySession.objects.get(id=session_id)
         session.delete()
+        invalidate_session_stats()
         return JsonResponse({"status": "success"})
 
     except InventorySession.DoesNotExist:
@@ -568,23 +745,10 @@ def admin_delete_session(request, session_id):
 def export_session_pdf(request, session_id):
 
     session = get_object_or_404(InventorySession, id=session_id)
-    items = InventoryItem.objects.filter(session=session).select_related("asset")
 
-    html = render_to_string("inventory_app/report_template.html", {
-        "session": session,
-        "items": items,
-    })
-
-    from xhtml2pdf import pisa
-    response = HttpResponse(content_type="application/pdf")
-    response['Content-Disposition'] = f'attachment; filename="session_{session_id}.pdf"'
-
-    pisa_status = pisa.CreatePDF(html, dest=response)
-
-    if pisa_status.err:
-        return HttpResponse("خطأ أثناء إنشاء ملف PDF", status=500)
-
-    return response
+    # إنشاء PDF للجلسات الكبيرة يتجاوز مهلة الطلب — يُنفذ في الخلفية
+    job = enqueue_job("export_session_pdf", {"session_id": session.id}, request.user)
+    return redirect("jobs_app:job_detail", job_id=job.id)
 
 
 
@@ -595,34 +759,24 @@ def export_session_pdf(request, session_id):
 def export_session_excel(request, session_id):
 
     session = get_object_or_404(InventorySession, id=session_id)
+    compact_session_events(session, settle_seconds=SCAN_EVENT_SETTLE_SECONDS)
     items = InventoryItem.objects.filter(session=session).select_related("asset")
 
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Inventory Session"
-
     headers = ["الباركود", "الوصف", "الحالة", "وقت المسح"]
-    ws.append(headers)
-
-    for cell in ws[1]:
-        cell.font = Font(bold=True)
-        cell.alignment = Alignment(horizontal="center")
-
-    for item in items:
-        ws.append([
+    rows = (
+        [
             item.barcode,
-            item.asset.description,
+            item.asset.description if item.asset else "",
             item.status,
             item.scanned_at.strftime("%Y-%m-%d %H:%M") if item.scanned_at else "-",
-        ])
-
-    response = HttpResponse(
-        content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        ]
+        for item in items.iterator(chunk_size=2000)
     )
-    response["Content-Disposition"] = f'attachment; filename="session_{session_id}.xlsx"'
 
-    wb.save(response)
-    return response
+    return stream_excel_sheets(
+        [("Inventory Session", headers, rows)],
+        f"session_{session_id}.xlsx",
+    )
 
 
 
@@ -634,11 +788,7 @@ def admin_dashboard(request):
     if not is_admin(request.user):
         return HttpResponseForbidden("غير مصرح لك (Admin فقط)")
 
-    total_sessions = InventorySession.objects.count()
-    completed = InventorySession.objects.filter(status="completed").count()
-    submitted = InventorySession.objects.filter(status="submitted_to_supervisor").count()
-    approved = InventorySession.objects.filter(status="supervisor_approved").count()
-    rejected = InventorySession.objects.filter(status="supervisor_rejected").count()
+    sessions = dashboard_kpis()["sessions"]
 
     latest_sessions = InventorySession.objects.select_related(
         "employee", "region", "building"
@@ -649,11 +799,11 @@ def admin_dashboard(request):
         .order_by("-count")[:5]
 
     return render(request, "inventory_app/admin_dashboard.html", {
-        "total_sessions": total_sessions,
-        "completed": completed,
-        "submitted": submitted,
-        "approved": approved,
-        "rejected": rejected,
+        "total_sessions": sessions["total"],
+        "completed": sessions["completed"],
+        "submitted": sessions["submitted_to_supervisor"],
+        "approved": sessions["supervisor_approved"],
+        "rejected": sessions["supervisor_rejected"],
         "latest_sessions": latest_sessions,
         "top_users": top_users,
     })
@@ -673,6 +823,7 @@ def admin_delete_session(request, session_id):
     try:
         session = InventorySession.objects.get(id=session_id)
         session.delete()
+        invalidate_session_stats()
         return JsonResponse({"status": "success"})
 
     except InventorySession.DoesNotExist:
@@ -683,6 +834,9 @@ def admin_delete_session(request, session_id):
 # ============================================================
 # استيراد الأصول
 # ============================================================
+IMPORT_ERRORS_SHOWN = 500
+
+
 @login_required
 def admin_import_assets(request):
     if not is_admin(request.user):
@@ -693,101 +847,39 @@ def admin_import_assets(request):
         file = request.FILES["excel_file"]
 
         try:
-            wb = openpyxl.load_workbook(file, data_only=True)
+            wb = openpyxl.load_workbook(file, read_only=True, data_only=True)
             ws = wb.active
+            rows = ws.iter_rows(values_only=True)
+            header = next(rows, None) or []
         except:
             messages.error(request, "❌ خطأ: الملف غير صالح، تأكد أنه Excel بصيغة .xlsx")
             return redirect("inventory_app:admin_import_assets")
 
-        headers = [str(c.value).strip() if c.value else "" for c in ws[1]]
+        headers = [str(c).strip() if c else "" for c in header]
         col = {name: index for index, name in enumerate(headers)}
 
-        required_cols = [
-            "asset_code", "barcode", "old_barcode", "description",
-            "main_category", "type", "sub_category",
-            "region_name", "city_name", "building_name",
-            "status", "condition",
-            "custodian_number", "custodian_name", "custodian_type",
-            "created_at", "created_by_username",
-        ]
-
-        missing = [c for c in required_cols if c not in col]
+        missing = [c for c in ASSET_IMPORT_COLUMNS if c not in col]
         if missing:
+            wb.close()
             messages.error(request, f"❌ الأعمدة المفقودة: {', '.join(missing)}")
             return redirect("inventory_app:admin_import_assets")
 
-        added = 0
-        skipped = 0
-        errors = []
-
-        with transaction.atomic():
-            for row_number, row in enumerate(ws.iter_rows(min_row=2), start=2):
-
-                try:
-                    get = lambda field: row[col[field]].value if col[field] < len(row) else None
-
-                    asset_code       = get("asset_code")
-                    barcode          = get("barcode")
-                    old_barcode      = get("old_barcode")
-                    description      = get("description")
-                    main_category    = get("main_category")
-                    type_            = get("type")
-                    sub_category     = get("sub_category")
-                    region_name      = get("region_name")
-                    city_name        = get("city_name")
-                    building_name    = get("building_name")
-                    status           = get("status")
-                    condition        = get("condition")
-                    custodian_number = get("custodian_number")
-                    custodian_name   = get("custodian_name")
-                    custodian_type   = get("custodian_type")
-                    created_at       = get("created_at")
-                    created_by_username = get("created_by_username")
-
-                    if not asset_code or not barcode:
-                        skipped += 1
-                        errors.append(f"سطر {row_number}: asset_code أو barcode فارغ")
-                        continue
-
-                    region = Region.objects.filter(name=str(region_name).strip()).first()
-                    city = City.objects.filter(name=str(city_name).strip()).first()
-                    building = Building.objects.filter(name=str(building_name).strip()).first()
-
-                    if not region or not city or not building:
-                        skipped += 1
-                        errors.append(f"سطر {row_number}: بيانات الموقع غير صحيحة")
-                        continue
-
-                    Asset.objects.create(
-                        asset_code=asset_code,
-                        barcode=barcode,
-                        old_barcode=old_barcode,
-                        description=description,
-                        main_category=main_category,
-                        type=type_,
-                        sub_category=sub_category,
-                        region=region,
-                        city=city,
-                        building=building,
-                        status=status,
-                        condition=condition,
-                        custodian_number=custodian_number,
-                        custodian_name=custodian_name,
-                        custodian_type=custodian_type,
-                        created_at=created_at,
-                        created_by_username=created_by_username,
-                    )
-
-                    added += 1
-
-                except Exception as e:
-                    skipped += 1
-                    errors.append(f"سطر {row_number}: {str(e)}")
+        # الملف كله معاملة واحدة: الصفوف غير الصالحة تُتجاوز وتُسجل، أما خطأ
+        # قاعدة البيانات في أي دفعة فيُلغي الدفعات السابقة أيضًا (لا استيراد جزئي)
+        try:
+            with transaction.atomic():
+                added, skipped, errors = import_assets_rows(rows, col)
+        except DatabaseError:
+            messages.error(request, "❌ تعذر حفظ الأصول — لم يُستورد أي صف من الملف")
+            return redirect("inventory_app:admin_import_assets")
+        finally:
+            wb.close()
 
         return render(request, "inventory_app/admin_import_result.html", {
             "added": added,
             "skipped": skipped,
-            "errors": errors,
+            "errors": errors[:IMPORT_ERRORS_SHOWN],
+            "errors_hidden": max(len(errors) - IMPORT_ERRORS_SHOWN, 0),
         })
 
     return render(request, "inventory_app/admin_import_assets.html")
@@ -802,96 +894,9 @@ def backup_full_system(request):
     if not is_admin(request.user):
         return HttpResponseForbidden("غير مصرح لك")
 
-    wb = openpyxl.Workbook()
-
-    # ============================================================
-    # Sheet 1 — ملخص الجلسات
-    # ============================================================
-    ws1 = wb.active
-    ws1.title = "Sessions_Summary"
-
-    headers1 = [
-        "session_id", "employee",
-        "region", "city", "building",
-        "status", "start_time", "end_time",
-        "total_items", "found_items",
-        "missing_items", "new_items",
-    ]
-    ws1.append(headers1)
-
-    sessions = InventorySession.objects.select_related(
-        "employee", "region", "city", "building"
-    )
-
-    for session in sessions:
-        items = InventoryItem.objects.filter(session=session)
-
-        ws1.append([
-            session.id,
-            session.employee.username if session.employee else "",
-            session.region.name if session.region else "",
-            session.city.name if session.city else "",
-            session.building.name if session.building else "",
-            session.status,
-            session.start_time.strftime("%Y-%m-%d %H:%M") if session.start_time else "",
-            session.end_time.strftime("%Y-%m-%d %H:%M") if session.end_time else "",
-            items.count(),
-            items.filter(status="found").count(),
-            items.filter(status="missing").count(),
-            items.filter(status="new").count(),
-        ])
-
-    for cell in ws1[1]:
-        cell.font = Font(bold=True)
-        cell.alignment = Alignment(horizontal="center")
-
-
-    # ============================================================
-    # Sheet 2 — تفاصيل العناصر
-    # ============================================================
-    ws2 = wb.create_sheet(title="Items_Details")
-
-    headers2 = [
-        "session_id", "asset_code", "barcode",
-        "description", "status", "scanned_at",
-        "region", "city", "building",
-    ]
-    ws2.append(headers2)
-
-    items = InventoryItem.objects.select_related(
-        "session", "asset",
-        "asset__region", "asset__city", "asset__building"
-    )
-
-    for item in items:
-        ws2.append([
-            item.session.id,
-            item.asset.asset_code if item.asset else "",
-            item.barcode,
-            item.asset.description if item.asset else "",
-            item.status,
-            item.scanned_at.strftime("%Y-%m-%d %H:%M") if item.scanned_at else "",
-            item.asset.region.name if item.asset and item.asset.region else "",
-            item.asset.city.name if item.asset and item.asset.city else "",
-            item.asset.building.name if item.asset and item.asset.building else "",
-        ])
-
-    for cell in ws2[1]:
-        cell.font = Font(bold=True)
-        cell.alignment = Alignment(horizontal="center")
-
-
-
-# ============================================================
-# تحميل النسخة الاحتياطية الكاملة
-# ============================================================
-    response = HttpResponse(
-        content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-    )
-    response["Content-Disposition"] = 'attachment; filename="full_inventory_backup.xlsx"'
-
-    wb.save(response)
-    return response
+    # تُبنى في مهمة خلفية (inventory_app/jobs.py) ثم تُحمّل من صفحة المهمة
+    job = enqueue_job("backup_full_system", user=request.user)
+    return redirect("jobs_app:job_detail", job_id=job.id)
 
 
 
@@ -903,12 +908,15 @@ def backup_full_system(request):
 def save_draft_session(request, session_id):
     session = get_object_or_404(InventorySession, id=session_id)
 
-    if session.employee != request.user and not is_admin(request.user):
+    if session.employee_id != request.user.id and not is_admin(request.user):
         return JsonResponse({"status": "forbidden"}, status=403)
 
+    compact_session_events(session, settle_seconds=SCAN_EVENT_SETTLE_SECONDS)
+
     # فقط نحفظ بدون تغيير الحالة
     session.status = "draft"
     session.save()
+    invalidate_session_stats()
 
     return JsonResponse({"status": "success"})
 
@@ -0,0 +1,17 @@
+from django.contrib import admin
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = (
+        'id', 'task', 'status', 'progress', 'attempts',
+        'created_by', 'created_at', 'finished_at', 'expires_at'
+    )
+    list_filter = (
+        'status', 'task'
+    )
+    search_fields = (
+        'id', 'task', 'message'
+    )
+    raw_id_fields = ('created_by',)
@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+from django.utils.module_loading import autodiscover_modules
+
+
+class JobsAppConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'jobs_app'
+    verbose_name = "المهام الخلفية"
+
+    def ready(self):
+        # تسجيل المهام المعرفة في jobs.py داخل كل تطبيق
+        autodiscover_modules("jobs")
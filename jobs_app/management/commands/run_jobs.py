@@ -0,0 +1,79 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+
+from jobs_app.models import Job
+from jobs_app.utils import claim_next_job, purge_expired_jobs, requeue_stale_jobs, run_job
+
+
+# الصيانة (المهام المتوقفة والملفات المنتهية) مرة كل دقيقة
+MAINTENANCE_INTERVAL = 60
+
+
+def _execute(job_id):
+    """تُنفذ داخل خيط أو عملية فرعية — لكل منها اتصال قاعدة بيانات خاص"""
+    try:
+        run_job(Job.objects.get(id=job_id))
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = "عامل المهام الخلفية — يستلم المهام من قاعدة البيانات وينفذها"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=2, help="عدد المهام المتزامنة")
+        parser.add_argument(
+            "--pool", choices=["thread", "process"], default="thread",
+            help="thread للمهام التي تنتظر القرص/القاعدة، process للمهام الثقيلة حسابيًا",
+        )
+        parser.add_argument("--poll", type=float, default=2.0, help="فاصل الاستعلام عن مهام جديدة (ثواني)")
+        parser.add_argument("--once", action="store_true", help="تنفيذ المهام الجاهزة ثم الخروج")
+
+    def handle(self, *args, **options):
+        workers = max(options["workers"], 1)
+
+        if options["pool"] == "process":
+            # لا تُورث اتصالات قاعدة البيانات للعمليات الفرعية
+            connections.close_all()
+            executor = ProcessPoolExecutor(workers, initializer=django.setup)
+        else:
+            executor = ThreadPoolExecutor(workers)
+
+        self.stdout.write(f"▶ عامل المهام: {workers} ({options['pool']})")
+
+        running = set()
+        maintained_at = 0
+
+        try:
+            while True:
+                if time.monotonic() - maintained_at > MAINTENANCE_INTERVAL:
+                    requeue_stale_jobs()
+                    purge_expired_jobs()
+                    maintained_at = time.monotonic()
+
+                while len(running) < workers:
+                    job = claim_next_job()
+                    if job is None:
+                        break
+                    self.stdout.write(f"• {job.task} #{job.id} (محاولة {job.attempts})")
+                    running.add(executor.submit(_execute, job.id))
+
+                if options["once"] and not running:
+                    break
+
+                done, running = wait(running, timeout=options["poll"], return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future.exception():
+                        self.stderr.write(f"✘ خطأ في العامل: {future.exception()}")
+
+                if not running and not done:
+                    time.sleep(options["poll"])
+
+        except KeyboardInterrupt:
+            self.stdout.write("⏹ إيقاف — انتظار المهام الجارية...")
+        finally:
+            executor.shutdown(wait=True)
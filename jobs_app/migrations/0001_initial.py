@@ -0,0 +1,44 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:08
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task', models.CharField(max_length=100, verbose_name='المهمة')),
+                ('params', models.JSONField(blank=True, default=dict, verbose_name='المعطيات')),
+                ('status', models.CharField(choices=[('queued', 'في الانتظار'), ('running', 'قيد التنفيذ'), ('succeeded', 'مكتملة'), ('failed', 'فشلت'), ('expired', 'منتهية الصلاحية')], default='queued', max_length=20, verbose_name='الحالة')),
+                ('progress', models.PositiveSmallIntegerField(default=0, verbose_name='نسبة التقدم')),
+                ('message', models.TextField(blank=True, default='', verbose_name='الرسالة')),
+                ('result_file', models.CharField(blank=True, default='', max_length=500, verbose_name='الملف الناتج')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='عدد المحاولات')),
+                ('max_attempts', models.PositiveSmallIntegerField(default=3, verbose_name='أقصى عدد محاولات')),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now, verbose_name='التنفيذ بعد')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='وقت الإنشاء')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='وقت البدء')),
+                ('heartbeat_at', models.DateTimeField(blank=True, null=True, verbose_name='آخر نبضة')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='وقت الانتهاء')),
+                ('expires_at', models.DateTimeField(blank=True, null=True, verbose_name='انتهاء صلاحية الملف')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='أنشأها')),
+            ],
+            options={
+                'verbose_name': 'مهمة خلفية',
+                'verbose_name_plural': 'المهام الخلفية',
+                'indexes': [models.Index(fields=['status', 'run_after'], name='job_status_run_after')],
+            },
+        ),
+    ]
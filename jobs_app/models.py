@@ -0,0 +1,61 @@
+from django.db import models
+from django.contrib.auth.models import User
+from django.utils import timezone
+
+
+# ======================================
+#   مهمة خلفية (تصدير / نسخ احتياطي / استيراد)
+#   يُنفذها أمر run_jobs خارج طلبات الويب
+# ======================================
+class Job(models.Model):
+
+    STATUS_CHOICES = [
+        ('queued', 'في الانتظار'),
+        ('running', 'قيد التنفيذ'),
+        ('succeeded', 'مكتملة'),
+        ('failed', 'فشلت'),
+        ('expired', 'منتهية الصلاحية'),
+    ]
+
+    task = models.CharField(max_length=100, verbose_name="المهمة")
+    params = models.JSONField(default=dict, blank=True, verbose_name="المعطيات")
+
+    status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES,
+        default='queued', verbose_name="الحالة"
+    )
+    progress = models.PositiveSmallIntegerField(default=0, verbose_name="نسبة التقدم")
+    message = models.TextField(blank=True, default="", verbose_name="الرسالة")
+
+    # الملف الناتج — مسار نسبي داخل MEDIA_ROOT
+    result_file = models.CharField(max_length=500, blank=True, default="", verbose_name="الملف الناتج")
+
+    created_by = models.ForeignKey(
+        User, on_delete=models.SET_NULL,
+        null=True, blank=True, verbose_name="أنشأها"
+    )
+
+    # إعادة المحاولة
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name="عدد المحاولات")
+    max_attempts = models.PositiveSmallIntegerField(default=3, verbose_name="أقصى عدد محاولات")
+    run_after = models.DateTimeField(default=timezone.now, verbose_name="التنفيذ بعد")
+
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="وقت الإنشاء")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="وقت البدء")
+    heartbeat_at = models.DateTimeField(null=True, blank=True, verbose_name="آخر نبضة")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="وقت الانتهاء")
+    expires_at = models.DateTimeField(null=True, blank=True, verbose_name="انتهاء صلاحية الملف")
+
+    class Meta:
+        verbose_name = "مهمة خلفية"
+        verbose_name_plural = "المهام الخلفية"
+        indexes = [
+            models.Index(fields=["status", "run_after"], name="job_status_run_after"),
+        ]
+
+    def __str__(self):
+        return f"{self.task} #{self.id} ({self.status})"
+
+    @property
+    def is_finished(self):
+        return self.status in ("succeeded", "failed", "expired")
@@ -0,0 +1,133 @@
+import datetime
+import shutil
+import tempfile
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from inventory_app.models import InventorySession, InventoryItem
+from locations_app.models import Region, City, Building
+from .models import Job
+from .utils import job_task, enqueue_job, claim_job, run_job, run_pending_jobs, requeue_stale_jobs
+
+
+FAILURES = {"left": 0}
+
+
+@job_task("test_flaky", max_attempts=2)
+def flaky_task(ctx):
+    if FAILURES["left"]:
+        FAILURES["left"] -= 1
+        raise RuntimeError("boom")
+    return "done"
+
+
+class JobRunnerTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="admin", password="x", is_superuser=True)
+        region = Region.objects.create(name="الرياض")
+        city = City.objects.create(region=region, name="الرياض")
+        building = Building.objects.create(city=city, name="B1")
+        session = InventorySession.objects.create(
+            employee=cls.user, region=region, city=city, building=building,
+        )
+        InventoryItem.objects.create(session=session, barcode="X-1", status="new")
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.client.force_login(self.user)
+
+    def test_backup_runs_in_background(self):
+        response = self.client.get(reverse("inventory_app:backup_full_system"))
+        job = Job.objects.get()
+        self.assertRedirects(response, reverse("jobs_app:job_detail", args=[job.id]))
+        self.assertEqual(job.status, "queued")
+
+        self.assertEqual(run_pending_jobs(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, "succeeded")
+        self.assertEqual(job.progress, 100)
+
+        status = self.client.get(reverse("jobs_app:job_status_api", args=[job.id])).json()
+        self.assertTrue(status["finished"])
+
+        download = self.client.get(status["download_url"])
+        self.assertEqual(download.status_code, 200)
+        self.assertTrue(b"".join(download.streaming_content).startswith(b"PK"))
+
+    def test_report_export_job(self):
+        response = self.client.get(reverse("reports_app:building_status_report") + "?export=1")
+        job = Job.objects.get()
+        self.assertRedirects(response, reverse("jobs_app:job_detail", args=[job.id]))
+
+        run_pending_jobs()
+        job.refresh_from_db()
+        self.assertEqual(job.status, "succeeded", job.message)
+        self.assertTrue(job.result_file.endswith(".xlsx"))
+
+    def test_retry_with_backoff_then_fail(self):
+        FAILURES["left"] = 1
+        job = enqueue_job("test_flaky", user=self.user)
+
+        with self.assertLogs("jobs_app", "ERROR"):
+            run_pending_jobs()
+        job.refresh_from_db()
+        self.assertEqual(job.status, "queued")
+        self.assertEqual(job.attempts, 1)
+        self.assertGreater(job.run_after, timezone.now())
+
+        # لم يحن موعد إعادة المحاولة
+        self.assertEqual(run_pending_jobs(), 0)
+
+        Job.objects.filter(id=job.id).update(run_after=timezone.now())
+        run_pending_jobs()
+        job.refresh_from_db()
+        self.assertEqual(job.status, "succeeded")
+        self.assertEqual(job.message, "done")
+
+        FAILURES["left"] = 2
+        job = enqueue_job("test_flaky")
+        with self.assertLogs("jobs_app", "ERROR"):
+            run_pending_jobs()
+            Job.objects.filter(id=job.id).update(run_after=timezone.now())
+            run_pending_jobs()
+        job.refresh_from_db()
+        self.assertEqual(job.status, "failed")
+        self.assertIn("boom", job.message)
+
+    def test_claim_specific_job_leaves_queue_alone(self):
+        other = enqueue_job("test_flaky")
+        mine = enqueue_job("test_flaky", user=self.user)
+
+        run_job(claim_job(mine.id))
+        self.assertIsNone(claim_job(mine.id))
+
+        other.refresh_from_db()
+        self.assertEqual(other.status, "queued")
+        self.assertEqual(Job.objects.get(id=mine.id).status, "succeeded")
+
+    def test_stale_running_job_is_requeued(self):
+        job = enqueue_job("test_flaky")
+        Job.objects.filter(id=job.id).update(
+            status="running", attempts=1,
+            heartbeat_at=timezone.now() - datetime.timedelta(hours=1),
+        )
+
+        self.assertEqual(requeue_stale_jobs(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, "queued")
+
+    def test_other_users_cannot_see_job(self):
+        job = enqueue_job("test_flaky", user=self.user)
+        other = User.objects.create_user(username="emp", password="x")
+        self.client.force_login(other)
+        response = self.client.get(reverse("jobs_app:job_status_api", args=[job.id]))
+        self.assertEqual(response.status_code, 403)
@@ -0,0 +1,10 @@
+from django.urls import path
+from . import views
+
+app_name = "jobs_app"
+
+urlpatterns = [
+    path("<int:job_id>/", views.job_detail_view, name="job_detail"),
+    path("<int:job_id>/status/", views.job_status_api, name="job_status_api"),
+    path("<int:job_id>/download/", views.job_download_view, name="job_download"),
+]
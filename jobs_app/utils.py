@@ -0,0 +1,215 @@
+import logging
+import os
+import shutil
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+
+logger = logging.getLogger("jobs_app")
+
+
+# =======================================================
+#   ⚙️ إعدادات المهام الخلفية
+# =======================================================
+# مدة الاحتفاظ بالملف الناتج (ثواني)
+JOB_RESULT_TTL = getattr(settings, "JOB_RESULT_TTL", 24 * 3600)
+
+# مهمة "قيد التنفيذ" بدون نبضة طوال هذه المدة تُعتبر متوقفة (توقف العامل)
+JOB_STALE_SECONDS = getattr(settings, "JOB_STALE_SECONDS", 15 * 60)
+
+# التأخير قبل إعادة المحاولة — يتضاعف مع كل محاولة
+JOB_RETRY_DELAY = getattr(settings, "JOB_RETRY_DELAY", 30)
+
+# مجلد النتائج داخل MEDIA_ROOT
+JOB_RESULTS_DIR = "jobs"
+
+# أقل فاصل بين تحديثين لنسبة التقدم في قاعدة البيانات
+PROGRESS_INTERVAL = 2
+
+
+# =======================================================
+#   📋 سجل المهام — كل تطبيق يعرّف مهامه في jobs.py
+# =======================================================
+JOB_TASKS = {}
+
+
+def job_task(name, max_attempts=3):
+    """
+    تسجيل دالة كمهمة خلفية: func(ctx, **params) ترجع رسالة اختيارية.
+    المهام غير القابلة للتكرار بأمان (الاستيراد مثلاً) تُسجل بـ max_attempts=1.
+    """
+    def decorator(func):
+        JOB_TASKS[name] = (func, max_attempts)
+        return func
+    return decorator
+
+
+def enqueue_job(task, params=None, user=None):
+    if task not in JOB_TASKS:
+        raise ValueError(f"مهمة غير معروفة: {task}")
+
+    return Job.objects.create(
+        task=task,
+        params=params or {},
+        created_by=user if user is not None and user.is_authenticated else None,
+        max_attempts=JOB_TASKS[task][1],
+    )
+
+
+def job_result_path(job):
+    return os.path.join(settings.MEDIA_ROOT, job.result_file) if job.result_file else None
+
+
+class JobContext:
+    """ما تحصل عليه المهمة: تسجيل التقدم وملف النتيجة"""
+
+    def __init__(self, job):
+        self.job = job
+        self._reported_at = 0
+
+    def progress(self, done, total):
+        """تحديث نسبة التقدم (والنبضة) — بحد أقصى مرة كل PROGRESS_INTERVAL ثانية"""
+        now = time.monotonic()
+        if now - self._reported_at < PROGRESS_INTERVAL:
+            return
+        self._reported_at = now
+
+        percent = min(int(done * 100 / total), 99) if total else 0
+        Job.objects.filter(id=self.job.id).update(progress=percent, heartbeat_at=timezone.now())
+
+    def track(self, iterable, total, every=1000):
+        """تمرير عناصر مولّد مع تسجيل التقدم كل every عنصر"""
+        for done, value in enumerate(iterable, start=1):
+            yield value
+            if done % every == 0:
+                self.progress(done, total)
+
+    def result_path(self, filename):
+        """مسار ملف النتيجة داخل MEDIA_ROOT/jobs/<id>/ — المهمة تكتب فيه مباشرة"""
+        self.job.result_file = f"{JOB_RESULTS_DIR}/{self.job.id}/{filename}"
+        path = job_result_path(self.job)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+
+# =======================================================
+#   🏃 الاستلام والتنفيذ وإعادة المحاولة
+# =======================================================
+def claim_next_job():
+    """
+    استلام أقدم مهمة جاهزة. الاستلام بـ UPDATE مشروط بالحالة، فلا يستلم
+    عاملان نفس المهمة (بدون SELECT FOR UPDATE — يعمل على SQLite أيضًا).
+    """
+    now = timezone.now()
+    candidates = Job.objects.filter(status="queued", run_after__lte=now).order_by("run_after", "id")
+
+    for job_id in candidates.values_list("id", flat=True)[:10]:
+        job = claim_job(job_id)
+        if job:
+            return job
+
+    return None
+
+
+def claim_job(job_id):
+    """استلام مهمة محددة إن كانت ما زالت في الانتظار، وإلا None"""
+    now = timezone.now()
+    claimed = Job.objects.filter(id=job_id, status="queued").update(
+        status="running", started_at=now, heartbeat_at=now,
+        attempts=F("attempts") + 1, progress=0,
+    )
+    return Job.objects.get(id=job_id) if claimed else None
+
+
+def _remove_result(job_id):
+    shutil.rmtree(os.path.join(settings.MEDIA_ROOT, JOB_RESULTS_DIR, str(job_id)), ignore_errors=True)
+
+
+def fail_job(job, message):
+    """إعادة الجدولة بتأخير متضاعف، أو الفشل النهائي بعد آخر محاولة"""
+    _remove_result(job.id)
+    now = timezone.now()
+
+    if job.attempts < job.max_attempts:
+        delay = JOB_RETRY_DELAY * 2 ** max(job.attempts - 1, 0)
+        Job.objects.filter(id=job.id).update(
+            status="queued", run_after=now + timedelta(seconds=delay),
+            message=message, progress=0, result_file="",
+        )
+    else:
+        Job.objects.filter(id=job.id).update(
+            status="failed", message=message, result_file="",
+            finished_at=now, expires_at=now + timedelta(seconds=JOB_RESULT_TTL),
+        )
+
+
+def run_job(job):
+    """تنفيذ مهمة مُستلمة. أخطاء المهمة تُسجل ولا تُرفع."""
+    entry = JOB_TASKS.get(job.task)
+    ctx = JobContext(job)
+
+    try:
+        if entry is None:
+            raise LookupError(f"مهمة غير معروفة: {job.task}")
+        message = entry[0](ctx, **job.params)
+    except Exception as exc:
+        logger.exception("فشل تنفيذ المهمة %s", job)
+        fail_job(job, f"{type(exc).__name__}: {exc}")
+    else:
+        now = timezone.now()
+        Job.objects.filter(id=job.id).update(
+            status="succeeded", progress=100, message=message or "",
+            result_file=job.result_file, finished_at=now, heartbeat_at=now,
+            expires_at=now + timedelta(seconds=JOB_RESULT_TTL),
+        )
+
+    job.refresh_from_db()
+    return job
+
+
+def run_pending_jobs(limit=None):
+    """تنفيذ المهام الجاهزة في نفس العملية (للاختبارات والقياس)"""
+    done = 0
+    while limit is None or done < limit:
+        job = claim_next_job()
+        if job is None:
+            break
+        run_job(job)
+        done += 1
+    return done
+
+
+# =======================================================
+#   🧹 الصيانة الدورية (يستدعيها العامل)
+# =======================================================
+def requeue_stale_jobs():
+    """المهام التي توقف عاملها تُعامل كمحاولة فاشلة"""
+    cutoff = timezone.now() - timedelta(seconds=JOB_STALE_SECONDS)
+    stale = Job.objects.filter(status="running", heartbeat_at__lt=cutoff)
+
+    count = 0
+    for job in stale:
+        # لم تتغير منذ قراءتها — وإلا فالعامل ما زال حيًا
+        if Job.objects.filter(id=job.id, status="running", heartbeat_at=job.heartbeat_at).exists():
+            fail_job(job, "توقف العامل أثناء التنفيذ")
+            count += 1
+    return count
+
+
+def purge_expired_jobs():
+    """حذف ملفات النتائج المنتهية الصلاحية"""
+    ids = list(Job.objects.filter(
+        status__in=["succeeded", "failed"], expires_at__lt=timezone.now(),
+    ).values_list("id", flat=True))
+
+    for job_id in ids:
+        _remove_result(job_id)
+
+    Job.objects.filter(id__in=ids).update(status="expired", result_file="")
+    return len(ids)
@@ -0,0 +1,69 @@
+import os
+
+from django.contrib.auth.decorators import login_required
+from django.http import FileResponse, HttpResponse, HttpResponseForbidden, JsonResponse
+from django.shortcuts import get_object_or_404, render
+from django.urls import reverse
+
+from inventory_app.utils import is_admin
+from .models import Job
+from .utils import job_result_path
+
+
+def _user_job(request, job_id):
+    """المهمة لصاحبها أو للمدير فقط — None إذا لم يكن مصرحًا"""
+    job = get_object_or_404(Job, id=job_id)
+    if job.created_by_id != request.user.id and not is_admin(request.user):
+        return None
+    return job
+
+
+# ============================================================
+# صفحة متابعة المهمة (تستعلم عن الحالة كل ثانيتين)
+# ============================================================
+@login_required
+def job_detail_view(request, job_id):
+    job = _user_job(request, job_id)
+    if job is None:
+        return HttpResponseForbidden("غير مصرح لك")
+
+    return render(request, "jobs_app/job_detail.html", {"job": job})
+
+
+# ============================================================
+# API — حالة المهمة ونسبة التقدم
+# ============================================================
+@login_required
+def job_status_api(request, job_id):
+    job = _user_job(request, job_id)
+    if job is None:
+        return JsonResponse({"status": "forbidden"}, status=403)
+
+    return JsonResponse({
+        "status": job.status,
+        "status_display": job.get_status_display(),
+        "progress": job.progress,
+        "message": job.message,
+        "attempts": job.attempts,
+        "finished": job.is_finished,
+        "download_url": (
+            reverse("jobs_app:job_download", args=[job.id])
+            if job.status == "succeeded" and job.result_file else None
+        ),
+    })
+
+
+# ============================================================
+# تحميل الملف الناتج
+# ============================================================
+@login_required
+def job_download_view(request, job_id):
+    job = _user_job(request, job_id)
+    if job is None:
+        return HttpResponseForbidden("غير مصرح لك")
+
+    path = job_result_path(job)
+    if job.status != "succeeded" or not path or not os.path.exists(path):
+        return HttpResponse("الملف غير متوفر أو انتهت صلاحيته", status=410)
+
+    return FileResponse(open(path, "rb"), as_attachment=True, filename=os.path.basename(path))
@@ -4,3 +4,6 @@ class LocationsAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'locations_app'
     verbose_name = "إدارة المناطق والمدن والمباني"
+
+    def ready(self):
+        from . import signals  # noqa: F401
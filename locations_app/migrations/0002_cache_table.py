@@ -0,0 +1,19 @@
+from django.core.management import call_command
+from django.db import migrations
+
+
+def create_cache_table(apps, schema_editor):
+    # لا يفعل شيئًا إذا كانت الذاكرة المؤقتة خارج قاعدة البيانات (Redis)
+    call_command("createcachetable", database=schema_editor.connection.alias)
+
+
+class Migration(migrations.Migration):
+    """جدول الذاكرة المؤقتة المشتركة (DatabaseCache) — انظر CACHES في الإعدادات"""
+
+    dependencies = [
+        ('locations_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_cache_table, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import RegionGroup, Region, City, Building
+from .utils import invalidate_location_tree
+
+
+# =======================================================
+#   إبطال شجرة المواقع المخزنة عند أي تعديل
+# =======================================================
+@receiver(post_save, sender=RegionGroup)
+@receiver(post_save, sender=Region)
+@receiver(post_save, sender=City)
+@receiver(post_save, sender=Building)
+@receiver(post_delete, sender=RegionGroup)
+@receiver(post_delete, sender=Region)
+@receiver(post_delete, sender=City)
+@receiver(post_delete, sender=Building)
+def location_changed(sender, **kwargs):
+    invalidate_location_tree()
@@ -1,3 +1,74 @@
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import connection
 from django.test import TestCase
 
-# Create your tests here.
+from splasset.metrics import QueryTimer
+from .models import RegionGroup, Region, City, Building
+from .utils import LOCATION_IMPORT_COLUMNS, TREE_VERSION_KEY, import_location_rows, get_location_tree
+
+
+COL = {name: i for i, name in enumerate(LOCATION_IMPORT_COLUMNS)}
+
+
+class LocationImportTests(TestCase):
+
+    def test_only_missing_nodes_are_created(self):
+        group = RegionGroup.objects.create(name="الوسطى")
+        region = Region.objects.create(group=group, name="الرياض")
+        city = City.objects.create(region=region, name="الرياض")
+        Building.objects.create(city=city, name="B1")
+
+        added, skipped = import_location_rows([
+            ("الوسطى", "الرياض", "الرياض", "B1", None),   # موجود بالكامل
+            ("الوسطى", "الرياض", "الرياض", "B2", "C2"),   # مبنى جديد
+            ("الوسطى", "الرياض", "الخرج", "B1", None),    # نفس اسم المبنى في مدينة أخرى
+            ("الغربية", "مكة", "جدة", "B1", None),
+            ("الغربية", "مكة", "", "B9", None),           # بدون مدينة
+        ], COL)
+
+        self.assertEqual(added, {"groups": 1, "regions": 1, "cities": 2, "buildings": 3})
+        self.assertEqual(skipped, 1)
+        self.assertEqual(Building.objects.get(name="B2").code, "C2")
+
+    def test_reimport_adds_nothing(self):
+        rows = [("الوسطى", "الرياض", "الرياض", "B1", None), ("الوسطى", "الرياض", "الرياض", "B2", None)]
+
+        import_location_rows(rows, COL)
+        added, _ = import_location_rows(rows, COL)
+
+        self.assertEqual(added, {"groups": 0, "regions": 0, "cities": 0, "buildings": 0})
+        self.assertEqual(Region.objects.count(), 1)
+
+    def test_import_refreshes_tree(self):
+        get_location_tree()
+        import_location_rows([("", "الرياض", "الرياض", "B1", None)], COL)
+
+        regions = get_location_tree()["regions"]
+        self.assertEqual([r["name"] for r in regions], ["الرياض"])
+
+
+class SharedCacheTests(TestCase):
+
+    def test_default_cache_is_shared_between_processes(self):
+        self.assertNotIsInstance(caches["default"], LocMemCache)
+
+    def test_tree_invalidated_by_another_process(self):
+        first = get_location_tree()
+        Region.objects.create(name="الرياض")
+
+        # عامل آخر أبطل الشجرة: اتصال مستقل بنفس الذاكرة المشتركة
+        caches.create_connection("default").set(TREE_VERSION_KEY, "from-worker", None)
+
+        tree = get_location_tree()
+        self.assertNotEqual(tree["version"], first["version"])
+        self.assertEqual([r["name"] for r in tree["regions"]], ["الرياض"])
+
+    def test_cache_queries_counted_separately(self):
+        timer = QueryTimer()
+        with connection.execute_wrapper(timer):
+            cache.set("metrics:test", 1)
+            Region.objects.count()
+
+        self.assertEqual(timer.count, 1)
+        self.assertGreater(timer.cache_count, 0)
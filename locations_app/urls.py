@@ -12,10 +12,13 @@ urlpatterns = [
     path("cities/", views.cities_list_view, name="cities_list"),
     path("buildings/", views.buildings_list_view, name="buildings_list"),
 
+    # ================================
+    # 🌳 API — شجرة المواقع كاملة
+    # ================================
+    path("api/tree/", views.location_tree_api, name="location_tree_api"),
+
     # ================================
     # 📥 صفحات الاستيراد (Excel)
     # ================================
-    path("import-regions/", views.admin_import_regions, name="admin_import_regions"),
-    path("import-cities/", views.admin_import_cities, name="admin_import_cities"),
-    path("import-buildings/", views.admin_import_buildings, name="admin_import_buildings"),
+    path("import-locations/", views.admin_import_locations, name="admin_import_locations"),
 ]
@@ -0,0 +1,204 @@
+import json
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import RegionGroup, Region, City, Building
+
+
+# =======================================================
+#   🌳 شجرة المواقع المخزنة مؤقتًا (إقليم ← منطقة ← مدينة ← مبنى)
+# =======================================================
+TREE_VERSION_KEY = "locations:tree_version"
+
+# نسخة الشجرة داخل العملية — تُعاد بناؤها فقط عند تغير رقم الإصدار
+_tree_memo = {"version": None, "tree": None}
+
+
+def location_tree_version():
+    """رقم إصدار الشجرة الحالي (يُستخدم أيضًا كـ ETag)"""
+    version = cache.get(TREE_VERSION_KEY)
+    if version is None:
+        cache.add(TREE_VERSION_KEY, uuid4().hex[:16], None)
+        version = cache.get(TREE_VERSION_KEY)
+    return version
+
+
+def invalidate_location_tree():
+    """
+    إبطال الشجرة بعد أي تعديل على المواقع.
+    يُعاد الإبطال بعد اكتمال المعاملة أيضًا حتى لا يبقى إصدار بُني من بيانات قبل الحفظ.
+    """
+    bump = lambda: cache.set(TREE_VERSION_KEY, uuid4().hex[:16], None)
+    bump()
+    transaction.on_commit(bump)
+
+
+def _build_location_tree(version):
+    groups = list(RegionGroup.objects.order_by("id").values_list("id", "name"))
+    regions = list(Region.objects.order_by("id").values_list("id", "name", "group_id"))
+    cities = list(City.objects.order_by("id").values_list("id", "name", "region_id"))
+    buildings = list(Building.objects.order_by("id").values_list("id", "name", "city_id"))
+
+    cities_by_region = {}
+    for city_id, name, region_id in cities:
+        cities_by_region.setdefault(region_id, []).append({"id": city_id, "name": name})
+
+    buildings_by_city = {}
+    for building_id, name, city_id in buildings:
+        buildings_by_city.setdefault(city_id, []).append({"id": building_id, "name": name})
+
+    # صيغة مختصرة للمتصفح: [id, name, parent_id]
+    payload = json.dumps({
+        "version": version,
+        "groups": groups,
+        "regions": regions,
+        "cities": cities,
+        "buildings": buildings,
+    }, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    return {
+        "version": version,
+        "groups": groups,
+        "regions": [{"id": r[0], "name": r[1], "group_id": r[2]} for r in regions],
+        "cities_by_region": cities_by_region,
+        "buildings_by_city": buildings_by_city,
+        "json": payload,
+    }
+
+
+def get_location_tree():
+    """الشجرة كاملة من الذاكرة — استعلام قاعدة بيانات فقط عند تغيّر الإصدار"""
+    version = location_tree_version()
+
+    if _tree_memo["version"] != version:
+        tree = _build_location_tree(version)
+        _tree_memo["tree"] = tree
+        _tree_memo["version"] = version
+
+    return _tree_memo["tree"]
+
+
+def cities_of_region(region_id):
+    return get_location_tree()["cities_by_region"].get(region_id, [])
+
+
+def buildings_of_city(city_id):
+    return get_location_tree()["buildings_by_city"].get(city_id, [])
+
+
+# =======================================================
+#   📥 استيراد شجرة المواقع من ورقة واحدة
+#       | region_group_name | region_name | city_name | building_name | building_code |
+# =======================================================
+LOCATION_IMPORT_COLUMNS = [
+    "region_group_name", "region_name", "city_name", "building_name", "building_code",
+]
+LOCATION_REQUIRED_COLUMNS = ["region_name", "city_name", "building_name"]
+
+
+def clean_cell(value):
+    return str(value).strip() if value is not None else ""
+
+
+def import_location_rows(rows, col):
+    """
+    مقارنة صفوف الملف بالشجرة الموجودة في الذاكرة ثم إنشاء العقد الناقصة فقط
+    مستوى بعد مستوى (إقليم ← منطقة ← مدينة ← مبنى) عبر bulk_create.
+    المدن والمباني تُطابق داخل أبيها، فتكرار اسم مدينة في منطقتين لا يسبب خلطًا.
+    يجب استدعاؤها داخل transaction.atomic.
+
+    يرجع (added, skipped) — added: عدد العقد الجديدة لكل مستوى.
+    """
+    get = lambda row, name: clean_cell(row[col[name]]) if name in col and col[name] < len(row) else ""
+
+    paths = []
+    skipped = 0
+    for row in rows:
+        group, region, city, building = (
+            get(row, "region_group_name"), get(row, "region_name"),
+            get(row, "city_name"), get(row, "building_name"),
+        )
+        if not region or not city or not building:
+            if any(v is not None for v in row):
+                skipped += 1
+            continue
+        paths.append((group, region, city, building, get(row, "building_code")))
+
+    added = {"groups": 0, "regions": 0, "cities": 0, "buildings": 0}
+
+    # ---------- الأقاليم ----------
+    groups = dict(RegionGroup.objects.values_list("name", "id"))
+    missing = {p[0] for p in paths if p[0] and p[0] not in groups}
+    if missing:
+        RegionGroup.objects.bulk_create([RegionGroup(name=name) for name in missing])
+        groups.update(RegionGroup.objects.filter(name__in=missing).values_list("name", "id"))
+        added["groups"] = len(missing)
+
+    # ---------- المناطق (داخل الإقليم) ----------
+    regions = {}
+    groups_by_region = {}
+    for region_id, group_id, name in Region.objects.values_list("id", "group_id", "name"):
+        regions.setdefault((group_id, name.strip()), region_id)
+        groups_by_region.setdefault(name.strip(), set()).add(group_id)
+
+    def region_key(path):
+        name = path[1]
+        group_id = groups.get(path[0]) if path[0] else None
+
+        # منطقة قديمة بدون إقليم تُستخدم كما هي بدلاً من إنشاء نسخة مكررة
+        if (group_id, name) not in regions and (None, name) in regions:
+            return (None, name)
+
+        # صف بدون إقليم يطابق المنطقة الموجودة إذا كان اسمها غير مكرر
+        if not path[0] and len(groups_by_region.get(name, ())) == 1:
+            return (next(iter(groups_by_region[name])), name)
+
+        return (group_id, name)
+
+    missing = {region_key(p) for p in paths} - set(regions)
+    if missing:
+        Region.objects.bulk_create([Region(group_id=g, name=n) for g, n in missing])
+        for region_id, group_id, name in Region.objects.filter(
+            name__in={n for _, n in missing}
+        ).values_list("id", "group_id", "name"):
+            regions.setdefault((group_id, name.strip()), region_id)
+        added["regions"] = len(missing)
+
+    # ---------- المدن (داخل المنطقة) ----------
+    cities = {}
+    for city_id, region_id, name in City.objects.values_list("id", "region_id", "name"):
+        cities.setdefault((region_id, name.strip()), city_id)
+
+    city_key = lambda p: (regions[region_key(p)], p[2])
+
+    missing = {city_key(p) for p in paths} - set(cities)
+    if missing:
+        City.objects.bulk_create([City(region_id=r, name=n) for r, n in missing])
+        for city_id, region_id, name in City.objects.filter(
+            region_id__in={r for r, _ in missing}
+        ).values_list("id", "region_id", "name"):
+            cities.setdefault((region_id, name.strip()), city_id)
+        added["cities"] = len(missing)
+
+    # ---------- المباني (داخل المدينة) ----------
+    buildings = set()
+    for city_id, name in Building.objects.values_list("city_id", "name"):
+        buildings.add((city_id, name.strip()))
+
+    new_buildings = {}
+    for p in paths:
+        key = (cities[city_key(p)], p[3])
+        if key not in buildings and key not in new_buildings:
+            new_buildings[key] = Building(city_id=key[0], name=key[1], code=p[4] or None)
+
+    if new_buildings:
+        Building.objects.bulk_create(new_buildings.values(), batch_size=2000)
+        added["buildings"] = len(new_buildings)
+
+    # bulk_create لا يرسل إشارات الحفظ
+    if any(added.values()):
+        invalidate_location_tree()
+
+    return added, skipped
@@ -1,9 +1,17 @@
 from django.shortcuts import render, redirect
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.db import transaction
+from django.http import HttpResponse
+from django.views.decorators.http import condition
 from openpyxl import load_workbook
 
 from .models import Region, City, Building
+from .utils import (
+    LOCATION_REQUIRED_COLUMNS, clean_cell, import_location_rows,
+    get_location_tree, location_tree_version,
+)
+from splasset.metrics import query_budget
 
 
 # =======================================================
@@ -15,6 +23,20 @@ def regions_list_view(request):
     return render(request, "locations_app/regions_list.html", {"regions": regions})
 
 
+# =======================================================
+#   🌳 شجرة المواقع كاملة (JSON مختصر + ETag)
+#   الصيغة: groups=[id, name] — regions/cities/buildings=[id, name, parent_id]
+# =======================================================
+@query_budget(6, cache_queries=8)
+@login_required
+@condition(etag_func=lambda request: location_tree_version())
+def location_tree_api(request):
+    response = HttpResponse(get_location_tree()["json"], content_type="application/json")
+    # المتصفح يحتفظ بالنسخة ويتحقق منها بـ If-None-Match في كل مرة
+    response["Cache-Control"] = "private, no-cache"
+    return response
+
+
 # =======================================================
 #   🟦 قائمة المدن
 # =======================================================
@@ -36,135 +58,52 @@ def buildings_list_view(request):
 
 
 # =======================================================
-#   🟢 استيراد المناطق (Regions)
+#   📥 استيراد المواقع (إقليم / منطقة / مدينة / مبنى)
 #       Excel structure:
-#       | region_name |
+#       | region_group_name | region_name | city_name | building_name | building_code |
 # =======================================================
 @login_required
-def admin_import_regions(request):
+def admin_import_locations(request):
 
     if request.method == "POST":
         file = request.FILES.get("file")
 
         if not file:
             messages.error(request, "الرجاء اختيار ملف Excel.")
-            return redirect("locations_app:admin_import_regions")
+            return redirect("locations_app:admin_import_locations")
 
         try:
-            wb = load_workbook(file)
-            ws = wb.active
-
-            added = 0
-
-            for row in ws.iter_rows(min_row=2, values_only=True):
-                region_name = row[0]
-
-                if not region_name:
-                    continue
-
-                _, created = Region.objects.get_or_create(name=str(region_name).strip())
-                if created:
-                    added += 1
-
-            messages.success(request, f"تم استيراد {added} منطقة بنجاح!")
-
+            wb = load_workbook(file, read_only=True, data_only=True)
         except Exception as e:
             messages.error(request, f"حدث خطأ أثناء قراءة الملف: {e}")
-
-        return redirect("inventory_app:admin_dashboard")
-
-    return render(request, "locations_app/import_regions.html")
-
-
-# =======================================================
-#   🟦 استيراد المدن (Cities)
-#       Excel structure:
-#       | region_name | city_name |
-# =======================================================
-@login_required
-def admin_import_cities(request):
-
-    if request.method == "POST":
-        file = request.FILES.get("file")
-
-        if not file:
-            messages.error(request, "الرجاء اختيار ملف Excel.")
-            return redirect("locations_app:admin_import_cities")
+            return redirect("locations_app:admin_import_locations")
 
         try:
-            wb = load_workbook(file)
-            ws = wb.active
-
-            added = 0
+            rows = wb.active.iter_rows(values_only=True)
+            header = [clean_cell(c) for c in (next(rows, None) or [])]
+            col = {name: index for index, name in enumerate(header)}
 
-            for row in ws.iter_rows(min_row=2, values_only=True):
-                region_name = row[0]
-                city_name = row[1]
+            missing = [c for c in LOCATION_REQUIRED_COLUMNS if c not in col]
+            if missing:
+                messages.error(request, f"الأعمدة المفقودة: {', '.join(missing)}")
+                return redirect("locations_app:admin_import_locations")
 
-                if not region_name or not city_name:
-                    continue
+            with transaction.atomic():
+                added, skipped = import_location_rows(rows, col)
 
-                region, _ = Region.objects.get_or_create(name=str(region_name).strip())
-                _, created = City.objects.get_or_create(
-                    region=region,
-                    name=str(city_name).strip()
-                )
-
-                if created:
-                    added += 1
-
-            messages.success(request, f"تم استيراد {added} مدينة بنجاح!")
+            messages.success(
+                request,
+                f"تم الاستيراد: {added['groups']} إقليم، {added['regions']} منطقة، "
+                f"{added['cities']} مدينة، {added['buildings']} مبنى"
+                + (f" (تم تجاهل {skipped} صف ناقص)" if skipped else ""),
+            )
 
         except Exception as e:
             messages.error(request, f"فشل الاستيراد: {e}")
 
-        return redirect("inventory_app:admin_dashboard")
-
-    return render(request, "locations_app/import_cities.html")
-
-
-# =======================================================
-#   🟧 استيراد المباني (Buildings)
-#       Excel structure:
-#       | city_name | building_name |
-# =======================================================
-@login_required
-def admin_import_buildings(request):
-
-    if request.method == "POST":
-        file = request.FILES.get("file")
-
-        if not file:
-            messages.error(request, "الرجاء اختيار ملف Excel.")
-            return redirect("locations_app:admin_import_buildings")
-
-        try:
-            wb = load_workbook(file)
-            ws = wb.active
-
-            added = 0
-
-            for row in ws.iter_rows(min_row=2, values_only=True):
-                city_name = row[0]
-                building_name = row[1]
-
-                if not city_name or not building_name:
-                    continue
-
-                city, _ = City.objects.get_or_create(name=str(city_name).strip())
-                _, created = Building.objects.get_or_create(
-                    city=city,
-                    name=str(building_name).strip()
-                )
-
-                if created:
-                    added += 1
-
-            messages.success(request, f"تم استيراد {added} مبنى بنجاح!")
-
-        except Exception as e:
-            messages.error(request, f"فشل الاستيراد: {e}")
+        finally:
+            wb.close()
 
         return redirect("inventory_app:admin_dashboard")
 
-    return render(request, "locations_app/import_buildings.html")
+    return render(request, "locations_app/import_locations.html")
@@ -0,0 +1,11 @@
+from jobs_app.utils import job_task
+from .utils import REPORT_EXPORTS, write_excel_sheets
+
+
+# ======================================================
+#   تصدير التقارير في الخلفية
+# ======================================================
+@job_task("report_export")
+def report_export(ctx, report, params=None):
+    headers, rows, filename = REPORT_EXPORTS[report](**(params or {}))
+    write_excel_sheets([("Sheet", headers, rows)], ctx.result_path(filename))
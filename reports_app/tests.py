@@ -1,3 +1,415 @@
+import datetime
+import tempfile
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from assets_app.models import Asset
+from inventory_app.models import InventorySession, InventoryItem
+from inventory_app.models import BuildingInventoryStats
+from inventory_app.utils import (
+    invalidate_inventory_data, invalidate_session_stats, rebuild_building_stats, compact_session_events,
+    inventory_data_version,
+)
+from jobs_app.utils import run_pending_jobs
+from locations_app.models import Region, City, Building
+from splasset.metrics import QueryTimer
+from .utils import report_cache_stats, reset_report_cache_stats
+
+
+# الوضع الصارم: تجاوز حد الاستعلامات (query_budget) يُفشل الاختبار
+@override_settings(QUERY_BUDGET_STRICT=True)
+class BuildingStatusReportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="admin", password="x", is_superuser=True)
+        cls.region = Region.objects.create(name="الرياض")
+        cls.city = City.objects.create(region=cls.region, name="الرياض")
+
+    def add_building(self, name, statuses):
+        building = Building.objects.create(city=self.city, name=name)
+        session = InventorySession.objects.create(
+            employee=self.user, region=self.region, city=self.city, building=building,
+        )
+
+        for i, status in enumerate(statuses):
+            asset = Asset.objects.create(
+                asset_code=f"{name}-{i}", barcode=f"{name}-{i}", description="-",
+                main_category="-", type="-", sub_category="-",
+                region=self.region, city=self.city, building=building,
+                created_at=datetime.date.today(), created_by_username="admin",
+            )
+            if status:
+                InventoryItem.objects.create(
+                    session=session, asset=asset, barcode=asset.barcode, status=status,
+                )
+
+        return building
+
+    def get_report(self):
+        self.client.force_login(self.user)
+        # كل طلب يبدأ بدون صلاحيات أو شجرة مخزنة حتى تكون المقارنة عادلة
+        cache.clear()
+        # البيانات أُنشئت مباشرة بدون مسارات التحديث التدريجي
+        rebuild_building_stats()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("reports_app:building_status_report"))
+        self.assertEqual(response.status_code, 200)
+        return response.context["data"], len(queries)
+
+    def test_rows_match_per_building_counts(self):
+        self.add_building("B1", ["found", "found", "missing", "new", None])
+        self.add_building("B2", [])
+
+        data, _ = self.get_report()
+        rows = {row["building"]: row for row in data}
+
+        self.assertEqual(rows["B1"]["total"], 5)
+        self.assertEqual(rows["B1"]["scanned"], 2)
+        self.assertEqual(rows["B1"]["missing"], 1)
+        self.assertEqual(rows["B1"]["new"], 1)
+        self.assertEqual(rows["B1"]["not_scanned"], 1)
+        self.assertEqual(rows["B2"]["total"], 0)
+        self.assertEqual(rows["B2"]["scanned"], 0)
+
+    def test_rows_show_latest_session_only(self):
+        building = self.add_building("B1", ["found", "found", "missing"])
+        # جلسة أحدث للمبنى نفسه — المسح السابق لا يُجمع معها
+        session = InventorySession.objects.create(
+            employee=self.user, region=self.region, city=self.city, building=building,
+        )
+        for asset in Asset.objects.filter(building=building):
+            InventoryItem.objects.create(session=session, asset=asset, barcode=asset.barcode, status="missing")
+
+        data, _ = self.get_report()
+
+        self.assertEqual(data, [{
+            "region": "الرياض", "city": "الرياض", "building": "B1",
+            "total": 3, "scanned": 0, "missing": 3, "new": 0, "not_scanned": 0,
+        }])
+
+    def test_query_count_is_constant(self):
+        self.add_building("B1", ["found", "missing"])
+        _, few = self.get_report()
+
+        for i in range(10):
+            self.add_building(f"X{i}", ["found", "new", None])
+        data, many = self.get_report()
+
+        self.assertEqual(len(data), 11)
+        self.assertEqual(few, many)
+
+
+class DashboardKpiTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="admin", password="x", is_superuser=True)
+        cls.region = Region.objects.create(name="الرياض")
+        cls.city = City.objects.create(region=cls.region, name="الرياض")
+        cls.building = Building.objects.create(city=cls.city, name="B1")
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def add_session(self, status, item_statuses=()):
+        session = InventorySession.objects.create(
+            employee=self.user, region=self.region, city=self.city,
+            building=self.building, status=status,
+        )
+        InventoryItem.objects.bulk_create([
+            InventoryItem(session=session, barcode=f"{session.id}-{i}", status=s)
+            for i, s in enumerate(item_statuses)
+        ])
+        return session
+
+    def test_counts_match_raw_tables(self):
+        self.add_session("completed", ["found", "found", "missing"])
+        self.add_session("supervisor_under_review", ["new"])
+        self.add_session("supervisor_under_review")
+
+        response = self.client.get(reverse("reports_app:sessions_status_report"))
+        self.assertEqual(response.context["counts"]["total"], 3)
+        self.assertEqual(response.context["counts"]["under_review"], 2)
+        self.assertEqual(response.context["counts"]["completed"], 1)
+
+        response = self.client.get(reverse("reports_app:reports_home"))
+        self.assertEqual(response.context["total_scanned"], 2)
+        self.assertEqual(response.context["total_missing"], 1)
+        self.assertEqual(response.context["total_new"], 1)
+
+    def test_status_transition_invalidates(self):
+        session = self.add_session("submitted_to_supervisor")
+        url = reverse("inventory_app:admin_dashboard")
+
+        self.assertEqual(self.client.get(url).context["submitted"], 1)
+
+        session.status = "supervisor_approved"
+        session.save()
+        # بدون إبطال تبقى القيمة المخزنة
+        self.assertEqual(self.client.get(url).context["approved"], 0)
+
+        invalidate_session_stats()
+        response = self.client.get(url)
+        self.assertEqual(response.context["submitted"], 0)
+        self.assertEqual(response.context["approved"], 1)
+
+    def test_invalidation_from_another_process(self):
+        session = self.add_session("submitted_to_supervisor")
+        url = reverse("inventory_app:admin_dashboard")
+        self.assertEqual(self.client.get(url).context["submitted"], 1)
+
+        session.status = "supervisor_approved"
+        session.save()
+        # الإبطال من عامل آخر (run_jobs مثلًا) عبر اتصال مستقل بالذاكرة
+        with mock.patch("inventory_app.utils.cache", caches.create_connection("default")):
+            invalidate_session_stats()
+
+        self.assertEqual(self.client.get(url).context["approved"], 1)
+
+
+class SummaryRollupTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="admin", password="x", is_superuser=True)
+        cls.region = Region.objects.create(name="الرياض")
+        cls.empty_region = Region.objects.create(name="مكة")
+        cls.city = City.objects.create(region=cls.region, name="الرياض")
+        cls.building = Building.objects.create(city=cls.city, name="B1")
+
+        assets = [
+            Asset.objects.create(
+                asset_code=f"A-{i}", barcode=f"A-{i}", description="-",
+                main_category="-", type="-", sub_category="-",
+                region=cls.region, city=cls.city, building=cls.building,
+                created_at=datetime.date.today(), created_by_username="admin",
+            )
+            for i in range(4)
+        ]
+
+        # جلسة قديمة ثم جلسة أحدث للمبنى نفسه
+        for found in (1, 3):
+            session = InventorySession.objects.create(
+                employee=cls.user, region=cls.region, city=cls.city, building=cls.building,
+                status="supervisor_approved",
+                total_items=4, found_count=found, missing_count=4 - found,
+            )
+            InventoryItem.objects.bulk_create([
+                InventoryItem(
+                    session=session, asset=asset, barcode=asset.barcode,
+                    status="found" if i < found else "missing",
+                )
+                for i, asset in enumerate(assets)
+            ])
+
+    def get_report(self, **params):
+        self.client.force_login(self.user)
+        cache.clear()
+        rebuild_building_stats()
+        response = self.client.get(reverse("reports_app:summary_assets_report"), params)
+        self.assertEqual(response.status_code, 200)
+        return {row["name"]: row for row in response.context["region_stats"]}
+
+    def test_latest_session_per_building(self):
+        rows = self.get_report(mode="latest")
+
+        self.assertEqual(rows["الرياض"]["assets_count"], 4)
+        self.assertEqual(rows["الرياض"]["scanned_count"], 3)
+        self.assertEqual(rows["الرياض"]["missing_count"], 1)
+        self.assertEqual(rows["الرياض"]["not_scanned"], 1)
+        self.assertEqual(rows["مكة"]["assets_count"], 0)
+
+    def test_all_sessions(self):
+        rows = self.get_report(mode="all")
+
+        self.assertEqual(rows["الرياض"]["scanned_count"], 4)
+        self.assertEqual(rows["الرياض"]["missing_count"], 4)
+        # الأصول 0 و1 و2 وُجدت (الأصل 0 في الجلستين) — يبقى أصل واحد غير مجرود
+        self.assertEqual(rows["الرياض"]["not_scanned"], 1)
+
+    def test_building_level(self):
+        rows = self.get_report(level="building")
+
+        self.assertEqual(set(rows), {"B1"})
+        self.assertEqual(rows["B1"]["scanned_count"], 3)
+
+
+class BuildingInventoryStatsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="admin", password="x", is_superuser=True)
+        cls.region = Region.objects.create(name="الرياض")
+        cls.city = City.objects.create(region=cls.region, name="الرياض")
+        cls.building = Building.objects.create(city=cls.city, name="B1")
+
+    def add_asset(self, code):
+        return Asset.objects.create(
+            asset_code=code, barcode=code, description="-",
+            main_category="-", type="-", sub_category="-",
+            region=self.region, city=self.city, building=self.building,
+            created_at=datetime.date.today(), created_by_username="admin",
+        )
+
+    def snapshot(self):
+        return BuildingInventoryStats.objects.filter(building=self.building).values(
+            "total_assets", "found_count", "missing_count", "new_count",
+            "last_session_id", "last_inventoried_at",
+        ).get()
+
+    def test_incremental_updates_match_rebuild(self):
+        self.client.force_login(self.user)
+        for i in range(3):
+            self.add_asset(f"A-{i}")
+
+        self.client.post(reverse("inventory_app:start_session"), {
+            "region": self.region.id, "city": self.city.id, "building": self.building.id,
+        })
+        session = InventorySession.objects.get()
+        self.assertEqual(self.snapshot()["missing_count"], 3)
+
+        self.client.post(reverse("inventory_app:scan_update_api", args=[session.id]), {"barcode": "A-0"})
+        # الدمج الدوري (compact_scan_events) — الطلبات لا تدمج الأحداث الأحدث من مهلة الاستقرار
+        compact_session_events(session)
+        self.client.post(reverse("inventory_app:submit_to_supervisor", args=[session.id]))
+        self.client.post(reverse("inventory_app:supervisor_approve_session", args=[session.id]))
+        self.add_asset("A-3")
+
+        incremental = self.snapshot()
+        self.assertEqual(incremental["total_assets"], 4)
+        self.assertEqual(incremental["found_count"], 1)
+        self.assertEqual(incremental["missing_count"], 2)
+        self.assertEqual(incremental["last_session_id"], session.id)
+        self.assertIsNotNone(incremental["last_inventoried_at"])
+
+        rebuild_building_stats()
+        self.assertEqual(self.snapshot(), incremental)
+
+    def test_deleting_latest_session_falls_back(self):
+        first = InventorySession.objects.create(employee=self.user, building=self.building)
+        second = InventorySession.objects.create(employee=self.user, building=self.building)
+        rebuild_building_stats()
+        self.assertEqual(self.snapshot()["last_session_id"], second.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertEqual(self.snapshot()["last_session_id"], first.id)
+
+    def test_asset_delete_recounts_after_commit(self):
+        assets = [self.add_asset(f"A-{i}") for i in range(3)]
+        self.assertEqual(self.snapshot()["total_assets"], 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Asset.objects.filter(id__in=[a.id for a in assets[:2]]).delete()
+        self.assertEqual(self.snapshot()["total_assets"], 1)
+
+    def test_bulk_delete_invalidates_once(self):
+        assets = [self.add_asset(f"A-{i}") for i in range(20)]
+
+        # تكلفة تغيير واحد للإصدار بعد قراءته
+        inventory_data_version()
+        single = QueryTimer()
+        with connection.execute_wrapper(single):
+            invalidate_inventory_data()
+
+        version = inventory_data_version()
+        timer = QueryTimer()
+        with self.captureOnCommitCallbacks() as callbacks, connection.execute_wrapper(timer):
+            Asset.objects.filter(id__in=[a.id for a in assets]).delete()
+
+        self.assertNotEqual(inventory_data_version(), version)
+        self.assertEqual(timer.cache_count, single.cache_count)
+        # إعادة عد واحدة للمباني — تغيير الإصدار بعد الاكتمال مسجل من قبل
+        self.assertEqual(len(callbacks), 1)
+
+
+class ReportCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="admin", password="x", is_superuser=True)
+        cls.region = Region.objects.create(name="الرياض")
+        cls.city = City.objects.create(region=cls.region, name="الرياض")
+        cls.building = Building.objects.create(city=cls.city, name="B1")
+        cls.session = InventorySession.objects.create(
+            employee=cls.user, region=cls.region, city=cls.city, building=cls.building,
+            total_items=1, missing_count=1,
+        )
+        asset = Asset.objects.create(
+            asset_code="A-0", barcode="A-0", description="-",
+            main_category="-", type="-", sub_category="-",
+            region=cls.region, city=cls.city, building=cls.building,
+            created_at=datetime.date.today(), created_by_username="admin",
+        )
+        InventoryItem.objects.create(session=cls.session, asset=asset, barcode="A-0", status="missing")
+
+    def setUp(self):
+        cache.clear()
+        reset_report_cache_stats()
+        rebuild_building_stats()
+        self.client.force_login(self.user)
+
+    def get_rows(self, query=""):
+        url = reverse("reports_app:building_status_report") + query
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        return response.context["data"], len(queries)
+
+    def test_same_filters_hit_cache(self):
+        query = f"?region={self.region.id}&city=&building="
+        first, cold = self.get_rows(query)
+        second, warm = self.get_rows(f"?region={self.region.id}")
+
+        self.assertEqual(first, second)
+        self.assertLess(warm, cold)
+        self.assertEqual(report_cache_stats()["building_status"]["hits"], 1)
+        self.assertEqual(report_cache_stats()["building_status"]["misses"], 1)
+
+    def test_scan_invalidates(self):
+        rows, _ = self.get_rows()
+        self.assertEqual(rows[0]["missing"], 1)
+
+        self.client.post(reverse("inventory_app:scan_update_api", args=[self.session.id]), {"barcode": "A-0"})
+        # المسح يُسجل كحدث ثم يُدمج في العناصر
+        compact_session_events(self.session)
+
+        rows, _ = self.get_rows()
+        self.assertEqual(rows[0]["scanned"], 1)
+        self.assertEqual(rows[0]["missing"], 0)
+        self.assertEqual(report_cache_stats()["building_status"]["misses"], 2)
+
+    def test_location_change_invalidates(self):
+        self.get_rows()
+        self.building.name = "B2"
+        self.building.save()
+
+        rows, _ = self.get_rows()
+        self.assertEqual(rows[0]["building"], "B2")
+
+    def test_version_bump_from_another_process(self):
+        self.get_rows()
+        BuildingInventoryStats.objects.filter(building=self.building).update(found_count=1, missing_count=0)
+
+        # الكتابة تمت في عامل آخر — إصداره يصل عبر الذاكرة المشتركة
+        with mock.patch("inventory_app.utils.cache", caches.create_connection("default")):
+            invalidate_inventory_data()
+
+        rows, _ = self.get_rows()
+        self.assertEqual(rows[0]["missing"], 0)
+        self.assertEqual(report_cache_stats()["building_status"]["misses"], 2)
+
+    def test_export_reuses_cached_rows(self):
+        self.get_rows()
+        with tempfile.TemporaryDirectory() as media, override_settings(MEDIA_ROOT=media):
+            self.client.get(reverse("reports_app:building_status_report") + "?export=1")
+            run_pending_jobs()
 
-# Create your tests here.
+        self.assertEqual(report_cache_stats()["building_status"], {"hits": 1, "misses": 1, "hit_rate": 0.5})
@@ -1,28 +1,396 @@
+import hashlib
+import json
+import tempfile
+import threading
+
 import openpyxl
-from openpyxl.styles import Font, Alignment
-from django.http import HttpResponse
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, Alignment, NamedStyle
+from django.conf import settings
+from django.core.cache import cache
+from django.http import StreamingHttpResponse
+from django.db.models import Count, Sum
 
+from assets_app.models import Asset
+from inventory_app.models import InventorySession, InventoryItem, BuildingInventoryStats
+from inventory_app.utils import inventory_data_version
+from locations_app.models import Building
+from locations_app.utils import get_location_tree, location_tree_version
 
-def generate_excel(headers, rows, filename="report.xlsx"):
-    wb = openpyxl.Workbook()
-    ws = wb.active
-
-    # كتابة العناوين
-    for col_num, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col_num, value=header)
-        cell.font = Font(bold=True)
-        cell.alignment = Alignment(horizontal="center")
-
-    # كتابة الصفوف
-    for row_num, row_data in enumerate(rows, 2):
-        for col_num, value in enumerate(row_data, 1):
-            cell = ws.cell(row=row_num, column=col_num, value=value)
-            cell.alignment = Alignment(horizontal="center")
-
-    # تجهيز الملف للتحميل
-    response = HttpResponse(
-        content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-    )
+
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+EXCEL_CHUNK_SIZE = 64 * 1024
+
+
+def _add_shared_styles(wb):
+    """نمط مسمى مشترك للعناوين بدلاً من إنشاء Font/Alignment لكل خلية"""
+    header = NamedStyle(name="report_header")
+    header.font = Font(bold=True)
+    header.alignment = Alignment(horizontal="center")
+    wb.add_named_style(header)
+
+
+def write_excel_sheet(wb, title, headers, rows):
+    """
+    كتابة ورقة في Workbook بوضع write-only.
+    rows يمكن أن يكون مولّدًا (iterator) — يُستهلك صفًا صفًا دون تحميله في الذاكرة.
+    الصفوف تُكتب كقيم مباشرة (أسرع مسار في write-only) والتنسيق للعناوين فقط.
+    """
+    ws = wb.create_sheet(title=title)
+
+    header_cells = []
+    for value in headers:
+        cell = WriteOnlyCell(ws, value=value)
+        cell.style = "report_header"
+        header_cells.append(cell)
+    ws.append(header_cells)
+
+    for row in rows:
+        ws.append(row)
+
+    return ws
+
+
+def write_excel_sheets(sheets, dest):
+    """
+    كتابة عدة أوراق في ملف (مسار أو كائن ملف) بوضع write-only.
+    sheets: قائمة من (title, headers, rows)
+    """
+    wb = openpyxl.Workbook(write_only=True)
+    _add_shared_styles(wb)
+
+    for title, headers, rows in sheets:
+        write_excel_sheet(wb, title, headers, rows)
+
+    wb.save(dest)
+
+
+def stream_excel_sheets(sheets, filename="report.xlsx"):
+    """
+    تصدير Excel متدفق لعدة أوراق.
+    sheets: قائمة من (title, headers, rows)
+
+    يُبنى الملف داخل مولّد الاستجابة في ملف مؤقت على القرص (write-only)
+    ثم يُرسل على أجزاء، فتبقى الذاكرة ثابتة مهما زاد عدد الصفوف.
+    """
+    def generate():
+        with tempfile.TemporaryFile() as tmp:
+            write_excel_sheets(sheets, tmp)
+            tmp.seek(0)
+
+            while True:
+                chunk = tmp.read(EXCEL_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+
+    response = StreamingHttpResponse(generate(), content_type=XLSX_CONTENT_TYPE)
     response["Content-Disposition"] = f'attachment; filename="{filename}"'
-    wb.save(response)
     return response
+
+
+def generate_excel(headers, rows, filename="report.xlsx"):
+    """تصدير ورقة واحدة — rows قائمة أو مولّد صفوف"""
+    return stream_excel_sheets([("Sheet", headers, rows)], filename)
+
+# ======================================================
+#   إحصائيات المباني — استعلام تجميعي واحد
+# ======================================================
+def building_status_rows(buildings):
+    """
+    (إجمالي الأصول / موجود / مفقود / جديد) لكل مبنى من ملخص المباني
+    المحدث تدريجيًا — قراءة واحدة بالمفتاح. أرقام الجرد لآخر جلسة غير ملغاة
+    للمبنى، لا مجموع كل جلساته السابقة.
+    """
+    stats = buildings.order_by("id").values_list(
+        "name", "city__name", "city__region__name",
+        "inventory_stats__total_assets", "inventory_stats__found_count",
+        "inventory_stats__missing_count", "inventory_stats__new_count",
+    )
+
+    report_data = []
+    for name, city, region, total, scanned, missing, new in stats:
+        total, scanned, missing, new = total or 0, scanned or 0, missing or 0, new or 0
+        report_data.append({
+            "region": region,
+            "city": city,
+            "building": name,
+            "total": total,
+            "scanned": scanned,
+            "missing": missing,
+            "new": new,
+            "not_scanned": max(total - (scanned + missing + new), 0),
+        })
+
+    return report_data
+
+
+# ======================================================
+#   ملخص الجرد حسب المستوى (إقليم ← منطقة ← مدينة ← مبنى)
+# ======================================================
+ROLLUP_LEVELS = ["group", "region", "city", "building"]
+
+# latest: آخر جلسة لكل مبنى فقط — all: مجموع كل الجلسات السابقة
+ROLLUP_MODES = ["latest", "all"]
+
+ROLLUP_LEVEL_LABELS = {"group": "الإقليم", "region": "المنطقة", "city": "المدينة", "building": "المبنى"}
+
+
+def _building_totals(mode):
+    """
+    {building_id: (الأصول، موجود، مفقود، جديد، أصول مجرودة)}
+    latest: من ملخص المباني مباشرة — كل أصل يظهر مرة واحدة في الجلسة.
+    all: عدد الأصول + مجموع عدادات كل الجلسات غير الملغاة، والأصول المجرودة
+    تُعد مميزة (الأصل الموجود في عدة جلسات يُحسب مرة) حتى لا يتكرر في "غير مجرود".
+    """
+    if mode == "latest":
+        return {
+            row[0]: (*row[1:], row[2])
+            for row in BuildingInventoryStats.objects.values_list(
+                "building_id", "total_assets", "found_count", "missing_count", "new_count",
+            )
+        }
+
+    assets = dict(Asset.objects.values_list("building_id").annotate(Count("id")).order_by())
+    sessions = InventorySession.objects.exclude(status="cancelled").values_list("building_id").annotate(
+        Sum("found_count"), Sum("missing_count"), Sum("new_count"),
+    ).order_by()
+    sessions = {row[0]: row[1:] for row in sessions}
+    found_assets = dict(
+        InventoryItem.objects.filter(status="found").exclude(session__status="cancelled")
+        .values_list("session__building_id").annotate(Count("asset_id", distinct=True)).order_by()
+    )
+
+    return {
+        building_id: (
+            assets.get(building_id, 0), *sessions.get(building_id, (0, 0, 0)),
+            found_assets.get(building_id, 0),
+        )
+        for building_id in assets.keys() | sessions.keys()
+    }
+
+
+def inventory_rollup(level="region", mode="latest"):
+    """
+    ملخص الأصول والجرد مجمّعًا على المستوى المطلوب.
+    الأرقام تُحسب لكل مبنى (_building_totals) ثم تُجمع للأعلى عبر شجرة المواقع
+    — بدون ضرب الجداول في بعضها.
+
+    يرجع (rows, totals) — المستويات بدون مبانٍ تظهر بأصفار.
+    """
+    if level not in ROLLUP_LEVELS or mode not in ROLLUP_MODES:
+        raise ValueError(f"مستوى أو نمط غير معروف: {level} / {mode}")
+
+    tree = get_location_tree()
+    totals_by_building = _building_totals(mode)
+
+    rows = {}
+
+    def node(key, name):
+        if key not in rows:
+            rows[key] = {
+                "id": key, "name": name,
+                "assets_count": 0, "scanned_count": 0, "missing_count": 0, "new_count": 0,
+                "found_assets": 0,
+            }
+        return rows[key]
+
+    groups = dict(tree["groups"])
+    for region in tree["regions"]:
+        path = {
+            "group": (region["group_id"], groups.get(region["group_id"], "بدون إقليم")),
+            "region": (region["id"], region["name"]),
+        }
+        if level in path:
+            node(*path[level])
+
+        for city in tree["cities_by_region"].get(region["id"], []):
+            path["city"] = (city["id"], city["name"])
+            if level == "city":
+                node(*path["city"])
+
+            for building in tree["buildings_by_city"].get(city["id"], []):
+                path["building"] = (building["id"], building["name"])
+                row = node(*path[level])
+
+                assets, found, missing, new, found_assets = totals_by_building.get(
+                    building["id"], (0, 0, 0, 0, 0),
+                )
+                row["assets_count"] += assets
+                row["scanned_count"] += found or 0
+                row["missing_count"] += missing or 0
+                row["new_count"] += new or 0
+                row["found_assets"] += found_assets or 0
+
+    rows = list(rows.values())
+    for row in rows:
+        row["not_scanned"] = max(row["assets_count"] - row["found_assets"], 0)
+
+    totals = {
+        "assets": sum(r["assets_count"] for r in rows),
+        "scanned": sum(r["scanned_count"] for r in rows),
+        "missing": sum(r["missing_count"] for r in rows),
+        "new": sum(r["new_count"] for r in rows),
+    }
+    totals["not_scanned"] = max(totals["assets"] - sum(r["found_assets"] for r in rows), 0)
+
+    return rows, totals
+
+
+# ======================================================
+#   🗄 نتائج التقارير المخزنة
+#   المفتاح: (التقرير، الفلاتر بعد التوحيد، إصدار البيانات) — أي كتابة على
+#   الجرد أو الأصول أو المواقع تغير الإصدار، والنتائج القديمة تنتهي بمدتها.
+# ======================================================
+REPORT_CACHE_TIMEOUT = getattr(settings, "REPORT_CACHE_TIMEOUT", 15 * 60)
+
+# عدد مرات الإصابة والإخفاق لكل تقرير داخل العملية (تُعرض في /metrics/)
+_report_cache_stats = {}
+_report_cache_lock = threading.Lock()
+
+
+def _normalize_filters(filters):
+    """الفلاتر الفارغة تُحذف والأرقام تُوحد — ?region=5&city= و ?region=05 نفس المفتاح"""
+    normalized = {}
+    for name, value in filters.items():
+        if value is None or str(value).strip() == "":
+            continue
+        value = str(value).strip()
+        normalized[name] = int(value) if value.isdigit() else value
+    return normalized
+
+
+def report_cache_key(report, filters):
+    version = f"{inventory_data_version()}:{location_tree_version()}"
+    raw = json.dumps(_normalize_filters(filters), sort_keys=True, ensure_ascii=False)
+    return f"reports:{report}:{version}:{hashlib.md5(raw.encode()).hexdigest()}"
+
+
+def cached_report(report, filters, compute):
+    """
+    نتيجة compute() من الذاكرة المؤقتة إن وُجدت لنفس التقرير والفلاتر والإصدار.
+    الإصدار يُقرأ قبل الحساب — كتابة أثناء الحساب تجعل النتيجة تحت إصدار قديم فقط.
+    """
+    key = report_cache_key(report, filters)
+    result = cache.get(key)
+    hit = result is not None
+
+    with _report_cache_lock:
+        stats = _report_cache_stats.setdefault(report, {"hits": 0, "misses": 0})
+        stats["hits" if hit else "misses"] += 1
+
+    if not hit:
+        result = compute()
+        cache.set(key, result, REPORT_CACHE_TIMEOUT)
+    return result
+
+
+def report_cache_stats():
+    with _report_cache_lock:
+        return {
+            report: {
+                **stats,
+                "hit_rate": round(stats["hits"] / (stats["hits"] + stats["misses"]), 3),
+            }
+            for report, stats in sorted(_report_cache_stats.items())
+        }
+
+
+def reset_report_cache_stats():
+    with _report_cache_lock:
+        _report_cache_stats.clear()
+
+
+def building_status_report(region=None, city=None, building=None):
+    """صفوف تقرير حالة المباني — نفس النتيجة المخزنة للصفحة والتصدير"""
+    return cached_report(
+        "building_status",
+        {"region": region, "city": city, "building": building},
+        lambda: building_status_rows(filter_buildings(region, city, building)),
+    )
+
+
+def summary_assets_report(level="region", mode="latest"):
+    """(rows, totals) للتقرير الختامي — نفس النتيجة المخزنة للصفحة والتصدير"""
+    return cached_report(
+        "summary_assets",
+        {"level": level, "mode": mode},
+        lambda: inventory_rollup(level, mode),
+    )
+
+
+# ======================================================
+#   بيانات تصدير التقارير — تُنفذ في مهمة خلفية (reports_app/jobs.py)
+#   كل دالة ترجع (headers, rows, filename) و rows مولّد
+# ======================================================
+def filter_buildings(region=None, city=None, building=None):
+    buildings = Building.objects.all()
+
+    if region:
+        buildings = buildings.filter(city__region_id=region)
+
+    if city:
+        buildings = buildings.filter(city_id=city)
+
+    if building:
+        buildings = buildings.filter(id=building)
+
+    return buildings
+
+
+def building_status_export(region=None, city=None, building=None):
+    headers = ["المنطقة", "المدينة", "المبنى", "إجمالي", "مجرود", "غير مجرود", "نسبة الإنجاز"]
+    rows = (
+        [
+            row["region"],
+            row["city"],
+            row["building"],
+            row["total"],
+            row["scanned"],
+            row["not_scanned"],
+            round((row["scanned"] / row["total"] * 100), 1) if row["total"] else 0,
+        ]
+        for row in building_status_report(region, city, building)
+    )
+    return headers, rows, "building_status.xlsx"
+
+
+def sessions_status_export():
+    sessions = InventorySession.objects.select_related("employee", "region")
+
+    headers = ["رقم الجلسة", "الموظف", "المنطقة", "الحالة"]
+    rows = (
+        [
+            s.id,
+            s.employee.username if s.employee else "-",
+            s.region.name if s.region else "-",
+            s.get_status_display(),
+        ]
+        for s in sessions.iterator(chunk_size=2000)
+    )
+    return headers, rows, "sessions_status.xlsx"
+
+
+def summary_assets_export(level="region", mode="latest"):
+    region_stats, _ = summary_assets_report(level, mode)
+
+    headers = [ROLLUP_LEVEL_LABELS[level], "إجمالي", "مجرود", "مفقود", "جديد", "غير مجرود"]
+    rows = (
+        [
+            row["name"],
+            row["assets_count"],
+            row["scanned_count"],
+            row["missing_count"],
+            row["new_count"],
+            row["not_scanned"],
+        ]
+        for row in region_stats
+    )
+    return headers, rows, f"summary_assets_{level}_{mode}.xlsx"
+
+
+REPORT_EXPORTS = {
+    "building_status": building_status_export,
+    "sessions_status": sessions_status_export,
+    "summary_assets": summary_assets_export,
+}
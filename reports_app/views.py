@@ -1,4 +1,4 @@
-from django.shortcuts import render
+from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from django.db.models import Count, Q
 from django.http import JsonResponse
@@ -8,9 +8,25 @@ from inventory_app.models import InventorySession, InventoryItem
 from locations_app.models import Region, City, Building
 from django.http import HttpResponseForbidden
 from inventory_app.models import InventorySession
+from inventory_app.utils import is_supervisor, is_admin, dashboard_kpis
 
+from locations_app.utils import get_location_tree, cities_of_region, buildings_of_city
+from .utils import (
+    building_status_report, summary_assets_report,
+    ROLLUP_LEVELS, ROLLUP_MODES, ROLLUP_LEVEL_LABELS,
+)
+from jobs_app.utils import enqueue_job
+from splasset.metrics import query_budget
 
-from .utils import generate_excel
+
+def _as_id(value):
+    return int(value) if value and value.isdigit() else None
+
+
+def _export_job(request, report, params=None):
+    """التصدير يُنفذ في مهمة خلفية — المستخدم يتابعها ثم يحمّل الملف"""
+    job = enqueue_job("report_export", {"report": report, "params": params or {}}, request.user)
+    return redirect("jobs_app:job_detail", job_id=job.id)
 
 
 # ======================================================
@@ -19,19 +35,14 @@ from .utils import generate_excel
 @login_required
 def reports_home_view(request):
 
-    total_assets = Asset.objects.count()
-    total_sessions = InventorySession.objects.count()
-
-    scanned = InventoryItem.objects.filter(status="found").count()
-    missing = InventoryItem.objects.filter(status="missing").count()
-    new_added = InventoryItem.objects.filter(status="new").count()
+    kpis = dashboard_kpis()
 
     context = {
-        "total_assets": total_assets,
-        "total_sessions": total_sessions,
-        "total_scanned": scanned,
-        "total_missing": missing,
-        "total_new": new_added,
+        "total_assets": kpis["assets"],
+        "total_sessions": kpis["sessions"]["total"],
+        "total_scanned": kpis["items"]["found"],
+        "total_missing": kpis["items"]["missing"],
+        "total_new": kpis["items"]["new"],
     }
 
     return render(request, "reports_app/reports_home.html", context)
@@ -40,80 +51,30 @@ def reports_home_view(request):
 # ======================================================
 #     تقرير حالة المباني + فلاتر + تصدير Excel
 # ======================================================
+@query_budget(9, cache_queries=27)
 @login_required
 def building_status_report_view(request):
 
-    regions = Region.objects.all()
+    tree = get_location_tree()
 
     selected_region = request.GET.get("region")
     selected_city = request.GET.get("city")
     selected_building = request.GET.get("building")
 
-    buildings = Building.objects.select_related("city", "city__region").all()
-
-    # تطبيق الفلاتر
-    if selected_region:
-        buildings = buildings.filter(city__region_id=selected_region)
-
-    if selected_city:
-        buildings = buildings.filter(city_id=selected_city)
-
-    if selected_building:
-        buildings = buildings.filter(id=selected_building)
-
-    report_data = []
-
-    for b in buildings:
-        total = Asset.objects.filter(building=b).count()
-
-        scanned = InventoryItem.objects.filter(
-            asset__building=b, status="found"
-        ).count()
-
-        missing = InventoryItem.objects.filter(
-            asset__building=b, status="missing"
-        ).count()
-
-        new_added = InventoryItem.objects.filter(
-            asset__building=b, status="new"
-        ).count()
-
-        not_scanned = total - (scanned + missing + new_added)
-
-        report_data.append({
-            "region": b.city.region.name,
-            "city": b.city.name,
-            "building": b.name,
-            "total": total,
-            "scanned": scanned,
-            "missing": missing,
-            "new": new_added,
-            "not_scanned": not_scanned,
+    # ========== تصدير Excel (مهمة خلفية) ==========
+    if "export" in request.GET:
+        return _export_job(request, "building_status", {
+            "region": selected_region, "city": selected_city, "building": selected_building,
         })
 
-    # ========== تصدير Excel ==========
-    if "export" in request.GET:
-        headers = ["المنطقة", "المدينة", "المبنى", "إجمالي", "مجرود", "غير مجرود", "نسبة الإنجاز"]
-        rows = [
-            [
-                row["region"],
-                row["city"],
-                row["building"],
-                row["total"],
-                row["scanned"],
-                row["not_scanned"],
-                round((row["scanned"] / row["total"] * 100), 1) if row["total"] else 0,
-            ]
-            for row in report_data
-        ]
-
-        return generate_excel(headers, rows, "building_status.xlsx")
+    report_data = building_status_report(selected_region, selected_city, selected_building)
 
     return render(request, "reports_app/building_status_report.html", {
         "data": report_data,
-        "regions": regions,
-        "cities": City.objects.all(),
-        "buildings": Building.objects.all(),
+        "regions": tree["regions"],
+        # فقط مدن المنطقة المختارة ومباني المدينة المختارة — الباقي عبر AJAX
+        "cities": tree["cities_by_region"].get(_as_id(selected_region), []),
+        "buildings": tree["buildings_by_city"].get(_as_id(selected_city), []),
         "selected_region": selected_region,
         "selected_city": selected_city,
         "selected_building": selected_building,
@@ -126,30 +87,21 @@ def building_status_report_view(request):
 @login_required
 def sessions_status_report_view(request):
 
-    sessions = InventorySession.objects.select_related("employee", "region").all()
+    sessions = InventorySession.objects.select_related("employee", "region__group").all()
+    tally = dashboard_kpis()["sessions"]
 
     counts = {
-        "total": sessions.count(),
-        "completed": sessions.filter(status="completed").count(),
-        "approved": sessions.filter(status="supervisor_approved").count(),
-        "rejected": sessions.filter(status="supervisor_rejected").count(),
-        "under_review": sessions.filter(status="supervisor_under_review").count(),
-        "draft": sessions.filter(status="draft").count(),
+        "total": tally["total"],
+        "completed": tally["completed"],
+        "approved": tally["supervisor_approved"],
+        "rejected": tally["supervisor_rejected"],
+        "under_review": tally["supervisor_under_review"],
+        "draft": tally["draft"],
     }
 
-    # ========== تصدير Excel ==========
+    # ========== تصدير Excel (مهمة خلفية) ==========
     if "export" in request.GET:
-        headers = ["رقم الجلسة", "الموظف", "المنطقة", "الحالة"]
-        rows = [
-            [
-                s.id,
-                s.employee.username if s.employee else "-",
-                s.region.name if s.region else "-",
-                s.get_status_display(),
-            ]
-            for s in sessions
-        ]
-        return generate_excel(headers, rows, "sessions_status.xlsx")
+        return _export_job(request, "sessions_status")
 
     return render(request, "reports_app/sessions_status_report.html", {
         "counts": counts,
@@ -160,59 +112,32 @@ def sessions_status_report_view(request):
 # ======================================================
 #     التقرير الختامي الشامل + تصدير Excel
 # ======================================================
+@query_budget(11, cache_queries=27)
 @login_required
 def summary_assets_report_view(request):
 
-    total_assets = Asset.objects.count()
-
-    scanned = InventoryItem.objects.filter(status="found").count()
-    missing = InventoryItem.objects.filter(status="missing").count()
-    new_added = InventoryItem.objects.filter(status="new").count()
-
-    not_scanned = total_assets - (scanned + missing + new_added)
-
-    region_stats = Region.objects.annotate(
-        assets_count=Count("cities__buildings__asset", distinct=True),
-        scanned_count=Count(
-            "cities__buildings__asset__inventoryitem",
-            filter=Q(cities__buildings__asset__inventoryitem__status="found"),
-            distinct=True
-        ),
-        missing_count=Count(
-            "cities__buildings__asset__inventoryitem",
-            filter=Q(cities__buildings__asset__inventoryitem__status="missing"),
-            distinct=True
-        ),
-        new_count=Count(
-            "cities__buildings__asset__inventoryitem",
-            filter=Q(cities__buildings__asset__inventoryitem__status="new"),
-            distinct=True
-        )
-    )
-
-    # ========== تصدير Excel ==========
+    level = request.GET.get("level")
+    level = level if level in ROLLUP_LEVELS else "region"
+    mode = request.GET.get("mode")
+    mode = mode if mode in ROLLUP_MODES else "latest"
+
+    # ========== تصدير Excel (مهمة خلفية) ==========
     if "export" in request.GET:
-        headers = ["المنطقة", "إجمالي", "مجرود", "مفقود", "جديد", "غير مجرود"]
-        rows = [
-            [
-                region.name,
-                region.assets_count,
-                region.scanned_count,
-                region.missing_count,
-                region.new_count,
-                region.assets_count - region.scanned_count,
-            ]
-            for region in region_stats
-        ]
-        return generate_excel(headers, rows, "summary_assets.xlsx")
+        return _export_job(request, "summary_assets", {"level": level, "mode": mode})
+
+    region_stats, totals = summary_assets_report(level, mode)
 
     return render(request, "reports_app/summary_assets_report.html", {
-        "total_assets": total_assets,
-        "scanned": scanned,
-        "missing": missing,
-        "new_added": new_added,
-        "not_scanned": not_scanned,
+        "total_assets": totals["assets"],
+        "scanned": totals["scanned"],
+        "missing": totals["missing"],
+        "new_added": totals["new"],
+        "not_scanned": totals["not_scanned"],
         "region_stats": region_stats,
+        "level": level,
+        "mode": mode,
+        "level_labels": ROLLUP_LEVEL_LABELS,
+        "level_label": ROLLUP_LEVEL_LABELS[level],
     })
 
 
@@ -221,8 +146,7 @@ def summary_assets_report_view(request):
 # ======================================================
 @login_required
 def get_cities_ajax(request, region_id):
-    cities = City.objects.filter(region_id=region_id).values("id", "name")
-    return JsonResponse(list(cities), safe=False)
+    return JsonResponse(cities_of_region(region_id), safe=False)
 
 
 # ======================================================
@@ -230,17 +154,14 @@ def get_cities_ajax(request, region_id):
 # ======================================================
 @login_required
 def get_buildings_ajax(request, city_id):
-    buildings = Building.objects.filter(city_id=city_id).values("id", "name")
-    return JsonResponse(list(buildings), safe=False)
+    return JsonResponse(buildings_of_city(city_id), safe=False)
 
 
 @login_required
 def pending_sessions(request):
 
     # السماح فقط للمشرف والمدير
-    user_groups = request.user.groups.values_list("name", flat=True)
-
-    if not (request.user.is_superuser or "supervisors" in user_groups or "admins" in user_groups):
+    if not (is_supervisor(request.user) or is_admin(request.user)):
         return render(request, "403.html", status=403)
 
     # جلب الجلسات بانتظار المراجعة
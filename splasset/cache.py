@@ -0,0 +1,51 @@
+import threading
+from contextlib import contextmanager
+
+from django.core.cache.backends.db import DatabaseCache
+
+
+# =======================================================
+#   🗄 الذاكرة المؤقتة المشتركة في قاعدة البيانات
+# =======================================================
+_local = threading.local()
+
+
+def in_cache_call():
+    """هل الاستعلام الحالي صادر من عملية على الذاكرة المؤقتة؟"""
+    return getattr(_local, "depth", 0) > 0
+
+
+@contextmanager
+def _cache_call():
+    _local.depth = getattr(_local, "depth", 0) + 1
+    try:
+        yield
+    finally:
+        _local.depth -= 1
+
+
+class SharedDatabaseCache(DatabaseCache):
+    """
+    DatabaseCache تُعلَّم استعلاماته — القياس (QueryTimer) يعدّها منفصلة عن
+    استعلامات البيانات، ولها حد خاص في query_budget (cache_queries).
+    """
+
+    def get_many(self, keys, version=None):
+        with _cache_call():
+            return super().get_many(keys, version)
+
+    def _base_set(self, mode, key, value, timeout=None):
+        with _cache_call():
+            return super()._base_set(mode, key, value, timeout)
+
+    def _base_delete_many(self, keys):
+        with _cache_call():
+            return super()._base_delete_many(keys)
+
+    def has_key(self, key, version=None):
+        with _cache_call():
+            return super().has_key(key, version)
+
+    def clear(self):
+        with _cache_call():
+            return super().clear()
@@ -1,18 +1,18 @@
 from django.contrib.auth.models import Group
-from inventory_app.models import InventorySession
+from inventory_app.utils import user_roles, is_supervisor, is_admin, pending_sessions_count
 
 
 def user_groups(request):
-    if request.user.is_authenticated:
-        groups = list(request.user.groups.values_list("name", flat=True))
-    else:
-        groups = []
-    return {"user_groups": groups}
+    return {"user_groups": list(user_roles(request.user))}
 
 
 def pending_sessions(request):
-    if request.user.is_authenticated:
-        count = InventorySession.objects.filter(status="supervisor_under_review").count()
-    else:
-        count = 0
+    user = request.user
+
+    # دالة بدلاً من قيمة: القالب يستدعيها فقط إذا قرأ pending_count
+    def count():
+        if not (is_supervisor(user) or is_admin(user)):
+            return 0
+        return pending_sessions_count()
+
     return {"pending_count": count}
\ No newline at end of file
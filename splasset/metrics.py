@@ -0,0 +1,215 @@
+import bisect
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.db import connection
+from django.http import JsonResponse, HttpResponseForbidden
+
+from inventory_app.utils import is_admin
+from .cache import in_cache_call
+from reports_app.utils import report_cache_stats, reset_report_cache_stats
+
+
+logger = logging.getLogger("splasset.metrics")
+
+
+# =======================================================
+#   📈 قياس زمن الطلبات وعدد استعلاماتها لكل شاشة
+# =======================================================
+# حدود خانات مدرج الزمن (ملي ثانية) — الخانة الأخيرة لما فوق آخر حد
+LATENCY_BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+QUERY_BUCKETS = [0, 1, 2, 3, 5, 10, 20, 50, 100, 500]
+
+
+class QueryBudgetExceeded(Exception):
+    """تجاوز الشاشة لعدد الاستعلامات المسموح (في الوضع الصارم فقط)"""
+
+
+def query_budget(max_queries, cache_queries=0):
+    """
+    تحديد الحد الأقصى لعدد استعلامات الشاشة (يشمل جلسة الدخول والمستخدم).
+    cache_queries: حد منفصل لاستعلامات الذاكرة المؤقتة حين تكون في قاعدة البيانات
+    (SharedDatabaseCache) — أسوأ حالة بذاكرة فارغة. مع Redis تبقى صفرًا.
+    التجاوز يُسجل كتحذير، أو يرفع QueryBudgetExceeded إذا كان QUERY_BUDGET_STRICT = True.
+    """
+    def decorator(view):
+        view.query_budget = (max_queries, cache_queries)
+        return view
+    return decorator
+
+
+class _Histogram:
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+
+    def add(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+
+    def as_dict(self):
+        labels = [f"<={b}" for b in self.bounds] + [f">{self.bounds[-1]}"]
+        return dict(zip(labels, self.counts))
+
+
+class _ViewStats:
+    def __init__(self):
+        self.requests = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.db_ms = 0.0
+        self.queries = 0
+        self.max_queries = 0
+        self.cache_queries = 0
+        self.max_cache_queries = 0
+        self.over_budget = 0
+        self.latency = _Histogram(LATENCY_BUCKETS_MS)
+        self.query_counts = _Histogram(QUERY_BUCKETS)
+
+    def add(self, wall_ms, db_ms, queries, cache_queries, over_budget):
+        self.requests += 1
+        self.total_ms += wall_ms
+        self.max_ms = max(self.max_ms, wall_ms)
+        self.db_ms += db_ms
+        self.queries += queries
+        self.max_queries = max(self.max_queries, queries)
+        self.cache_queries += cache_queries
+        self.max_cache_queries = max(self.max_cache_queries, cache_queries)
+        self.over_budget += over_budget
+        self.latency.add(wall_ms)
+        self.query_counts.add(queries)
+
+    def as_dict(self, budget):
+        n = self.requests or 1
+        budget, cache_budget = budget or (None, None)
+        return {
+            "requests": self.requests,
+            "avg_ms": round(self.total_ms / n, 2),
+            "max_ms": round(self.max_ms, 2),
+            "avg_db_ms": round(self.db_ms / n, 2),
+            "avg_queries": round(self.queries / n, 2),
+            "max_queries": self.max_queries,
+            "query_budget": budget,
+            "avg_cache_queries": round(self.cache_queries / n, 2),
+            "max_cache_queries": self.max_cache_queries,
+            "cache_query_budget": cache_budget,
+            "over_budget": self.over_budget,
+            "latency_ms": self.latency.as_dict(),
+            "queries": self.query_counts.as_dict(),
+        }
+
+
+# الإحصائيات داخل العملية — تبدأ من الصفر مع كل تشغيل للخادم
+_stats = {}
+_budgets = {}
+_lock = threading.Lock()
+
+
+def record(view_name, wall_ms, db_ms, queries, cache_queries=0, budget=None):
+    """budget: (حد الاستعلامات، حد استعلامات الذاكرة المؤقتة) كما في query_budget"""
+    over = budget is not None and (queries > budget[0] or cache_queries > budget[1])
+    with _lock:
+        stats = _stats.get(view_name)
+        if stats is None:
+            stats = _stats[view_name] = _ViewStats()
+        stats.add(wall_ms, db_ms, queries, cache_queries, over)
+        if budget is not None:
+            _budgets[view_name] = budget
+    return over
+
+
+def snapshot():
+    with _lock:
+        return {
+            name: stats.as_dict(_budgets.get(name))
+            for name, stats in sorted(_stats.items())
+        }
+
+
+def reset():
+    with _lock:
+        _stats.clear()
+        _budgets.clear()
+
+
+class QueryTimer:
+    """
+    يُركب عبر connection.execute_wrapper لعدّ الاستعلامات وزمنها.
+    استعلامات الذاكرة المؤقتة في قاعدة البيانات تُعد منفصلة (cache_count).
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.cache_count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            if in_cache_call():
+                self.cache_count += 1
+            else:
+                self.count += 1
+            self.seconds += time.perf_counter() - start
+
+
+class QueryMetricsMiddleware:
+    """
+    يسجل لكل طلب (حسب اسم المسار): الزمن الكلي، عدد الاستعلامات وزمنها.
+    الاستجابات المتدفقة تُقاس حتى إرجاع الاستجابة فقط.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timer = QueryTimer()
+        start = time.perf_counter()
+
+        with connection.execute_wrapper(timer):
+            response = self.get_response(request)
+
+        wall_ms = (time.perf_counter() - start) * 1000
+
+        match = getattr(request, "resolver_match", None)
+        if match is None:
+            return response
+
+        budget = getattr(match.func, "query_budget", None)
+        over = record(
+            match.view_name, wall_ms, timer.seconds * 1000,
+            timer.count, timer.cache_count, budget,
+        )
+
+        if over:
+            message = (
+                f"{match.view_name}: {timer.count} استعلام (الحد {budget[0]})، "
+                f"{timer.cache_count} للذاكرة المؤقتة (الحد {budget[1]})"
+            )
+            if getattr(settings, "QUERY_BUDGET_STRICT", False):
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+
+        return response
+
+
+# =======================================================
+#   📊 عرض الإحصائيات (للمدير فقط)
+# =======================================================
+@login_required
+def metrics_view(request):
+    if not is_admin(request.user):
+        return HttpResponseForbidden("غير مصرح لك")
+
+    if request.method == "POST" and request.POST.get("reset"):
+        reset()
+        reset_report_cache_stats()
+
+    return JsonResponse(
+        {"views": snapshot(), "report_cache": report_cache_stats()},
+        json_dumps_params={"ensure_ascii": False},
+    )
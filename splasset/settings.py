@@ -33,12 +33,14 @@ INSTALLED_APPS = [
     'inventory_app.apps.InventoryAppConfig',
     'reports_app.apps.ReportsAppConfig',
     'import_app.apps.ImportAppConfig',
+    'jobs_app.apps.JobsAppConfig',
 ]
 
 # =======================
 # MIDDLEWARE
 # =======================
 MIDDLEWARE = [
+    'splasset.metrics.QueryMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -50,6 +52,39 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# تجاوز حد الاستعلامات المعلن للشاشة (query_budget) يرفع خطأ بدلاً من تحذير
+QUERY_BUDGET_STRICT = os.getenv("QUERY_BUDGET_STRICT", "False") == "True"
+
+# الاختبارات تعمل دائمًا في الوضع الصارم
+TEST_RUNNER = "splasset.test_runner.StrictQueryBudgetRunner"
+
+# قاعدة بيانات تجريبية يُسمح عليها بتشغيل run_benchmarks دون DEBUG
+BENCHMARK_SCRATCH_DB = os.getenv("BENCHMARK_SCRATCH_DB", "False") == "True"
+
+# =======================
+# الذاكرة المؤقتة — مشتركة بين كل العمليات (عمال الويب و run_jobs)
+# =======================
+# أرقام إصدار شجرة المواقع وبيانات الجرد وإبطال الصلاحيات والمؤشرات
+# تعتمد على ذاكرة مشتركة: LocMemCache لكل عملية يترك باقي العمال على بيانات قديمة.
+REDIS_URL = os.getenv("REDIS_URL")
+
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+else:
+    # جدول في قاعدة البيانات نفسها — يُنشأ بالترحيل (locations_app 0002)
+    CACHES = {
+        "default": {
+            "BACKEND": "splasset.cache.SharedDatabaseCache",
+            "LOCATION": "django_cache",
+            "OPTIONS": {"MAX_ENTRIES": 20000},
+        }
+    }
+
 ROOT_URLCONF = 'splasset.urls'
 WSGI_APPLICATION = 'splasset.wsgi.application'
 
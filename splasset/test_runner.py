@@ -0,0 +1,13 @@
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+class StrictQueryBudgetRunner(DiscoverRunner):
+    """
+    تشغيل كل الاختبارات في الوضع الصارم: أي شاشة تتجاوز حد استعلاماتها
+    (query_budget) تُفشل الاختبار الذي طلبها.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        settings.QUERY_BUDGET_STRICT = True
@@ -2,11 +2,11 @@ from django.shortcuts import render
 from django.contrib import admin
 from django.urls import path, include
 from django.contrib.auth.models import Group
+from inventory_app.utils import user_roles
+from splasset.metrics import metrics_view
 
 def home(request):
-    groups = []
-    if request.user.is_authenticated:
-        groups = list(request.user.groups.values_list("name", flat=True))
+    groups = list(user_roles(request.user))
 
     return render(request, "home.html", {
         "groups": groups,
@@ -21,7 +21,9 @@ urlpatterns = [
     path('inventory/', include('inventory_app.urls')),
     path('reports/', include('reports_app.urls')),
     path('admin/', admin.site.urls),
+    path('metrics/', metrics_view, name='metrics'),
     path("import/", include("import_app.urls")),
+    path("jobs/", include("jobs_app.urls")),
     
 
 ]